@@ -1,22 +1,109 @@
 from flask import Flask
-from .db import init_db
+import os
+import socket
+from .db import init_db, ensure_columns, ensure_indexes
 from .models import Base
+from . import analytics # registers the Attempt -> aggregates flush hook
+from . import scheduler # registers the Attempt -> learner schedule flush hook
+from .metrics import init_metrics
+from .phrases import init_registry
 from .api.api import apiapp
 
-def create_app():
+def create_app(config = None):
     app=Flask(__name__,
               template_folder="templates",
               static_folder="static",)
-    
+    app.config.update(config or {}) # overrides (e.g. DATABASE_URL for a scratch DB)
+
+    app.config.setdefault("DATABASE_URL", os.environ.get("DATABASE_URL")) # None = SQLite file mainapp/app.db
+    app.config.setdefault("DB_BUSY_TIMEOUT_MS", 5000) # SQLite: wait this long for the write lock
+    app.config.setdefault("DB_POOL_SIZE", 10)
+    app.config.setdefault("DB_MAX_OVERFLOW", 20)
+    app.config.setdefault("ATTEMPT_WRITE_BEHIND", os.environ.get("ATTEMPT_WRITE_BEHIND") == "1") # queue Attempt inserts off the request path
+    app.config.setdefault("ATTEMPT_BATCH_SIZE", 100) # max Attempt rows per group commit
+    app.config.setdefault("ATTEMPT_FLUSH_MS", 50) # max time a queued Attempt waits for its batch
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("METRICS") == "1") # stage timings + /metrics; off = no-op spans
+    app.config.setdefault("METRICS_SLOW_MS", None) # profile requests slower than this (needs METRICS_ENABLED)
+    app.config.setdefault("METRICS_SAMPLE_MS", 5) # stack sampling interval while profiling
+    app.config.setdefault("METRICS_PROFILE_DIR", None) # default: artifacts/profiles
+    app.config.setdefault("METRICS_PROFILE_KEEP", 50) # newest slow-request dumps kept in METRICS_PROFILE_DIR
+    app.config.setdefault("METRICS_PROFILE_GAP_S", 10) # min seconds between dumps; slow requests in between are only counted
+    app.config.setdefault("WARMUP", os.environ.get("WARMUP") == "1") # preload analysis/plotting before workers fork (gunicorn --preload)
+    app.config.setdefault("PHRASEBANK_PATH", os.environ.get("PHRASEBANK_PATH")) # compiled phrase bank; None = artifacts/phrasebank.bin (used once built)
+    app.config.setdefault("PHRASES_RECHECK_S", 5) # seconds between polls for phrase edits made by other worker processes
+
     engine, Session = init_db(app) # init engine + session
     Base.metadata.create_all(engine) # create tables if missings
+    ensure_columns(engine) # add nullable columns introduced after the DB file was created
+    ensure_indexes(engine) # ... and their indexes
+    init_registry(app) # map the compiled phrase bank (or load it from the DB) once
 
     app.config["MAX_CONTENT_LENGTH"] = 25 * 1024 * 1024 # limit max upload size
+    app.config.setdefault("MAX_UPLOAD_SECONDS", 30) # longer recordings are rejected (413) before they are stored or analysed
+    app.config.setdefault("UPLOAD_DECODE_EARLY", True) # decode uploads while they arrive, so over-long ones are cut off mid-body
+    app.config.setdefault("TTS_CACHE_MAX_BYTES", 500 * 1024 * 1024) # evict least-recently-used TTS clips above this
+    app.config.setdefault("TTS_CACHE_MAX_AGE_DAYS", 30) # re-render TTS clips older than this
+    app.config.setdefault("KEEP_DEBUG_WAV", False) # write artifacts/<run_id>/user.wav on compare
+    app.config.setdefault("PITCH_BACKEND", os.environ.get("PITCH_BACKEND", "praat")) # "praat" or "yin" (pure NumPy); per request: pitch_backend
+    app.config.setdefault("PITCH_HOP", 0.01) # seconds per f0 frame (reference contours assume 0.01)
+    app.config.setdefault("PITCH_FLOOR", 75.0) # Hz search range when not estimated
+    app.config.setdefault("PITCH_CEILING", 500.0)
+    app.config.setdefault("PITCH_AUTO_RANGE", False) # estimate floor/ceiling per recording; per request: pitch_range="auto"
+    app.config.setdefault("SEGMENTATION", os.environ.get("SEGMENTATION", "energy")) # "energy" (trim silence, split at intensity valleys) or "uniform"
+    app.config.setdefault("RESULT_CACHE", os.environ.get("RESULT_CACHE", "1") == "1") # reuse scores for identical audio (content hash + scorer version)
+    app.config.setdefault("RESULT_CACHE_SIZE", 512) # in-memory LRU entries per process in front of the compare_results table
+    app.config.setdefault("COMPARE_MODE", os.environ.get("COMPARE_MODE", "sync")) # "async" = queue compares, poll /api/jobs/<id>
+    app.config.setdefault("COMPARE_EXECUTOR", "process") # "process" or "thread" worker pool for async compares
+    app.config.setdefault("COMPARE_WORKERS", None) # None = one per CPU
+    app.config.setdefault("COMPARE_QUEUE_SIZE", 32) # queued + running compares before /api/compare returns 429
+    app.config.setdefault("JOB_RETENTION_SECONDS", 86400) # async job and stream rows (shared across nodes) are pruned after this
+    app.config.setdefault("NODE_ID", os.environ.get("NODE_ID") or socket.gethostname()) # names this node in stream ownership (421 answers)
+    app.config.setdefault("TTS_BACKEND", os.environ.get("TTS_BACKEND", "openai")) # "offline" = synthetic tones, no network
+    app.config.setdefault("STORAGE_MAX_AGE_DAYS", None) # delete uploads/compare artifacts older than this (None = keep)
+    app.config.setdefault("STORAGE_MAX_BYTES", None) # total budget for uploads + artifacts; oldest go first
+    app.config.setdefault("STORAGE_PHRASE_QUOTA", None) # newest recordings kept per phrase
+    app.config.setdefault("STORAGE_COLD_AFTER_DAYS", None) # compress raw WAVs older than this
+    app.config.setdefault("STORAGE_COLD_CODEC", "flac") # "flac" (lossless) or "opus"
+    app.config.setdefault("STORAGE_GC_GRACE_SECONDS", 3600) # files used more recently are never touched by GC
+    app.config.setdefault("STORAGE_GC_INTERVAL", None) # seconds between background GC passes (None = only `flask storage-gc`)
+    app.config.setdefault("BLOB_BACKEND", os.environ.get("BLOB_BACKEND")) # None (single node), "local" (shared dir) or "s3"
+    app.config.setdefault("BLOB_ROOT", os.environ.get("BLOB_ROOT")) # BLOB_BACKEND=local: directory every node mounts
+    app.config.setdefault("S3_BUCKET", os.environ.get("S3_BUCKET"))
+    app.config.setdefault("S3_PREFIX", os.environ.get("S3_PREFIX", "")) # key prefix inside the bucket
+    app.config.setdefault("S3_ENDPOINT_URL", os.environ.get("S3_ENDPOINT_URL")) # MinIO / Ceph / R2; None = AWS
+    app.config.setdefault("S3_REGION", os.environ.get("S3_REGION"))
+    app.config.setdefault("BLOB_REDIRECT", True) # S3: answer file GETs with a presigned-URL redirect instead of proxying
+    app.config.setdefault("BLOB_URL_EXPIRES", 3600) # seconds a presigned URL stays valid
+    app.config.setdefault("STATIC_OFFLOAD", os.environ.get("STATIC_OFFLOAD")) # None, "x-accel" (nginx) or "x-sendfile": the proxy sends file bodies
+    app.config.setdefault("STATIC_ACCEL_PREFIX", "/_files") # internal nginx location aliased to the mainapp/ directory
+    app.config.setdefault("STATIC_MAX_AGE", 365 * 24 * 3600) # Cache-Control max-age for uploads, artifacts and TTS clips
+
+    init_metrics(app)
 
     from .routes.homeroute import homeapp as home_blueprint
+    from .routes.metricsroute import metricsapp as metrics_blueprint
     from .api.api import apiapp as api_blueprint
+    from .api.progress import progressapp as progress_blueprint
 
     app.register_blueprint(home_blueprint, url_prefix="/")
+    app.register_blueprint(metrics_blueprint, url_prefix="/")
     app.register_blueprint(api_blueprint, url_prefix="/api")
+    app.register_blueprint(progress_blueprint, url_prefix="/api/progress")
+
+    from .cli import prewarm_tts, score_batch, build_references, build_templates, build_phrasebank, replay_stream, storage_gc, rebuild_analytics, bench, import_budget
+    app.cli.add_command(prewarm_tts) # flask prewarm-tts
+    app.cli.add_command(score_batch) # flask score-batch
+    app.cli.add_command(build_references) # flask build-references
+    app.cli.add_command(build_templates) # flask build-templates
+    app.cli.add_command(build_phrasebank) # flask build-phrasebank
+    app.cli.add_command(replay_stream) # flask replay-stream
+    app.cli.add_command(storage_gc) # flask storage-gc
+    app.cli.add_command(rebuild_analytics) # flask rebuild-analytics
+    app.cli.add_command(bench) # flask bench
+    app.cli.add_command(import_budget) # flask import-budget
+
+    if app.config["WARMUP"]:
+        from .warmup import warmup
+        warmup(app)
 
     return app
\ No newline at end of file
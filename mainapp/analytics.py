@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, update, delete, case, select
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session as OrmSession
+from mainapp.models import Attempt, AttemptSyllable, PhraseStats, ToneStats, SyllableStats, DailyStats
+import json
+
+PASS_SCORE = 70 # same threshold analyze_pitch uses to flag a syllable as bad
+TONES = (1, 2, 3, 4, 5) # 5 = neutral
+
+# --- write side: called for every batch of new Attempts, inside their transaction ---
+
+# attempts: [(id, phrase_id, score, syllables_json, created_at)]
+def apply_attempts(conn, attempts):
+    syl_rows = []
+    phrase, tone, syl, daily = {}, {}, {}, {}
+
+    for attempt_id, phrase_id, score, syllables_json, created_at in attempts:
+        created_at = created_at or datetime.utcnow()
+        day = created_at.strftime("%Y-%m-%d")
+        score = score or 0
+
+        p = phrase.setdefault(phrase_id, {"phrase_id": phrase_id, "attempts": 0, "score_sum": 0, "best": 0,
+                                          "last_score": 0, "first_at": created_at, "last_at": created_at})
+        p["attempts"] += 1
+        p["score_sum"] += score
+        p["best"] = max(p["best"], score)
+        if created_at >= p["last_at"]:
+            p["last_score"], p["last_at"] = score, created_at
+        p["first_at"] = min(p["first_at"], created_at)
+
+        for key in ((day, phrase_id), (day, "")): # per phrase + all phrases
+            d = daily.setdefault(key, {"day": key[0], "phrase_id": key[1], "attempts": 0, "score_sum": 0})
+            d["attempts"] += 1
+            d["score_sum"] += score
+
+        for s in json.loads(syllables_json or "[]"): # parsed once here, never again on read
+            t = s.get("tone") if s.get("tone") in TONES else 5
+            sc = int(s.get("score", 0))
+            ok = int(sc >= PASS_SCORE)
+            syl_rows.append({"attempt_id": attempt_id, "phrase_id": phrase_id, "idx": s.get("idx", 0),
+                             "syllable": s.get("syllable", ""), "tone": t, "score": sc, "created_at": created_at})
+            for table, key in ((tone, t), (syl, (s.get("syllable", ""), t))):
+                row = table.setdefault(key, {"attempts": 0, "score_sum": 0, "passed": 0})
+                row["attempts"] += 1
+                row["score_sum"] += sc
+                row["passed"] += ok
+
+    if syl_rows:
+        conn.execute(insert(AttemptSyllable), syl_rows)
+
+    counters = ("attempts", "score_sum")
+    _upsert(conn, PhraseStats.__table__, ["phrase_id"], list(phrase.values()), counters, latest = True)
+    _upsert(conn, DailyStats.__table__, ["day", "phrase_id"], list(daily.values()), counters)
+    _upsert(conn, ToneStats.__table__, ["tone"], [{"tone": k, **v} for k, v in tone.items()], counters + ("passed",))
+    _upsert(conn, SyllableStats.__table__, ["syllable", "tone"],
+            [{"syllable": k[0], "tone": k[1], **v} for k, v in syl.items()], counters + ("passed",))
+
+# add `counters` into existing rows (or insert them) atomically; `latest` also maintains best/last/first for PhraseStats
+def _upsert(conn, table, keys, rows, counters, latest = False):
+    if not rows:
+        return
+    c = table.c
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+
+    if dialect is not None: # INSERT .. ON CONFLICT DO UPDATE: no read-modify-write race between processes
+        stmt = dialect.insert(table)
+        new = stmt.excluded
+        values = {k: c[k] + new[k] for k in counters}
+        if latest:
+            values.update(
+                best = case((new.best > c.best, new.best), else_ = c.best),
+                last_score = case((new.last_at >= c.last_at, new.last_score), else_ = c.last_score),
+                last_at = case((new.last_at >= c.last_at, new.last_at), else_ = c.last_at),
+                first_at = case((new.first_at < c.first_at, new.first_at), else_ = c.first_at),
+            )
+        conn.execute(stmt.on_conflict_do_update(index_elements = keys, set_ = values), rows)
+        return
+
+    for row in rows: # other databases: update, insert when the row is new
+        where = [c[k] == row[k] for k in keys]
+        values = {k: c[k] + row[k] for k in counters}
+        if latest:
+            values.update(
+                best = case((c.best < row["best"], row["best"]), else_ = c.best),
+                last_score = case((c.last_at <= row["last_at"], row["last_score"]), else_ = c.last_score),
+                last_at = case((c.last_at <= row["last_at"], row["last_at"]), else_ = c.last_at),
+                first_at = case((c.first_at > row["first_at"], row["first_at"]), else_ = c.first_at),
+            )
+        if conn.execute(update(table).where(*where).values(values)).rowcount == 0:
+            conn.execute(insert(table), [row])
+
+# new Attempts are folded into the aggregates in the flush that inserts them (sync commits and write-behind batches alike)
+@event.listens_for(OrmSession, "after_flush")
+def _attempts_flushed(session, flush_context):
+    new = [o for o in session.new if isinstance(o, Attempt)]
+    if new:
+        apply_attempts(session.connection(), [(a.id, a.phrase_id, a.score, a.syllables_json, a.created_at) for a in new])
+
+# recompute every aggregate + syllable row from the attempts table (after upgrading, or to repair drift)
+def rebuild(db, chunk = 5000):
+    conn = db.connection()
+    for model in (AttemptSyllable, PhraseStats, ToneStats, SyllableStats, DailyStats):
+        conn.execute(delete(model))
+
+    n, last_id = 0, 0
+    while True: # keyset pagination keeps memory flat on big tables
+        rows = conn.execute(
+            select(Attempt.id, Attempt.phrase_id, Attempt.score, Attempt.syllables_json, Attempt.created_at)
+            .where(Attempt.id > last_id).order_by(Attempt.id).limit(chunk)
+        ).all()
+        if not rows:
+            break
+        apply_attempts(conn, rows)
+        n += len(rows)
+        last_id = rows[-1][0]
+    db.commit()
+    return n
+
+# --- read side: small indexed queries over the aggregates ---
+
+def _mean(total, n):
+    return round(total / n, 1) if n else None
+
+def phrase_progress(db, phrase_id, limit = 50):
+    stats = db.get(PhraseStats, phrase_id)
+    history = db.execute( # newest first through ix_attempts_phrase_created
+        select(Attempt.created_at, Attempt.score)
+        .where(Attempt.phrase_id == phrase_id).order_by(Attempt.created_at.desc()).limit(limit)
+    ).all()
+    return {
+        "phrase_id": phrase_id,
+        "attempts": stats.attempts if stats else 0,
+        "mean": _mean(stats.score_sum, stats.attempts) if stats else None,
+        "best": stats.best if stats else None,
+        "last": stats.last_score if stats else None,
+        "first_at": stats.first_at.isoformat() if stats and stats.first_at else None,
+        "last_at": stats.last_at.isoformat() if stats and stats.last_at else None,
+        "history": [{"created_at": t.isoformat(), "score": s} for t, s in reversed(history)],
+        "trend": trend(db, phrase_id),
+    }
+
+def tone_accuracy(db):
+    rows = {r.tone: r for r in db.query(ToneStats)}
+    out = []
+    for t in TONES:
+        r = rows.get(t)
+        out.append({
+            "tone": t,
+            "label": "neutral" if t == 5 else f"tone {t}",
+            "syllables": r.attempts if r else 0,
+            "mean": _mean(r.score_sum, r.attempts) if r else None,
+            "pass_rate": round(r.passed / r.attempts, 3) if r and r.attempts else None,
+        })
+    return out
+
+def weakest_syllables(db, limit = 10, min_attempts = 3):
+    mean = SyllableStats.score_sum * 1.0 / SyllableStats.attempts
+    rows = db.execute(
+        select(SyllableStats, mean.label("mean"))
+        .where(SyllableStats.attempts >= min_attempts).order_by(mean.asc(), SyllableStats.attempts.desc()).limit(limit)
+    ).all()
+    return [{
+        "syllable": s.syllable,
+        "tone": s.tone,
+        "attempts": s.attempts,
+        "mean": round(m, 1),
+        "pass_rate": round(s.passed / s.attempts, 3),
+    } for s, m in rows]
+
+# daily mean scores for the last `days` days + least-squares slope (points per day)
+def trend(db, phrase_id = "", days = 30):
+    since = (datetime.utcnow() - timedelta(days = days)).strftime("%Y-%m-%d")
+    rows = db.execute(
+        select(DailyStats.day, DailyStats.attempts, DailyStats.score_sum)
+        .where(DailyStats.phrase_id == phrase_id, DailyStats.day >= since).order_by(DailyStats.day)
+    ).all()
+    points = [{"day": d, "attempts": n, "mean": _mean(s, n)} for d, n, s in rows]
+
+    slope = None
+    if len(points) >= 2:
+        import numpy as np # only the trend fit needs it; keeps numpy out of app startup
+        x = np.array([(datetime.strptime(p["day"], "%Y-%m-%d") - datetime.strptime(points[0]["day"], "%Y-%m-%d")).days for p in points], dtype = float)
+        y = np.array([p["mean"] for p in points])
+        w = np.array([p["attempts"] for p in points], dtype = float) # busy days count more
+        slope = round(float(np.polyfit(x, y, 1, w = np.sqrt(w))[0]), 3)
+    return {"days": days, "points": points, "slope_per_day": slope}
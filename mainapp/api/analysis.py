@@ -0,0 +1,112 @@
+import json
+import time
+import numpy as np
+from mainapp import metrics
+from mainapp.phrases import pinyin_syllables, tone_from_pinyin_syllable, sandhi_tones
+from mainapp.api.audio import decode_audio, write_wav, SAMPLE_RATE
+from mainapp.api.pitch import extract_f0
+from mainapp.api.segment import trim, syllable_edges
+from mainapp.api.scoring import score_windows
+from mainapp.api.reference import normalize_contour, align_syllables, HOP
+
+# the analysis half of /api/compare (numpy + Praat); imported on first use so web workers that never score start fast
+
+MAX_PLOT_POINTS = 500 # cap on f0 points returned to the client / drawn in the plot
+
+# f0 series for the client/plot: at most MAX_PLOT_POINTS points, NaN -> None so it is valid JSON
+def pitch_series(t, f0, bad_spans):
+    step = max(1, int(np.ceil(len(t) / MAX_PLOT_POINTS)))
+    return {
+        "t": [round(float(v), 3) for v in t[::step]],
+        "f0": [None if not np.isfinite(v) else round(float(v), 1) for v in f0[::step]],
+        "bad_spans": [[round(float(a), 3), round(float(b), 3)] for (a, b) in bad_spans],
+    }
+
+# syllable edges (seconds) + per-syllable contour scores from a DTW alignment to the phrase's reference contour
+def reference_edges(t, f0, reference, n):
+    ref, bounds = reference
+    user, first, _ = normalize_contour(f0)
+    if len(user) < 2 or len(bounds) != n + 1:
+        return None, None
+
+    segs, _ = align_syllables(user, np.asarray(ref), bounds)
+    if any(u0 is None for (u0, _, _) in segs): # a reference syllable got no user frames (e.g. empty bounds): no usable edges
+        return None, None
+    starts = [first + u0 for (u0, _, _) in segs]
+    end = first + segs[-1][1]
+    edges = np.array([t[i] for i in starts] + [t[end] + HOP / 2]) # window k = user frames aligned to ref syllable k
+    return edges, [s for (_, _, s) in segs]
+
+# main analysis: per-syllable scores + downsampled pitch series (no plotting)
+# `samples` = float32 16 kHz mono (decode_audio)
+# `reference` = (contour, syllable bounds) from the ReferenceStore; None falls back to energy (or uniform) windows
+# `pitch` = extract_f0 options {backend, hop, floor, ceiling} (see pitch_options in api.py); None = Praat defaults
+# `segmentation` = "energy": trim leading/trailing silence and split at intensity valleys; "uniform": whole buffer, equal windows
+# `templates` = ToneTemplates from the TemplateStore: nearest-template tone scoring; None = the rule scorer
+def analyze_pitch(samples, phrase, reference = None, pitch = None, segmentation = "energy", templates = None):
+    pitch = pitch or {}
+    start, end = trim(samples) if segmentation == "energy" else (0.0, len(samples) / SAMPLE_RATE)
+    speech = samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+    t, f0, _ = extract_f0(speech, **pitch) # compute pitch track on the speech only
+    t = t + start # back to recording time
+    if pitch.get("hop", HOP) != HOP: # reference contours are stored at HOP frames; DTW against another rate would misalign
+        reference = None
+    syls = phrase.get("syllables") or pinyin_syllables(phrase["pinyin"]) # list syllables (precomputed by the registry)
+    tones = phrase.get("tones") or [tone_from_pinyin_syllable(s) for s in syls] # tone numbers per syllable
+    spoken = phrase.get("surface_tones") or sandhi_tones(phrase.get("hanzi", ""), tones) # what is scored (after sandhi)
+
+    n = max(1, len(syls)) # number of windows
+    with metrics.span("align"):
+        edges, ref_scores = reference_edges(t, f0, reference, n) if reference is not None else (None, None)
+    if edges is None:
+        with metrics.span("segment"):
+            edges = syllable_edges(samples, n, start, end) if segmentation == "energy" else np.linspace(start, end, n + 1)
+
+    syllable_results = []
+    bad_spans = []
+    with metrics.span("score"):
+        if templates is not None:
+            scored = templates.score(t, f0, edges, spoken) # nearest template per syllable, all at once
+        else:
+            scored = score_windows(t, f0, edges, spoken) # all windows in one vectorized pass
+
+    for i, (score, label) in enumerate(scored):
+        a, b = edges[i], edges[i + 1] # window bounds
+        syllable_results.append({
+            "idx": i,
+            "syllable": syls[i],
+            "tone": tones[i],
+            "surface_tone": spoken[i],
+            "score": int(score),
+            "label": label,
+            "t0": float(a),
+            "t1": float(b),
+        })
+        if ref_scores is not None:
+            syllable_results[-1]["ref_score"] = ref_scores[i] # contour similarity to the reference (DTW)
+
+        if score < 70: # threshold for "bad" syllable highlight
+            bad_spans.append((a, b))
+
+    overall = int(round(np.mean([s["score"] for s in syllable_results]))) # overall score
+
+    series = pitch_series(t, f0, bad_spans)
+    series["speech"] = [round(start, 3), round(end, 3)] # trimmed region the pitch track covers
+    return overall, syllable_results, series
+
+def plot_title(phrase, overall):
+    return f'{phrase["hanzi"]}   ({phrase["pinyin"]})   score={overall}'
+
+# decode + analyze + plot one recording; top-level so it can run in a worker process
+def run_compare(src_path, out_dir, phrase, keep_wav = False, reference = None, pitch = None, segmentation = "energy", templates = None):
+    t0 = time.perf_counter()
+    samples = decode_audio(src_path) # decode in-process -> float32 16k mono (no ffmpeg fork, no temp wav)
+    if keep_wav: # opt-in: keep the normalized audio for debugging
+        write_wav(out_dir / "user.wav", samples)
+
+    overall, syllables, series = analyze_pitch(samples, phrase, reference, pitch, segmentation, templates) # scores + f0 series; plot is rendered lazily
+    (out_dir / "analysis.json").write_text(json.dumps( # everything the plot endpoint needs to render on demand
+        {"title": plot_title(phrase, overall), "pitch": series}, ensure_ascii = False
+    ))
+    metrics.record_realtime(len(samples) / SAMPLE_RATE, time.perf_counter() - t0)
+    return overall, syllables, series
@@ -0,0 +1,261 @@
+from pathlib import Path
+import io
+import json
+import subprocess
+import threading
+import wave
+import numpy as np
+from mainapp import metrics
+
+try: # PyAV decodes in-process (no ffmpeg fork, no temp WAV)
+    import av
+except ImportError: # fall back to piping raw samples out of the ffmpeg CLI
+    av = None
+
+SAMPLE_RATE = 16000 # everything downstream works at 16 kHz mono
+
+# decode any container/codec -> float32 mono samples at `sr`
+# partial=True returns whatever decodes cleanly from a truncated stream (e.g. a recording still being uploaded)
+def decode_audio(src, sr = SAMPLE_RATE, partial = False):
+    with metrics.span("decode"):
+        return _decode_audio(src, sr, partial)
+
+def _decode_audio(src, sr, partial):
+    if isinstance(src, (bytes, bytearray)):
+        src = io.BytesIO(src)
+
+    pcm = _read_plain_wav(src, sr) # cheap path for WAVs that are already 16k mono PCM
+    if pcm is not None:
+        return pcm
+
+    if av is not None:
+        return _decode_pyav(src, sr, partial)
+    return _decode_ffmpeg_pipe(src, sr, partial)
+
+def _read_plain_wav(src, sr):
+    try:
+        with wave.open(str(src) if isinstance(src, Path) else src, "rb") as w:
+            if w.getnchannels() != 1 or w.getsampwidth() != 2 or w.getframerate() != sr:
+                return None
+            data = w.readframes(w.getnframes())
+    except (wave.Error, EOFError, TypeError):
+        return None
+    finally:
+        if hasattr(src, "seek"):
+            src.seek(0) # rewind for the real decoder
+    return np.frombuffer(data, dtype = "<i2").astype(np.float32) / 32768.0
+
+def _decode_pyav(src, sr, partial = False):
+    try:
+        container = av.open(str(src) if isinstance(src, Path) else src)
+    except av.error.FFmpegError:
+        if partial: # not even a full header yet
+            return np.zeros(0, dtype = np.float32)
+        raise
+
+    with container:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format = "flt", layout = "mono", rate = sr)
+        chunks = []
+        try:
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    chunks.append(out.to_ndarray().reshape(-1))
+        except av.error.FFmpegError:
+            if not partial: # a truncated tail is expected mid-upload; anything else is a real error
+                raise
+        for out in resampler.resample(None): # flush buffered samples
+            chunks.append(out.to_ndarray().reshape(-1))
+    if not chunks:
+        return np.zeros(0, dtype = np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy = False)
+
+def _decode_ffmpeg_pipe(src, sr, partial = False):
+    data = None
+    if hasattr(src, "read"): # feed in-memory input through stdin
+        data, src = src.read(), "pipe:0"
+    proc = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(src), "-ac", "1", "-ar", str(sr), "-f", "f32le", "pipe:1"],
+        input = data,
+        check = not partial, # ffmpeg exits non-zero on a truncated tail but still emits what it decoded
+        stdout = subprocess.PIPE,
+        stderr = subprocess.DEVNULL,
+    )
+    return np.frombuffer(proc.stdout, dtype = "<f4").copy()
+
+# decodes a container that arrives in pieces (a streamed recording) without ever decoding a byte twice: PyAV reads
+# this object as a non-seekable file on a background thread, keeping one demuxer/codec/resampler context for the
+# whole stream. feed() returns the samples the new bytes completed. Formats that need seeking (MP4 with the index at
+# the end) set `error`; callers fall back to decode_audio(partial = True)
+class IncrementalDecoder:
+    def __init__(self, sr = SAMPLE_RATE):
+        self.sr = sr
+        self.error = None
+        self._buf = bytearray()
+        self._out = [] # decoded blocks not handed out yet
+        self._cond = threading.Condition()
+        self._eof = self._stop = self._done = False
+        self._hungry = False # the demuxer is blocked in read() waiting for bytes
+        self._thread = threading.Thread(target = self._run, name = "stream-decode", daemon = True)
+        self._thread.start()
+
+    # append bytes (`last` = end of stream, flushes the decoder) and wait until they are consumed
+    # -> float32 samples decoded since the previous call
+    def feed(self, data, last = False, timeout = 10):
+        with self._cond:
+            self._buf.extend(data)
+            self._eof = self._eof or last
+            self._hungry = False
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._done or (self._hungry and not self._buf), timeout)
+            out, self._out = self._out, []
+        return np.concatenate(out) if out else np.zeros(0, dtype = np.float32)
+
+    def close(self):
+        with self._cond:
+            self._stop = self._eof = True
+            self._cond.notify_all()
+
+    def read(self, n):
+        with self._cond:
+            while not self._buf and not self._eof:
+                self._hungry = True
+                self._cond.notify_all()
+                self._cond.wait()
+            if self._stop:
+                return b""
+            out = bytes(self._buf[:n])
+            del self._buf[:n]
+            return out
+
+    def _emit(self, frames):
+        blocks = [f.to_ndarray().reshape(-1).astype(np.float32, copy = False) for f in frames]
+        if blocks:
+            with self._cond:
+                self._out.extend(blocks)
+
+    def _run(self):
+        try:
+            with av.open(self) as container:
+                resampler = av.AudioResampler(format = "flt", layout = "mono", rate = self.sr)
+                try:
+                    for frame in container.decode(audio = 0):
+                        self._emit(resampler.resample(frame))
+                        if self._stop:
+                            return
+                except av.error.FFmpegError:
+                    if not self._eof: # a truncated tail at the end is expected; mid-stream it is a real failure
+                        raise
+                self._emit(resampler.resample(None)) # flush buffered samples
+        except Exception as e:
+            if not self._stop:
+                self.error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+# container, codec, rate, channels and header duration (None = not in the header, e.g. MediaRecorder WebM) of a
+# possibly still-growing file; raises ValueError when it isn't audio
+def probe_audio(src):
+    if av is None:
+        return _probe_ffprobe(src)
+    try:
+        container = av.open(str(src))
+    except av.error.FFmpegError as e:
+        raise ValueError(f"unrecognized audio format ({e.strerror or e})")
+    with container:
+        if not container.streams.audio:
+            raise ValueError("no audio stream")
+        stream = container.streams.audio[0]
+        duration = None
+        if stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration:
+            duration = container.duration / av.time_base
+        ctx = stream.codec_context
+        return {"format": container.format.name, "codec": ctx.name, "sample_rate": ctx.sample_rate, "channels": ctx.channels, "duration": duration}
+
+def _probe_ffprobe(src):
+    proc = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=format_name,duration:stream=codec_type,codec_name,sample_rate,channels", "-of", "json", str(src)],
+        stdout = subprocess.PIPE,
+        stderr = subprocess.DEVNULL,
+    )
+    info = json.loads(proc.stdout or b"{}")
+    streams = [s for s in info.get("streams", []) if s.get("codec_type") == "audio"]
+    if not streams:
+        raise ValueError("unrecognized audio format" if proc.returncode else "no audio stream")
+    fmt, stream = info.get("format", {}), streams[0]
+    return {
+        "format": fmt.get("format_name"), "codec": stream.get("codec_name"), "sample_rate": int(stream.get("sample_rate") or 0),
+        "channels": stream.get("channels"), "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+    }
+
+# seconds of audio from packet timestamps (demux only, no decoding) for files whose header has no duration
+# raises ValueError when the file can't be read
+def audio_duration(src):
+    if av is None:
+        try:
+            return len(decode_audio(src)) / SAMPLE_RATE
+        except subprocess.CalledProcessError:
+            raise ValueError("undecodable audio")
+    end = 0.0
+    try:
+        with av.open(str(src)) as container:
+            stream = container.streams.audio[0]
+            for packet in container.demux(stream):
+                if packet.pts is not None:
+                    end = max(end, float((packet.pts + (packet.duration or 0)) * packet.time_base))
+    except av.error.FFmpegError as e:
+        raise ValueError(f"undecodable audio ({e.strerror or e})")
+    return end
+
+# wrap samples as a Praat Sound without touching disk
+def to_sound(samples, sr = SAMPLE_RATE):
+    import parselmouth # only the Praat pitch backend needs it
+    return parselmouth.Sound(np.asarray(samples, dtype = np.float64), sampling_frequency = sr)
+
+COLD_FORMATS = { # suffix -> (container, codec, sample format) for compressed archive copies
+    ".flac": ("flac", "flac", "s16"), # lossless: re-analysis gives identical scores
+    ".opus": ("ogg", "libopus", "flt"), # lossy but ~10x smaller than FLAC for speech
+}
+
+# write float32 mono samples compressed by `path`'s suffix (see COLD_FORMATS)
+def encode_audio(path, y, sr = SAMPLE_RATE):
+    fmt, codec, sample_fmt = COLD_FORMATS[Path(path).suffix.lower()]
+    y = np.clip(np.asarray(y, dtype = np.float32), -1, 1)
+
+    if av is None: # same fallback as decoding: pipe raw samples through the ffmpeg CLI
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0", "-c:a", codec, "-f", fmt, str(path)],
+            input = y.tobytes(),
+            check = True,
+        )
+        return
+
+    with av.open(str(path), "w", format = fmt) as container:
+        stream = container.add_stream(codec, rate = sr)
+        stream.layout = "mono"
+        step = stream.codec_context.frame_size or 1024 # opus wants fixed-size frames
+        if sample_fmt == "s16":
+            y = (y * 32767).astype("<i2")
+        for i in range(0, len(y), step):
+            chunk = y[i:i + step]
+            if len(chunk) < step and codec == "libopus": # pad the final opus frame
+                chunk = np.pad(chunk, (0, step - len(chunk)))
+            frame = av.AudioFrame.from_ndarray(chunk.reshape(1, -1), format = sample_fmt, layout = "mono")
+            frame.sample_rate = sr
+            frame.pts = i
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None): # flush
+            container.mux(packet)
+
+# write float32 samples as 16-bit PCM WAV (debugging / synthetic audio)
+def write_wav(path, y, sr = SAMPLE_RATE):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
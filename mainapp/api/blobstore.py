@@ -0,0 +1,123 @@
+from pathlib import Path
+from uuid import uuid4
+import os
+import shutil
+
+# shared object storage behind each node's local Storage: uploads, compare artifacts and TTS clips are written
+# through to it, and a node that lacks a file locally fetches it from there, so any worker can serve any request
+# keys: "uploads/<name>", "uploads/<name>.json" (sidecar), "runs/<run_id>/<file>", "tts/<file>"
+
+# a directory every node mounts (NFS, EFS, a shared volume); also the filesystem stand-in for S3 in development
+class LocalBlobStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents = True, exist_ok = True)
+
+    def put(self, key, path):
+        dest = self.root / key
+        dest.parent.mkdir(parents = True, exist_ok = True)
+        tmp = dest.with_name(f".{dest.name}.{uuid4().hex}.part")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dest) # readers on other nodes never see half a file
+
+    # copy `key` to `dest` -> False if it doesn't exist
+    def get(self, key, dest):
+        src = self.root / key
+        if not src.is_file():
+            return False
+        tmp = Path(dest).with_name(f".{Path(dest).name}.{uuid4().hex}.part")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+        return True
+
+    def exists(self, key):
+        return (self.root / key).is_file()
+
+    def delete(self, key):
+        (self.root / key).unlink(missing_ok = True)
+
+    # readable binary file, or None
+    def open(self, key):
+        try:
+            return open(self.root / key, "rb")
+        except FileNotFoundError:
+            return None
+
+    def url(self, key, expires = 3600): # no direct URL: the app streams the file
+        return None
+
+# S3 or anything speaking its API (MinIO, Ceph, R2); boto3 is only needed when this backend is configured
+# `client` = a ready boto3-style client (e.g. a fake in development); otherwise one is built from `client_kw`
+class S3BlobStore:
+    def __init__(self, bucket, prefix = "", client = None, **client_kw):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("BLOB_BACKEND=s3 needs boto3 (pip install boto3)")
+            client = boto3.client("s3", **{k: v for k, v in client_kw.items() if v is not None})
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def put(self, key, path):
+        self.client.upload_file(str(path), self.bucket, self.prefix + key)
+
+    def get(self, key, dest):
+        tmp = Path(dest).with_name(f".{Path(dest).name}.{uuid4().hex}.part")
+        try:
+            self.client.download_file(self.bucket, self.prefix + key, str(tmp))
+        except Exception as e:
+            Path(tmp).unlink(missing_ok = True)
+            if _missing(e):
+                return False
+            raise
+        os.replace(tmp, dest)
+        return True
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket = self.bucket, Key = self.prefix + key)
+        except Exception as e:
+            if _missing(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key):
+        self.client.delete_object(Bucket = self.bucket, Key = self.prefix + key)
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket = self.bucket, Key = self.prefix + key)["Body"]
+        except Exception as e:
+            if _missing(e):
+                return None
+            raise
+
+    # presigned GET: the browser downloads straight from the bucket
+    def url(self, key, expires = 3600):
+        return self.client.generate_presigned_url("get_object", Params = {"Bucket": self.bucket, "Key": self.prefix + key}, ExpiresIn = expires)
+
+# botocore ClientError for a missing key (checked by shape so botocore stays optional)
+def _missing(e):
+    code = str(getattr(e, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+# backend from config: BLOB_BACKEND None (single node: local paths are the only copy), "local" or "s3"
+def blobstore_from_config(cfg):
+    backend = cfg.get("BLOB_BACKEND")
+    if not backend:
+        return None
+    if backend == "local":
+        if not cfg.get("BLOB_ROOT"):
+            raise RuntimeError("BLOB_BACKEND=local needs BLOB_ROOT (a directory shared by all nodes)")
+        return LocalBlobStore(cfg["BLOB_ROOT"])
+    if backend == "s3":
+        return S3BlobStore(
+            cfg.get("S3_BUCKET"),
+            prefix = cfg.get("S3_PREFIX") or "",
+            endpoint_url = cfg.get("S3_ENDPOINT_URL"), # e.g. http://minio:9000
+            region_name = cfg.get("S3_REGION"),
+        )
+    raise RuntimeError(f"unknown BLOB_BACKEND {backend!r} (expected 'local' or 's3')")
@@ -0,0 +1,79 @@
+from pathlib import Path
+from uuid import uuid4
+from flask import current_app, request, send_file, Response
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+import gzip
+import hashlib
+import mimetypes
+import os
+
+# uploads, compare artifacts and TTS clips are named by uuid / run_id / content hash and never rewritten in place,
+# so browsers and CDNs may keep them for good: replays and re-opened plots cost no request at all
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DATA_ROOT = Path(__file__).resolve().parent.parent # uploads/ and artifacts/ live here (X-Accel-Redirect paths are relative to it)
+COMPRESSIBLE = {".json", ".svg", ".csv", ".txt"} # audio and PNG are compressed already: gzip only costs CPU
+MIN_COMPRESS = 1024 # bytes; smaller files aren't worth a variant
+
+# serve `directory/filename` as immutable content:
+# - strong ETag from `key` + size (same on every node, unlike mtime) and If-None-Match -> 304
+# - Range requests (seeking in audio) -> 206
+# - a gzip sibling for text artifacts when the client accepts it
+# - STATIC_OFFLOAD "x-accel" / "x-sendfile": the front proxy sends the bytes, the app only sets headers
+# `private` = user recordings: browsers may cache them, shared caches may not
+def send_immutable(directory, filename, key, private = False):
+    path = safe_join(str(directory), filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    path = Path(path)
+    mimetype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    encoding = None
+    if path.suffix in COMPRESSIBLE and "gzip" in request.accept_encodings and path.stat().st_size >= MIN_COMPRESS:
+        gz = precompressed(path)
+        if gz is not None:
+            path, encoding = gz, "gzip"
+    etag = hashlib.sha256(f"{key}:{encoding}:{path.stat().st_size}".encode("utf-8")).hexdigest()[:32]
+
+    offload = current_app.config.get("STATIC_OFFLOAD")
+    if offload: # headers only: the proxy handles Range and the body
+        resp = Response(mimetype = mimetype)
+        if offload == "x-accel": # nginx: `location <STATIC_ACCEL_PREFIX>/ { internal; alias <DATA_ROOT>/; }`
+            prefix = current_app.config.get("STATIC_ACCEL_PREFIX", "/_files").rstrip("/")
+            resp.headers["X-Accel-Redirect"] = f"{prefix}/{path.relative_to(DATA_ROOT).as_posix()}"
+        else: # "x-sendfile": Apache mod_xsendfile, lighttpd
+            resp.headers["X-Sendfile"] = str(path)
+        resp.set_etag(etag)
+        resp = resp.make_conditional(request)
+    else:
+        resp = send_file(path, mimetype = mimetype, etag = etag, conditional = True)
+
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    if path.suffix in COMPRESSIBLE or encoding:
+        resp.vary.add("Accept-Encoding")
+    return immutable(resp, private)
+
+# long-lived Cache-Control for content that never changes under its URL
+def immutable(resp, private = False):
+    resp.cache_control.no_cache = None
+    resp.cache_control.max_age = current_app.config.get("STATIC_MAX_AGE", IMMUTABLE_MAX_AGE)
+    resp.cache_control.immutable = True
+    if private:
+        resp.cache_control.private = True
+    else:
+        resp.cache_control.public = True
+    return resp
+
+# `<path>.gz`, written once next to the file (atomic, so concurrent first requests are safe) -> None if gzip doesn't help
+def precompressed(path):
+    gz = path.with_name(path.name + ".gz")
+    if gz.exists():
+        return gz
+    data = gzip.compress(path.read_bytes(), compresslevel = 9, mtime = 0)
+    if len(data) >= path.stat().st_size * 0.9:
+        return None
+    tmp = path.with_name(f".{gz.name}.{uuid4().hex}.part")
+    tmp.write_bytes(data)
+    os.replace(tmp, gz)
+    return gz
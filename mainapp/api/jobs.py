@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from uuid import uuid4
+import logging
+import multiprocessing
+import threading
+import time
+from mainapp import metrics
+
+log = logging.getLogger(__name__)
+
+class QueueFull(Exception): # raised when max_pending jobs are already queued/running
+    pass
+
+class Job:
+    def __init__(self, job_id, future):
+        self.job_id = job_id
+        self.future = future
+        self.created_at = time.time()
+        self.finished_at = None
+        self.result = None # payload returned to the client when done
+        self.error = None
+
+    def status(self):
+        if self.finished_at is not None:
+            return "error" if self.error else "done"
+        return "running" if self.future.running() else "queued"
+
+    def to_dict(self):
+        d = {"job_id": self.job_id, "status": self.status()}
+        if self.result is not None:
+            d["result"] = self.result
+        if self.error:
+            d["error"] = self.error
+        return d
+
+# bounded pool for CPU-heavy work that must not run on the web threads
+class JobQueue:
+    # on_finish(job) runs after a job is marked done/error (e.g. to mirror it into a shared registry)
+    def __init__(self, workers = 2, max_pending = 32, executor = "process", ttl = 600, on_finish = None):
+        if executor == "process":
+            # spawn: forking a threaded web server is unsafe; workers are long-lived so startup is paid once
+            self.pool = ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context("spawn"))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers = workers)
+
+        self.max_pending = max_pending # backpressure: refuse new work past this
+        self.ttl = ttl # seconds a finished job stays fetchable
+        self.on_finish = on_finish
+        self.jobs = {} # job_id -> Job
+        self.pending = 0
+        self.cond = threading.Condition() # guards jobs/pending; notified when any job finishes
+
+    # run fn(*args) in the pool; on_done(result) runs in this process before the job is marked done
+    # `job_id` lets the caller register the job elsewhere before it can finish (default: a new uuid)
+    def submit(self, fn, *args, on_done = None, job_id = None):
+        with self.cond:
+            self._prune()
+            if self.pending >= self.max_pending:
+                raise QueueFull()
+            self.pending += 1
+
+            try:
+                future = self.pool.submit(fn, *args)
+            except Exception:
+                self.pending -= 1
+                raise
+
+            job = Job(job_id or uuid4().hex, future)
+            self.jobs[job.job_id] = job
+
+        job.future.add_done_callback(lambda fut: self._finish(job, fut, on_done))
+        return job
+
+    def _finish(self, job, fut, on_done):
+        metrics.observe("job_seconds", time.time() - job.created_at) # queue wait + run, as the client sees it
+        result, error = None, None
+        try:
+            result = fut.result()
+            if on_done is not None:
+                result = on_done(result)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        with self.cond:
+            job.result, job.error = result, error
+            job.finished_at = time.time()
+            self.pending -= 1
+            self.cond.notify_all() # wake long-pollers
+
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception:
+                log.exception("job %s: on_finish failed", job.job_id)
+
+    def get(self, job_id):
+        with self.cond:
+            return self.jobs.get(job_id)
+
+    # block up to `timeout` seconds for the job to finish (long-poll)
+    def wait(self, job_id, timeout = 0):
+        deadline = time.time() + timeout
+        with self.cond:
+            job = self.jobs.get(job_id)
+            while job is not None and job.finished_at is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            return job
+
+    def depth(self):
+        return self.pending
+
+    def _prune(self): # drop finished jobs older than ttl (caller holds cond)
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        self.pool.shutdown(wait = False, cancel_futures = True)
@@ -0,0 +1,143 @@
+from pathlib import Path
+import numpy as np
+from mainapp import metrics
+from mainapp.api.audio import SAMPLE_RATE
+
+HOP = 0.01 # default seconds per pitch frame
+PITCH_FLOOR, PITCH_CEILING = 75.0, 500.0 # default search range (Hz)
+AUTO_FLOOR, AUTO_CEILING = 50.0, 800.0 # wide range the per-speaker estimate searches + clamps to
+YIN_THRESHOLD = 0.15 # first dip of the normalized difference function below this = the period
+YIN_SILENCE_DB = -35 # frames this far below the utterance's loudest frame are unvoiced
+YIN_CHUNK = 256 # frames per FFT block: bounds memory on big batches, stays cache-sized
+
+# return time array + f0 array (Hz, NaN where unvoiced) + duration
+# `audio`: float32 samples at 16 kHz, a parselmouth.Sound, or a file path
+# floor/ceiling None = estimate the speaker's range from this recording first (estimate_range)
+def extract_f0(audio, backend = "praat", hop = HOP, floor = PITCH_FLOOR, ceiling = PITCH_CEILING):
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown pitch backend {backend!r} (expected one of {sorted(BACKENDS)})")
+    sound = None
+    if isinstance(audio, (str, Path)):
+        from mainapp.api.audio import decode_audio
+        audio = decode_audio(audio)
+    if hasattr(audio, "to_pitch"): # parselmouth.Sound (checked by duck type so parselmouth stays optional)
+        sound, samples, sr = audio, audio.values[0], audio.sampling_frequency
+    else:
+        samples, sr = np.asarray(audio, dtype = np.float32), SAMPLE_RATE
+
+    if floor is None or ceiling is None:
+        lo, hi = estimate_range(samples, sr)
+        floor, ceiling = floor or lo, ceiling or hi
+
+    with metrics.span("pitch"):
+        t, f0 = BACKENDS[backend](samples, sr, hop, floor, ceiling, sound)
+    return t, f0, len(samples) / sr
+
+# --- backends: (samples, sr, hop, floor, ceiling, sound) -> (t, f0) ---
+
+# Praat's autocorrelation tracker (the reference implementation; needs parselmouth)
+def praat_f0(samples, sr, hop, floor, ceiling, sound = None):
+    if sound is None:
+        from mainapp.api.audio import to_sound
+        sound = to_sound(samples, sr)
+    pitch = sound.to_pitch(time_step = hop, pitch_floor = floor, pitch_ceiling = ceiling)
+    f0 = pitch.selected_array["frequency"] # Hz; 0 where unvoiced
+    return pitch.xs(), np.where(f0 > 0, f0, np.nan)
+
+# pure-NumPy YIN for one utterance
+def yin_f0(samples, sr, hop, floor, ceiling, sound = None):
+    return yin_batch([samples], sr, hop, floor, ceiling)[0]
+
+BACKENDS = {"praat": praat_f0, "yin": yin_f0}
+
+# YIN (de Cheveigné & Kawahara 2002) over many utterances at once -> [(t, f0), ...]
+# every frame of every signal is one row of a strided frame matrix; the difference function for all rows
+# comes from one FFT cross-correlation + running energy sums
+def yin_batch(signals, sr = SAMPLE_RATE, hop = HOP, floor = PITCH_FLOOR, ceiling = PITCH_CEILING, threshold = YIN_THRESHOLD):
+    tau_min = max(2, int(sr / ceiling))
+    tau_max = int(np.ceil(sr / floor))
+    win = tau_max # integration window: one period of the lowest allowed pitch
+    n = win + tau_max + 1 # frame length: the window plus the largest lag
+    step = max(1, int(round(hop * sr)))
+
+    frames, counts = [], []
+    for x in signals:
+        x = np.asarray(x, dtype = np.float32) # float32 FFTs: half the memory traffic, ample precision for YIN
+        if len(x) < n:
+            x = np.pad(x, (0, n - len(x)))
+        view = np.lib.stride_tricks.sliding_window_view(x, n)[::step] # no copy until the concatenate below
+        frames.append(view)
+        counts.append(len(view))
+    frames = np.concatenate(frames)
+
+    f0, level = [], []
+    for i in range(0, len(frames), YIN_CHUNK):
+        f, e = _yin_frames(frames[i:i + YIN_CHUNK], sr, win, tau_min, tau_max, threshold)
+        f0.append(f)
+        level.append(e)
+    f0, level = np.concatenate(f0), np.concatenate(level)
+
+    out, start = [], 0
+    for count in counts:
+        f, e = f0[start:start + count], level[start:start + count]
+        quiet = e <= (e.max() if len(e) else 0) * 10 ** (YIN_SILENCE_DB / 10) # energy ratio, so /10; <= so digital silence is unvoiced
+        t = (np.arange(count) * step + n / 2) / sr # frame centres
+        out.append((t, np.where(quiet, np.nan, f)))
+        start += count
+    return out
+
+# f0 (NaN = no period found) + window energy for a block of frames (rows)
+def _yin_frames(x, sr, win, tau_min, tau_max, threshold):
+    rows = len(x)
+    size = _fft_size(x.shape[1]) # >= frame length: negative lags of the circular correlation land above tau_max
+    spec = np.fft.rfft(x, size)
+    r = np.fft.irfft(spec * np.conj(np.fft.rfft(x[:, :win], size)), size)[:, :tau_max + 1] # r[tau] = sum_j<win x[j] x[j+tau]
+
+    cs = np.zeros((rows, x.shape[1] + 1), dtype = x.dtype)
+    np.cumsum(x * x, axis = 1, out = cs[:, 1:])
+    lags = np.arange(tau_max + 1)
+    e0 = cs[:, win]
+    d = e0[:, None] + (cs[:, win:win + tau_max + 1] - cs[:, :tau_max + 1]) - 2 * r # squared difference per lag
+
+    dn = np.ones_like(d) # cumulative-mean-normalized difference (dn[0] = 1 by definition)
+    dn[:, 1:] = d[:, 1:] * lags[1:] / np.maximum(np.cumsum(d[:, 1:], axis = 1), 1e-12)
+
+    sub = dn[:, tau_min:tau_max] # candidate lags (tau_max excluded so tau + 1 exists for interpolation)
+    below = sub < threshold
+    found = below.any(axis = 1)
+    first = below.argmax(axis = 1)
+    rising = np.ones_like(below)
+    rising[:, :-1] = sub[:, 1:] >= sub[:, :-1]
+    tau = (rising & (np.arange(sub.shape[1]) >= first[:, None])).argmax(axis = 1) + tau_min # bottom of the first dip
+
+    idx = np.arange(rows)
+    a, b, c = dn[idx, tau - 1], dn[idx, tau], dn[idx, tau + 1]
+    denom = a - 2 * b + c
+    shift = np.clip(np.where(np.abs(denom) > 1e-12, 0.5 * (a - c) / np.where(denom == 0, 1, denom), 0), -1, 1) # parabolic peak
+    f0 = sr / (tau + shift)
+    return np.where(found, f0, np.nan), e0
+
+# smallest 2^a 3^b 5^c >= n (pocketfft is fast on these; ~1.5x less work than the next power of two here)
+def _fft_size(n):
+    best = 1 << int(np.ceil(np.log2(n)))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            size = p35
+            while size < n:
+                size *= 2
+            best = min(best, size)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+# speaker f0 range from a quick wide-range YIN pass (De Looze & Hirst: quantile-based floor/ceiling)
+# floor reaches further down than the usual 0.75 * q35 because Mandarin tone 3 dips well below the mid range
+def estimate_range(samples, sr = SAMPLE_RATE):
+    _, f0 = yin_batch([samples], sr, 0.02, AUTO_FLOOR, AUTO_CEILING)[0]
+    voiced = f0[np.isfinite(f0)]
+    if len(voiced) < 5:
+        return PITCH_FLOOR, PITCH_CEILING
+    q35, q65 = np.percentile(voiced, [35, 65])
+    return float(np.clip(0.65 * q35, AUTO_FLOOR, PITCH_CEILING)), float(np.clip(1.9 * q65, PITCH_FLOOR * 2, AUTO_CEILING))
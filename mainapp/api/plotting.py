@@ -0,0 +1,47 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import io
+import threading
+import numpy as np
+from mainapp import metrics
+
+PLOT_DPI = 160
+PLOT_SIZE = (8, 3) # wide, short
+
+_local = threading.local() # one reusable figure per thread (no pyplot global state, safe in Flask threads)
+
+def _figure():
+    fig = getattr(_local, "fig", None)
+    if fig is None:
+        fig = Figure(figsize = PLOT_SIZE)
+        FigureCanvasAgg(fig) # attach an Agg canvas directly; no GUI backend involved
+        fig.add_subplot(111)
+        _local.fig = fig
+    return fig
+
+# render the f0 track + highlighted bad spans to PNG bytes
+def render_plot_png(pitch, title):
+    with metrics.span("plot"):
+        return _render_plot_png(pitch, title)
+
+def _render_plot_png(pitch, title):
+    fig = _figure()
+    ax = fig.axes[0]
+    ax.clear() # reuse the figure instead of building a new one per plot
+
+    t = np.asarray(pitch["t"], dtype = float)
+    f0 = np.array([np.nan if v is None else v for v in pitch["f0"]], dtype = float) # JSON null -> NaN (gap in line)
+    ax.plot(t, f0, linewidth = 1) # pitch track
+
+    for (a, b) in pitch["bad_spans"]:
+        ax.axvspan(a, b, alpha = 0.25) # highlight mistakes
+
+    ax.set_xlabel("time (s)")
+    ax.set_ylabel("f0 (Hz)")
+    ax.set_title(title)
+
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format = "png", dpi = PLOT_DPI)
+    return buf.getvalue()
@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify, current_app
+from mainapp.db import get_session
+from mainapp.phrases import get_phrase_by_id
+from mainapp import analytics, scheduler
+
+progressapp = Blueprint("progressroutes", __name__)
+
+# score history + running stats + daily trend for one phrase
+@progressapp.get("/phrases/<phrase_id>")
+def phrase_progress(phrase_id):
+    if not get_phrase_by_id(phrase_id):
+        return jsonify({"error": "unknown phrase_id"}), 404
+    db = get_session(current_app)()
+    limit = min(max(request.args.get("limit", 50, type = int), 1), 500)
+    return jsonify(analytics.phrase_progress(db, phrase_id, limit))
+
+# mean score + pass rate per tone (1-4, 5 = neutral)
+@progressapp.get("/tones")
+def tones():
+    return jsonify({"tones": analytics.tone_accuracy(get_session(current_app)())})
+
+# lowest mean-scoring syllables (with at least ?min_attempts=3 scored attempts)
+@progressapp.get("/syllables/weakest")
+def weakest():
+    db = get_session(current_app)()
+    return jsonify({"syllables": analytics.weakest_syllables(
+        db,
+        limit = min(max(request.args.get("limit", 10, type = int), 1), 100),
+        min_attempts = max(request.args.get("min_attempts", 3, type = int), 1),
+    )})
+
+# daily mean scores over ?days=30, for ?phrase_id= or all phrases
+@progressapp.get("/trend")
+def trend():
+    db = get_session(current_app)()
+    days = min(max(request.args.get("days", 30, type = int), 1), 365)
+    return jsonify(analytics.trend(db, request.args.get("phrase_id", ""), days))
+
+# the calling learner's review queue (X-Learner-Id header)
+@progressapp.get("/learner")
+def learner():
+    from mainapp.api.api import learner_id_from_request
+    learner_id = learner_id_from_request()
+    if not learner_id:
+        return jsonify({"error": "missing or malformed X-Learner-Id"}), 400
+    return jsonify(scheduler.learner_summary(get_session(current_app)(), learner_id))
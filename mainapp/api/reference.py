@@ -0,0 +1,166 @@
+from pathlib import Path
+from uuid import uuid4
+import json
+import os
+import numpy as np
+
+STORE_VERSION = 1
+HOP = 0.01 # seconds per contour frame (same as extract_f0's time_step)
+DTW_BAND = 0.25 # Sakoe-Chiba band half-width as a fraction of the longer contour
+MIN_BAND = 10 # frames; keeps short contours from getting a uselessly narrow band
+SEMITONE_PENALTY = 30 # score points lost per semitone of mean contour distance
+
+# f0 (Hz, NaN = unvoiced) -> (contour, first, last): semitones around the median, unvoiced ends trimmed,
+# interior gaps interpolated; first/last are frame indexes of the trimmed span in the input
+def normalize_contour(f0):
+    voiced = np.flatnonzero(np.isfinite(f0) & (f0 > 0))
+    if len(voiced) < 2:
+        return np.zeros(0, dtype = np.float32), 0, 0
+
+    first, last = voiced[0], voiced[-1]
+    seg = f0[first:last + 1]
+    idx = np.arange(len(seg))
+    ok = np.isfinite(seg)
+    seg = np.interp(idx, idx[ok], seg[ok]) # bridge unvoiced gaps (consonants) inside the utterance
+
+    st = 12 * np.log2(seg / np.median(seg)) # speaker-independent: semitones relative to own median
+    return st.astype(np.float32), int(first), int(last)
+
+# banded DTW between contours x (n) and y (m); O(n * w) time and memory
+# returns the warping path as two int arrays (i into x, j into y) and the mean |x - y| along it
+def banded_dtw(x, y, band = None):
+    n, m = len(x), len(y)
+    if band is None:
+        band = max(MIN_BAND, int(DTW_BAND * max(n, m)))
+    width = 2 * band + 1
+
+    centers = np.round(np.arange(n) * ((m - 1) / max(1, n - 1))).astype(int) # diagonal through (0,0) and (n-1,m-1)
+    lo = np.clip(centers - band, 0, m - 1) # first column stored for each row
+    D = np.full((n, width), np.inf) # D[i, k] = cost at (i, lo[i] + k)
+
+    for i in range(n):
+        cols = np.arange(lo[i], min(m, lo[i] + width))
+        c = np.abs(x[i] - y[cols]) # local cost over the band
+        k = len(cols)
+
+        if i == 0:
+            best_prev = np.full(k, np.inf)
+            best_prev[0] = 0.0 # path must start at (0, 0)
+        else:
+            prev = D[i - 1]
+            pj = cols - lo[i - 1] # same column in previous row
+            up = np.where((pj >= 0) & (pj < width), prev[np.clip(pj, 0, width - 1)], np.inf)
+            diag = np.where((pj - 1 >= 0) & (pj - 1 < width), prev[np.clip(pj - 1, 0, width - 1)], np.inf)
+            best_prev = np.minimum(up, diag)
+
+        # horizontal moves inside the row: D[j] = min(c[j] + best_prev[j], c[j] + D[j-1]) is a min-plus prefix scan
+        # -> D[j] = C[j] + min_{k<=j}(best_prev[k] - C[k-1]) with C = cumsum(c)
+        C = np.cumsum(c)
+        C_prev = C - c
+        D[i, :k] = C + np.minimum.accumulate(best_prev - C_prev)
+
+    # backtrack from (n-1, m-1)
+    def cost(i, j):
+        k = j - lo[i]
+        return D[i, k] if 0 <= k < width and i >= 0 and j >= 0 else np.inf
+
+    i, j = n - 1, m - 1
+    path_i, path_j = [i], [j]
+    while i > 0 or j > 0:
+        steps = [(cost(i - 1, j - 1), i - 1, j - 1), (cost(i - 1, j), i - 1, j), (cost(i, j - 1), i, j - 1)]
+        _, i, j = min(steps, key = lambda s: s[0])
+        path_i.append(i)
+        path_j.append(j)
+
+    pi = np.array(path_i[::-1])
+    pj = np.array(path_j[::-1])
+    return pi, pj, float(np.mean(np.abs(x[pi] - y[pj])))
+
+# per-syllable alignment of a user contour to a reference contour with syllable bounds (frame indexes)
+# -> list of (user_first_frame, user_last_frame, score) per reference syllable, plus overall score;
+# a syllable no path step maps to (empty bounds) is (None, None, None) and left out of the overall score
+def align_syllables(user, ref, ref_bounds):
+    pi, pj, _ = banded_dtw(user, ref)
+    dist = np.abs(user[pi] - ref[pj])
+    syl = np.searchsorted(ref_bounds, pj, side = "right") - 1 # reference syllable for each path step
+    syl = np.clip(syl, 0, len(ref_bounds) - 2)
+
+    out = []
+    for k in range(len(ref_bounds) - 1):
+        sel = syl == k
+        if not sel.any():
+            out.append((None, None, None))
+            continue
+        score = max(0.0, 100 - SEMITONE_PENALTY * float(dist[sel].mean()))
+        out.append((int(pi[sel].min()), int(pi[sel].max()), int(round(score))))
+
+    scored = [s for _, _, s in out if s is not None]
+    overall = int(round(np.mean(scored))) if scored else 0
+    return out, overall
+
+# reference contours for all phrases in one float32 file, memory-mapped read-only
+class ReferenceStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self._mtime = None
+        self._index = {}
+        self._data = None
+
+    def _load(self): # (re)map when a build has replaced the files
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            self._index, self._data, self._mtime = {}, None, None
+            return
+        if mtime == self._mtime:
+            return
+
+        index = json.loads(self.index_path.read_text())
+        if index.get("version") != STORE_VERSION:
+            self._index, self._data, self._mtime = {}, None, mtime
+            return
+        size = index["size"]
+        self._data = np.memmap(self.root / index["data"], dtype = np.float32, mode = "r", shape = (size,)) if size else None
+        self._index = index["phrases"]
+        self._mtime = mtime
+
+    def __contains__(self, phrase_id):
+        self._load()
+        return phrase_id in self._index
+
+    # -> (contour view, syllable bounds) or None
+    def get(self, phrase_id):
+        self._load()
+        entry = self._index.get(phrase_id)
+        if entry is None or self._data is None:
+            return None
+        start, length = entry["offset"], entry["length"]
+        return self._data[start:start + length], np.asarray(entry["bounds"])
+
+    # write {phrase_id: (contour, bounds)} as a fresh store; readers keep their old mapping until the index flips
+    def write(self, contours):
+        self.root.mkdir(parents = True, exist_ok = True)
+        index, offset = {}, 0
+        data_name = f"contours-{uuid4().hex[:12]}.f32" # new file per build so a live mapping is never overwritten
+        with open(self.root / data_name, "wb") as f:
+            for phrase_id in sorted(contours):
+                contour, bounds = contours[phrase_id]
+                arr = np.asarray(contour, dtype = "<f4")
+                f.write(arr.tobytes())
+                index[phrase_id] = {"offset": offset, "length": len(arr), "bounds": [int(b) for b in bounds]}
+                offset += len(arr)
+
+        tmp_index = self.index_path.with_suffix(".json.tmp")
+        tmp_index.write_text(json.dumps({"version": STORE_VERSION, "hop": HOP, "data": data_name, "size": offset, "phrases": index}))
+        os.replace(tmp_index, self.index_path) # atomic flip; readers remap when its mtime changes
+        self._mtime = None
+
+        for old in self.root.glob("contours-*.f32"): # unlinking is safe: existing mmaps keep the old inode alive
+            if old.name != data_name:
+                old.unlink(missing_ok = True)
+
+    def items(self):
+        self._load()
+        for phrase_id in self._index:
+            yield phrase_id, self.get(phrase_id)
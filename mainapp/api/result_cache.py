@@ -0,0 +1,120 @@
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import delete
+from mainapp.models import CompareResult
+from mainapp import metrics
+import hashlib
+import json
+import threading
+
+# modules whose code (and constants: thresholds, hop, VAD levels...) decide a score; any edit to them changes the
+# scorer version, so results computed by older code stop matching without a manual version bump
+# (paths relative to mainapp/api; ../phrases.py holds tone parsing and the sandhi rules)
+SCORER_MODULES = ("audio.py", "pitch.py", "segment.py", "reference.py", "scoring.py", "tone_models.py", "analysis.py", "../phrases.py")
+
+_version = None
+
+# short fingerprint of the scoring code (read from source: hashing must not import numpy/Praat)
+def scorer_version():
+    global _version
+    if _version is None:
+        h = hashlib.sha256()
+        for name in SCORER_MODULES:
+            h.update(name.encode("utf-8"))
+            h.update((Path(__file__).resolve().parent / name).read_bytes())
+        _version = h.hexdigest()[:16]
+    return _version
+
+# sha256 of a file, read in 64 KiB blocks
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# cache key for one compare: same audio bytes + phrase text and scored tones + scorer code + analysis options
+# (+ reference contour, + tone template build) = same result; `phrase` is a registry dict
+def result_key(audio_sha256, phrase, pitch, segmentation, reference = None, templates = None):
+    ref = None
+    if reference is not None: # `flask build-references` may have rebuilt it since
+        contour, bounds = reference
+        ref = hashlib.sha256(contour.tobytes() + bounds.tobytes()).hexdigest()
+    payload = json.dumps({
+        "audio": audio_sha256, "phrase_id": phrase["phrase_id"], "scorer": scorer_version(),
+        "phrase": [phrase.get("hanzi"), phrase.get("pinyin"), list(phrase.get("surface_tones") or [])], # an edited row must not hit old scores
+        "pitch": pitch, "segmentation": segmentation, "reference": ref,
+        "templates": templates.build if templates is not None else None, # `flask build-templates` may have rebuilt them
+    }, sort_keys = True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# compare results by key: an in-process LRU in front of the compare_results table (shared by all workers)
+class ResultCache:
+    def __init__(self, max_entries = 512):
+        self.max_entries = max_entries
+        self._lru = OrderedDict() # key -> (run_id, result)
+        self._lock = threading.Lock()
+        self._pruned = False # rows from older scorer versions are deleted once per process
+        self._locks = {} # key -> [lock, waiters]: a double-submit waits for the first compare instead of repeating it
+        self._locks_guard = threading.Lock()
+
+    # -> (run_id, result dict) or None
+    def get(self, db, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+        if entry is not None:
+            metrics.inc("result_cache_total", outcome = "memory_hit")
+            return entry
+
+        row = db.get(CompareResult, key)
+        if row is None or row.scorer_version != scorer_version():
+            metrics.inc("result_cache_total", outcome = "miss")
+            return None
+        entry = (row.run_id, json.loads(row.result_json))
+        self._remember(key, entry)
+        metrics.inc("result_cache_total", outcome = "db_hit")
+        return entry
+
+    def put(self, db, key, phrase_id, run_id, result):
+        if not self._pruned:
+            db.execute(delete(CompareResult).where(CompareResult.scorer_version != scorer_version()))
+            self._pruned = True
+        db.merge(CompareResult(
+            cache_key = key, phrase_id = phrase_id, scorer_version = scorer_version(),
+            run_id = run_id, result_json = json.dumps(result, ensure_ascii = False),
+        ))
+        db.commit()
+        self._remember(key, (run_id, result))
+
+    # forget an entry whose artifacts are gone (retention GC)
+    def discard(self, db, key):
+        with self._lock:
+            self._lru.pop(key, None)
+        db.execute(delete(CompareResult).where(CompareResult.cache_key == key))
+        db.commit()
+
+    # per-key lock (single-flight within this process); entries are dropped when nobody is waiting on them
+    @contextmanager
+    def key_lock(self, key):
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last = False)
@@ -0,0 +1,129 @@
+import numpy as np
+
+MIN_VOICED = 5 # fewer voiced frames than this -> "too unvoiced"
+
+# (score, label) outcomes; the vectorized scorer returns indexes into this table
+OUTCOMES = [
+    (20, "too unvoiced/no pitch"), # 0
+    (95, "ok (level)"), # 1
+    (60, "too much movement (tone 1 should be level)"), # 2
+    (95, "ok (rising)"), # 3
+    (55, "not rising enough (tone 2)"), # 4
+    (95, "ok (falling)"), # 5
+    (55, "not falling enough (tone 4)"), # 6
+    (90, "ok (dip)"), # 7
+    (55, "missing dip (tone 3-ish)"), # 8
+    (75, "neutral/unknown tone"), # 9
+]
+
+# return (score, label) for one syllable window (reference implementation; score_windows must match it)
+def score_window(f0_win, tone):
+    x = f0_win[np.isfinite(f0_win)] # drop NaNs (e.g. unvoiced)
+    if len(x) < MIN_VOICED: # if not enough voiced frames:
+        return OUTCOMES[0]
+
+    start = x[0]
+    end = x[-1]
+    minimum = np.min(x)
+
+    # normalze using log base 2 so "relative change" is nicer than raw hertz
+    slope = np.log2(end) - np.log2(start) # positive = rising, negative = falling
+    rng = np.log2(np.max(x)) - np.log2(np.min(x)) # movement amount
+
+    # tone "grading"
+    if tone == 1:
+        return OUTCOMES[1] if abs(slope) < 0.05 and rng < 0.10 else OUTCOMES[2]
+    if tone == 2:
+        return OUTCOMES[3] if slope > 0.08 else OUTCOMES[4]
+    if tone == 4:
+        return OUTCOMES[5] if slope < -0.08 else OUTCOMES[6]
+    if tone == 3:
+        # check for dip (min noticeably below both ends)
+        return OUTCOMES[7] if (minimum < min(start, end) * 0.92) and rng > 0.10 else OUTCOMES[8]
+    # tone 5 or unknown
+    return OUTCOMES[9]
+
+# window id per frame: i where edges[i] <= t < edges[i + 1], else -1 (same as the (t >= a) & (t < b) mask)
+def window_ids(t, edges):
+    win = np.searchsorted(edges, t, side = "right") - 1
+    win[(win < 0) | (win >= len(edges) - 1)] = -1
+    return win
+
+# start/end/min/max/count of the voiced frames in each window, in one pass
+# `win` must be non-decreasing over voiced frames (true for time-sorted frames)
+def window_features(win, f0, n_windows):
+    keep = (win >= 0) & np.isfinite(f0)
+    w = win[keep]
+    x = f0[keep]
+
+    counts = np.bincount(w, minlength = n_windows)
+    first = np.searchsorted(w, np.arange(n_windows), side = "left") # index of each window's first voiced frame
+
+    start, end, lo, hi = (np.full(n_windows, np.nan) for _ in range(4))
+    has = counts > 0
+    if has.any():
+        idx = first[has]
+        start[has] = x[idx]
+        end[has] = x[idx + counts[has] - 1]
+        lo[has] = np.minimum.reduceat(x, idx) # segments are contiguous because empty windows are skipped
+        hi[has] = np.maximum.reduceat(x, idx)
+    return counts, start, end, lo, hi
+
+# outcome index (pass, fail) per tone 0..4; 0 stands for neutral/unknown
+PASS_OUTCOME = np.array([9, 1, 3, 7, 5])
+FAIL_OUTCOME = np.array([9, 2, 4, 8, 6])
+
+# outcome index per window, from window features + tone numbers
+def grade(counts, start, end, lo, hi, tones):
+    tones = np.asarray(tones)
+    tone_idx = np.where((tones >= 1) & (tones <= 4), tones, 0)
+
+    with np.errstate(invalid = "ignore"): # NaNs in empty windows are masked out below
+        slope = np.log2(end) - np.log2(start) # positive = rising, negative = falling
+        rng = np.log2(hi) - np.log2(lo) # movement amount
+
+        passed = np.array([ # one row of pass/fail per tone rule, evaluated for every window
+            np.zeros(len(tones), dtype = bool), # neutral/unknown: no rule
+            (np.abs(slope) < 0.05) & (rng < 0.10), # tone 1: level
+            slope > 0.08, # tone 2: rising
+            (lo < np.minimum(start, end) * 0.92) & (rng > 0.10), # tone 3: dip below both ends
+            slope < -0.08, # tone 4: falling
+        ])
+
+    ok = passed[tone_idx, np.arange(len(tones))]
+    out = np.where(ok, PASS_OUTCOME[tone_idx], FAIL_OUTCOME[tone_idx])
+    out[counts < MIN_VOICED] = 0
+    return out
+
+# score every syllable window of one utterance at once -> list of (score, label)
+def score_windows(t, f0, edges, tones):
+    n = len(edges) - 1
+    features = window_features(window_ids(t, edges), f0, n)
+    return [OUTCOMES[i] for i in grade(*features, tones)]
+
+# score a batch of utterances together; tracks = [(t, f0, edges, tones), ...] (ragged lengths)
+# -> one list of (score, label) per utterance
+def score_batch(tracks):
+    if not tracks:
+        return []
+
+    win_parts, f0_parts, tone_parts, sizes = [], [], [], []
+    offset = 0
+    for t, f0, edges, tones in tracks:
+        n = len(edges) - 1
+        win = window_ids(t, edges)
+        win[win >= 0] += offset # global window ids stay non-decreasing across utterances
+        win_parts.append(win)
+        f0_parts.append(f0)
+        tone_parts.append(np.asarray(tones[:n]))
+        sizes.append(n)
+        offset += n
+
+    features = window_features(np.concatenate(win_parts), np.concatenate(f0_parts), offset)
+    out = grade(*features, np.concatenate(tone_parts))
+
+    results, i = [], 0
+    for n in sizes:
+        results.append([OUTCOMES[k] for k in out[i:i + n]])
+        i += n
+    return results
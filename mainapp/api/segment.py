@@ -0,0 +1,76 @@
+import numpy as np
+from mainapp.api.audio import SAMPLE_RATE
+
+FRAME = 0.02 # seconds per energy frame
+HOP = 0.01 # seconds between energy frames (same grid as the pitch track)
+FLOOR_DB = -60 # noise floor is clamped to at most this far below the peak (digital silence has no floor)
+MIN_SNR_DB = 10 # if the quietest frames are within this of the peak there is no silence to trim
+ACTIVE = 0.35 # active frames sit this fraction of the way from noise floor to peak
+PAD = 0.05 # seconds kept on each side of the detected speech
+SMOOTH = 5 # frames in the envelope moving average (50 ms)
+MIN_DEPTH_DB = 3 # shallower dips between syllables are not boundaries
+MIN_SYLLABLE = 0.06 # seconds; boundaries closer than this to each other or the ends are skipped
+
+# frame energy in dB (10 ms hop, 20 ms frames) from one cumulative sum -> (frame centres, dB)
+def envelope(samples, sr = SAMPLE_RATE, frame = FRAME, hop = HOP):
+    x = np.asarray(samples, dtype = np.float64)
+    size, step = int(frame * sr), int(hop * sr)
+    if len(x) < size:
+        return np.zeros(0), np.zeros(0)
+    cs = np.concatenate(([0.0], np.cumsum(x * x)))
+    starts = np.arange(0, len(x) - size + 1, step)
+    power = (cs[starts + size] - cs[starts]) / size
+    return (starts + size / 2) / sr, 10 * np.log10(power + 1e-12)
+
+# (start, end) seconds of the speech in the buffer; the whole buffer when there is no clear silence
+def trim(samples, sr = SAMPLE_RATE):
+    dur = len(samples) / sr
+    t, db = envelope(samples, sr)
+    if len(db) == 0:
+        return 0.0, dur
+    peak = db.max()
+    noise = max(np.percentile(db, 10), peak + FLOOR_DB)
+    if peak - noise < MIN_SNR_DB:
+        return 0.0, dur
+
+    active = np.flatnonzero(db > noise + ACTIVE * (peak - noise))
+    start = max(0.0, t[active[0]] - FRAME / 2 - PAD)
+    end = min(dur, t[active[-1]] + FRAME / 2 + PAD)
+    return float(start), float(end)
+
+# n + 1 syllable edges (seconds) inside [start, end]: the n - 1 deepest intensity valleys between peaks,
+# topped up by splitting the longest segment when the envelope has too few clear dips (e.g. legato speech)
+def syllable_edges(samples, n, start, end, sr = SAMPLE_RATE):
+    edges = [start, end]
+    if n > 1:
+        a, b = int(start * sr), int(end * sr)
+        t, db = envelope(samples[a:b], sr)
+        t = t + a / sr
+        if len(db) >= 3:
+            db = np.convolve(db, np.ones(SMOOTH) / SMOOTH, mode = "same")
+            edges += _valleys(t, db, n - 1, start, end)
+        edges.sort()
+        while len(edges) < n + 1: # too few valleys: halve the longest segment
+            i = int(np.argmax(np.diff(edges)))
+            edges.insert(i + 1, (edges[i] + edges[i + 1]) / 2)
+    return np.asarray(edges)
+
+# up to k valley times, deepest first, at least MIN_SYLLABLE apart (and from start/end)
+def _valleys(t, db, k, start, end):
+    inner = np.arange(1, len(db) - 1)
+    minima = inner[(db[inner] < db[inner - 1]) & (db[inner] <= db[inner + 1])]
+    if len(minima) == 0:
+        return []
+
+    bounds = np.concatenate(([0], minima, [len(db)])) # the envelope between consecutive minima holds one peak
+    peaks = np.maximum.reduceat(db, bounds[:-1])
+    depth = np.minimum(peaks[:-1], peaks[1:]) - db[minima] # dip below the lower of its two neighbouring peaks
+
+    chosen = []
+    for i in np.argsort(-depth):
+        if depth[i] < MIN_DEPTH_DB or len(chosen) == k:
+            break
+        ti = float(t[minima[i]])
+        if all(abs(ti - c) >= MIN_SYLLABLE for c in (start, end, *chosen)):
+            chosen.append(ti)
+    return chosen
@@ -0,0 +1,334 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from mainapp.models import Attempt, CompareResult, attempt_file_keys
+
+SHARD_RE = re.compile(r"^[0-9a-f]{2}$") # shard dirs: first 2 hex chars of a hash
+RUN_ID_RE = re.compile(r"^\d+_[0-9a-f]{8}$") # "<unix time>_<8 hex>" from new_run()
+GC_GRACE = 3600 # seconds; anything touched more recently is never deleted or transcoded
+IN_BATCH = 500 # names per `IN (...)` statement (stays under SQLite's bound-parameter limit)
+
+# 2-char shard for a stored name; keyed on the stem so a cold-tier rename (.wav -> .flac) stays in place
+def shard_of(name):
+    return hashlib.sha1(Path(name).stem.encode()).hexdigest()[:2]
+
+@dataclass
+class Item:
+    kind: str # "upload" or "run"
+    name: str # upload filename / run_id
+    path: Path # audio file / run folder
+    size: int # bytes, including the sidecar / every file in the run
+    mtime: float # last write or use (compare touches the upload)
+    phrase_id: str = ""
+
+# where uploads + compare artifacts live on disk, and what is kept
+class Storage:
+    def __init__(self, upload_dir, artifact_dir, max_age = None, max_bytes = None, phrase_quota = None,
+                 cold_after = None, cold_codec = "flac", grace = GC_GRACE, blobs = None):
+        self.upload_dir = Path(upload_dir)
+        self.artifact_dir = Path(artifact_dir)
+        self.max_age = max_age # timedelta or None
+        self.max_bytes = max_bytes # uploads + runs together
+        self.phrase_quota = phrase_quota # newest recordings kept per phrase
+        self.cold_after = cold_after # timedelta or None: compress raw WAVs older than this
+        self.cold_suffix = "." + cold_codec.lstrip(".")
+        from mainapp.api.audio import COLD_FORMATS # audio stack (numpy, PyAV) only loads once storage is in use
+        if self.cold_suffix not in COLD_FORMATS:
+            raise ValueError(f"unknown cold codec {cold_codec!r} (expected one of {sorted(COLD_FORMATS)})")
+        self.grace = grace
+        self.blobs = blobs # shared backend (mainapp/api/blobstore.py); None = these local dirs are the only copy
+        self.gc_lock = threading.Lock() # one pass at a time per process
+        self.upload_dir.mkdir(parents = True, exist_ok = True)
+        self.artifact_dir.mkdir(parents = True, exist_ok = True)
+
+    # --- layout: <root>/<shard>/<name>, with the old flat layout still readable ---
+
+    def upload_path(self, name): # where a new upload goes
+        path = self.upload_dir / shard_of(name) / name
+        path.parent.mkdir(exist_ok = True)
+        return path
+
+    def run_dir(self, run_id): # where a new compare's artifacts go
+        path = self.artifact_dir / shard_of(run_id) / run_id
+        path.mkdir(parents = True, exist_ok = True)
+        return path
+
+    def find_upload(self, name):
+        path = self.upload_dir / shard_of(name) / name
+        return path if path.exists() else self.upload_dir / name # pre-sharding files
+
+    def find_run(self, run_id):
+        path = self.artifact_dir / shard_of(run_id) / run_id
+        return path if path.exists() else self.artifact_dir / run_id
+
+    # --- shared backend: write-through on publish, fetch-on-miss on read (no-ops without one) ---
+
+    def publish_upload(self, path): # audio + sidecar
+        if self.blobs is not None:
+            self.blobs.put(f"uploads/{path.name}", path)
+            sidecar = path.with_name(path.name + ".json")
+            if sidecar.exists():
+                self.blobs.put(f"uploads/{sidecar.name}", sidecar)
+
+    def publish_run(self, run_dir): # every file a compare (or a lazy plot render) wrote
+        if self.blobs is not None:
+            for f in run_dir.iterdir():
+                if f.is_file() and not f.name.startswith("."):
+                    self.blobs.put(f"runs/{run_dir.name}/{f.name}", f)
+
+    # local path of an upload, copied down from the shared backend when another node received it
+    def fetch_upload(self, name):
+        path = self.find_upload(name)
+        if path.exists() or self.blobs is None:
+            return path
+        path = self.upload_path(name)
+        if self.blobs.get(f"uploads/{name}", path):
+            self.blobs.get(f"uploads/{name}.json", path.with_name(name + ".json"))
+        return path
+
+    # local path of one run artifact, copied down from the shared backend when another node ran the compare
+    def fetch_run_file(self, run_id, filename):
+        path = self.find_run(run_id) / filename
+        if path.exists() or self.blobs is None:
+            return path
+        path = self.run_dir(run_id) / filename
+        self.blobs.get(f"runs/{run_id}/{filename}", path)
+        return path
+
+    # --- scanning ---
+
+    def _uploads(self):
+        for entry in self._entries(self.upload_dir, lambda e: e.is_file() and not e.name.endswith((".json", ".part"))):
+            st = entry.stat()
+            sidecar = entry.with_name(entry.name + ".json")
+            item = Item("upload", entry.name, entry, st.st_size, st.st_mtime)
+            if sidecar.exists():
+                item.size += sidecar.stat().st_size
+                if self.phrase_quota:
+                    try:
+                        item.phrase_id = json.loads(sidecar.read_text()).get("phrase_id", "")
+                    except ValueError:
+                        pass
+            yield item
+
+    def _runs(self):
+        for entry in self._entries(self.artifact_dir, lambda e: e.is_dir() and RUN_ID_RE.match(e.name)):
+            files = [f for f in entry.iterdir() if f.is_file()]
+            mtime = max([entry.stat().st_mtime] + [f.stat().st_mtime for f in files]) # lazy plot render counts as use
+            yield Item("run", entry.name, entry, sum(f.stat().st_size for f in files), mtime)
+
+    def _entries(self, root, keep): # sharded entries + legacy flat ones (tts/ and ref/ never match `keep`)
+        if not root.exists():
+            return
+        for entry in root.iterdir():
+            if entry.is_dir() and SHARD_RE.match(entry.name):
+                yield from (e for e in entry.iterdir() if keep(e))
+            elif keep(entry):
+                yield entry
+
+    # --- policy ---
+
+    # -> (items to delete, uploads/runs with raw WAVs to move to the cold tier)
+    # `protected` = upload names / run ids that recent attempts reference: kept like files inside the grace window
+    def plan(self, items, now = None, protected = frozenset()):
+        now = now or time.time()
+        settled = [i for i in items if i.mtime < now - self.grace and i.name not in protected]
+        doomed = set()
+
+        if self.max_age:
+            cutoff = now - self.max_age.total_seconds()
+            doomed.update(i.path for i in settled if i.mtime < cutoff)
+
+        if self.phrase_quota:
+            by_phrase = {}
+            for i in items:
+                if i.kind == "upload" and i.phrase_id:
+                    by_phrase.setdefault(i.phrase_id, []).append(i)
+            ripe = {id(i) for i in settled}
+            for group in by_phrase.values():
+                group.sort(key = lambda i: i.mtime, reverse = True) # newest first
+                doomed.update(i.path for i in group[self.phrase_quota:] if id(i) in ripe)
+
+        if self.max_bytes is not None:
+            total = sum(i.size for i in items if i.path not in doomed)
+            for i in sorted(settled, key = lambda i: i.mtime): # oldest first
+                if total <= self.max_bytes:
+                    break
+                if i.path not in doomed:
+                    doomed.add(i.path)
+                    total -= i.size
+
+        cold = []
+        if self.cold_after and self.blobs is None: # with a shared backend the local copy is only a cache
+            cutoff = now - self.cold_after.total_seconds()
+            for i in settled:
+                if i.path in doomed or i.mtime >= cutoff:
+                    continue
+                if (i.kind == "upload" and i.path.suffix.lower() == ".wav") or (i.kind == "run" and (i.path / "user.wav").exists()):
+                    cold.append(i)
+
+        return [i for i in items if i.path in doomed], cold
+
+    # --- garbage collection ---
+
+    # one pass: reshard legacy files, delete what the policy drops, compress cold WAVs
+    # DB rows are rewritten and committed before any file goes away, so no Attempt points at a missing file
+    def gc(self, db, dry_run = False):
+        with self.gc_lock:
+            now = time.time()
+            items = list(self._uploads()) + list(self._runs())
+            doomed, cold = self.plan(items, now, self._recent_refs(db, now))
+            stats = {
+                "scanned": len(items),
+                "deleted_uploads": sum(i.kind == "upload" for i in doomed),
+                "deleted_runs": sum(i.kind == "run" for i in doomed),
+                "freed_bytes": sum(i.size for i in doomed),
+                "cold": len(cold),
+                "rows_updated": 0,
+                "resharded": 0,
+            }
+            if dry_run:
+                return stats
+
+            gone = {id(i) for i in doomed}
+            stats["resharded"] = self._reshard(i for i in items if id(i) not in gone)
+            if self.blobs is not None: # local dirs are a cache of the shared backend: evict, rows stay valid
+                self._evict(doomed) # (retention + tiering of the shared copies = the backend's lifecycle rules)
+                return stats
+            self._backfill(db)
+            stats["rows_updated"] += self._delete(db, doomed)
+            stats["rows_updated"] += self._to_cold(db, cold)
+            return stats
+
+    # upload names + run ids of attempts saved inside the grace window (an old file a new attempt points at,
+    # e.g. a re-compare of a restored upload, is in use even though its mtime says otherwise)
+    def _recent_refs(self, db, now):
+        since = datetime.utcfromtimestamp(now - self.grace)
+        refs = set()
+        rows = db.query(Attempt.file_url, Attempt.plot_url, Attempt.upload_name, Attempt.run_id).filter(Attempt.created_at >= since)
+        for file_url, plot_url, upload_name, run_id in rows:
+            if upload_name is None: # saved before the key columns existed (not backfilled yet)
+                upload_name, run_id = attempt_file_keys(file_url, plot_url)
+            refs.update(k for k in (upload_name, run_id) if k)
+        return refs
+
+    def _backfill(self, db): # Attempt rows from before upload_name/run_id existed get them once
+        while True:
+            rows = db.query(Attempt).filter(Attempt.upload_name.is_(None)).limit(IN_BATCH).all()
+            if not rows:
+                return
+            for a in rows:
+                a.upload_name, a.run_id = attempt_file_keys(a.file_url, a.plot_url)
+            db.commit()
+
+    def _reshard(self, items): # move pre-sharding files into their shard; URLs don't change
+        moved = 0
+        for i in items:
+            root = self.upload_dir if i.kind == "upload" else self.artifact_dir
+            if i.path.parent != root:
+                continue
+            dest = root / shard_of(i.name) / i.name
+            dest.parent.mkdir(exist_ok = True)
+            if i.kind == "upload":
+                sidecar = i.path.with_name(i.name + ".json")
+                if sidecar.exists():
+                    os.replace(sidecar, dest.with_name(i.name + ".json"))
+            os.replace(i.path, dest)
+            i.path = dest
+            moved += 1
+        return moved
+
+    def _delete(self, db, doomed):
+        # one indexed `IN (...)` update per batch of names (not a LIKE scan of attempts per file)
+        uploads = [i.name for i in doomed if i.kind == "upload"]
+        runs = [i.name for i in doomed if i.kind == "run"]
+        rows = 0
+        for names in _batches(uploads):
+            rows += db.query(Attempt).filter(Attempt.upload_name.in_(names)) \
+                .update({Attempt.file_url: "", Attempt.upload_name: ""}, synchronize_session = False)
+        for names in _batches(runs):
+            rows += db.query(Attempt).filter(Attempt.run_id.in_(names)) \
+                .update({Attempt.plot_url: "", Attempt.run_id: ""}, synchronize_session = False)
+            db.query(CompareResult).filter(CompareResult.run_id.in_(names)).delete(synchronize_session = False) # cached results point at the plot
+        db.commit() # rows no longer reference the files before they are removed
+
+        for i in doomed:
+            if i.kind == "upload":
+                i.path.unlink(missing_ok = True)
+                i.path.with_name(i.name + ".json").unlink(missing_ok = True)
+            else:
+                shutil.rmtree(i.path, ignore_errors = True)
+        return rows
+
+    def _evict(self, doomed):
+        for i in doomed:
+            if i.kind == "upload":
+                i.path.unlink(missing_ok = True)
+                i.path.with_name(i.name + ".json").unlink(missing_ok = True)
+            else:
+                shutil.rmtree(i.path, ignore_errors = True)
+
+    # compress every cold item, repoint the rows of cold uploads in batched updates, then drop the WAVs
+    def _to_cold(self, db, items):
+        from mainapp.api.audio import decode_audio, encode_audio
+        moved = [] # (item, src, dest)
+        for item in items:
+            src = item.path if item.kind == "upload" else item.path / "user.wav"
+            dest = src.with_suffix(self.cold_suffix)
+            tmp = dest.with_name(f".{dest.name}.part{dest.suffix}") # encoder picks the container from the suffix
+            encode_audio(tmp, decode_audio(src))
+            os.replace(tmp, dest)
+            if item.kind == "upload":
+                sidecar = src.with_name(src.name + ".json")
+                if sidecar.exists():
+                    os.replace(sidecar, dest.with_name(dest.name + ".json"))
+            moved.append((item, src, dest))
+
+        rows = 0
+        renamed = {src.name: dest.name for item, src, dest in moved if item.kind == "upload"}
+        for names in _batches(list(renamed)):
+            for a in db.query(Attempt).filter(Attempt.upload_name.in_(names)):
+                a.file_url = a.file_url[:-len(a.upload_name)] + renamed[a.upload_name]
+                rows += 1
+        db.commit() # point rows at the compressed copies before the WAVs go
+
+        for item, src, dest in moved:
+            src.unlink(missing_ok = True)
+            for path in (dest, item.path) if item.kind == "run" else (dest,): # keep the original age for later retention passes
+                os.utime(path, (item.mtime, item.mtime))
+        return rows
+
+def _batches(names):
+    for i in range(0, len(names), IN_BATCH):
+        yield names[i:i + IN_BATCH]
+
+# periodic gc in a daemon thread; each process runs its own (passes are idempotent)
+class StorageGC:
+    def __init__(self, app, storage, interval):
+        self.app = app
+        self.storage = storage
+        self.interval = interval
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target = self._loop, name = "storage-gc", daemon = True)
+        self.thread.start()
+
+    def _loop(self):
+        from mainapp.db import get_session
+        while not self.stop.wait(self.interval):
+            with self.app.app_context():
+                Session = get_session(self.app)
+                try:
+                    stats = self.storage.gc(Session())
+                    self.app.logger.info("storage gc: %s", stats)
+                except Exception:
+                    Session().rollback()
+                    self.app.logger.exception("storage gc failed")
+                finally:
+                    Session.remove()
@@ -0,0 +1,181 @@
+from uuid import uuid4
+import threading
+import time
+import numpy as np
+from mainapp.api.audio import av, decode_audio, IncrementalDecoder, SAMPLE_RATE
+from mainapp.api.pitch import extract_f0, HOP, PITCH_FLOOR, PITCH_CEILING
+from mainapp.api.scoring import score_window, MIN_VOICED
+
+CONTEXT = 0.10 # seconds of already-final audio re-fed to the pitch tracker so frames near the seam are stable
+LOOKAHEAD = 0.10 # frames this close to the end of received audio are not final yet
+MIN_NEW = 0.20 # skip pitch tracking until at least this much new audio has arrived
+SYLLABLE_GAP = 0.08 # unvoiced stretch that closes a voiced run (= one syllable)
+STREAM_TTL = 600 # seconds an idle stream is kept
+
+# one in-progress recording: raw bytes appended to `path`, decoded and pitch-tracked incrementally
+class StreamSession:
+    def __init__(self, phrase, path, learner_id = None, pitch = None):
+        self.stream_id = uuid4().hex
+        self.phrase = phrase
+        self.learner_id = learner_id
+        self.pitch = pitch or {} # extract_f0 options; the finish compare uses them as given
+        self.live_pitch = { # ...live tracking pins the range: a per-chunk estimate would shift between chunks
+            **self.pitch, "floor": self.pitch.get("floor") or PITCH_FLOOR, "ceiling": self.pitch.get("ceiling") or PITCH_CEILING,
+        }
+        self.path = path # container bytes accumulate here; becomes the upload file on finish
+        self.lock = threading.Lock()
+        self.touched = time.time()
+        self.finished = False
+
+        self.decoder = IncrementalDecoder() if av is not None else None # one codec context for the whole stream
+        self.samples = np.zeros(0, dtype = np.float32) # rolling buffer: decoded audio from `base` on
+        self.base = 0 # sample index of samples[0]
+        self.received = 0 # samples decoded so far
+        self.received_s = 0.0 # ... in seconds (duration limit)
+        self.done_t = 0.0 # frames up to here are final
+        self.frames_t, self.frames_f0 = [], []
+        self.run = [] # current voiced run [(t, f0), ...]
+        self.gap = 0 # unvoiced frames since the run's last voiced frame
+        self.verdicts = [] # per-syllable verdicts already pushed
+
+    # append a chunk; returns newly final frames + newly final syllable verdicts
+    def feed(self, data):
+        with self.lock:
+            self.touched = time.time()
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self._decode(data, last = False)
+            return self._advance(last = False)
+
+    # end of stream: append the optional last chunk, then track to the very end and grade the trailing syllable
+    def finish(self, data = b""):
+        with self.lock:
+            self.finished = True
+            if data:
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            if not self.path.exists():
+                self.close()
+                return {"frames": {"t": [], "f0": []}, "syllables": []}
+            self._decode(data, last = True)
+            self.close()
+            return self._advance(last = True)
+
+    # append the samples `data` completed to the rolling buffer (only the new bytes are decoded)
+    def _decode(self, data, last):
+        new = None
+        if self.decoder is not None:
+            new = self.decoder.feed(data, last)
+            if self.decoder.error is not None: # not decodable as a stream (needs seeking): decode the file instead
+                self.decoder.close()
+                self.decoder, new = None, None
+        if new is None: # no PyAV, or the fallback: chunks are not standalone, re-decode the growing file
+            new = decode_audio(self.path, partial = True)[self.received:]
+        self.samples = np.concatenate([self.samples, new]) if len(self.samples) else new
+        self.received += len(new)
+        self.received_s = self.received / SAMPLE_RATE
+
+    def close(self): # stop the decoder thread (finished, dropped or abandoned)
+        if self.decoder is not None:
+            self.decoder.close()
+
+    def _advance(self, last):
+        total = self.received_s
+        if total - self.done_t < (0 if last else MIN_NEW) or self.received == 0:
+            t = f0 = np.zeros(0)
+        else:
+            start = max(0.0, self.done_t - CONTEXT)
+            first = int(start * SAMPLE_RATE)
+            t, f0, _ = extract_f0(self.samples[first - self.base:], **self.live_pitch)
+            t = t + first / SAMPLE_RATE # back to recording time
+
+            final = (t > self.done_t) & (t <= total - (0 if last else LOOKAHEAD))
+            t, f0 = t[final], f0[final]
+            if len(t):
+                self.done_t = float(t[-1])
+            keep = max(self.base, int(max(0.0, self.done_t - CONTEXT) * SAMPLE_RATE)) # the next pass starts here
+            self.samples, self.base = self.samples[keep - self.base:], keep
+            self.frames_t.extend(t.tolist())
+            self.frames_f0.extend(f0.tolist())
+
+        syllables = self._close_runs(t, f0)
+        if last and self.run: # no trailing silence after the final syllable
+            syllables += self._close_runs([None], [np.nan], force = True)
+        return {
+            "frames": {
+                "t": [round(float(v), 3) for v in t],
+                "f0": [None if not np.isfinite(v) else round(float(v), 1) for v in f0],
+            },
+            "syllables": syllables,
+        }
+
+    # group final frames into voiced runs; each run closed by a gap is graded as the next syllable
+    def _close_runs(self, t, f0, force = False):
+        fresh = []
+        gap_frames = int(round(SYLLABLE_GAP / self.pitch.get("hop", HOP)))
+        syls, tones = self.phrase["syllables"], self.phrase["tones"]
+        spoken = self.phrase.get("surface_tones") or tones # live verdicts listen for the sandhi tone too
+
+        for ti, fi in zip(t, f0):
+            if np.isfinite(fi):
+                self.run.append((ti, fi))
+                self.gap = 0
+                continue
+            if not self.run:
+                continue
+            self.gap += 1
+            if self.gap < gap_frames and not force:
+                continue
+
+            run, self.run, self.gap = self.run, [], 0
+            idx = len(self.verdicts)
+            if len(run) < MIN_VOICED or idx >= len(syls): # blips / extra syllables are ignored
+                continue
+
+            score, label = score_window(np.array([v for _, v in run]), spoken[idx])
+            verdict = {
+                "idx": idx,
+                "syllable": syls[idx],
+                "tone": tones[idx],
+                "surface_tone": spoken[idx],
+                "score": int(score),
+                "label": label,
+                "t0": float(run[0][0]),
+                "t1": float(run[-1][0]),
+            }
+            self.verdicts.append(verdict)
+            fresh.append(verdict)
+        return fresh
+
+# per-process registry of live streams; every open/get/close also drops streams idle for `ttl`, so an abandoned
+# stream's decoder thread ends with the next stream request of any client
+class StreamRegistry:
+    def __init__(self, ttl = STREAM_TTL):
+        self.ttl = ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def open(self, phrase, path, learner_id = None, pitch = None):
+        session = StreamSession(phrase, path, learner_id, pitch)
+        with self.lock:
+            self._prune()
+            self.sessions[session.stream_id] = session
+        return session
+
+    def get(self, stream_id):
+        with self.lock:
+            self._prune()
+            return self.sessions.get(stream_id)
+
+    def close(self, stream_id):
+        with self.lock:
+            self._prune()
+            return self.sessions.pop(stream_id, None)
+
+    def _prune(self): # drop abandoned streams, their partial files and sidecars (caller holds lock)
+        cutoff = time.time() - self.ttl
+        for stream_id in [s for s, sess in self.sessions.items() if sess.touched < cutoff]:
+            session = self.sessions.pop(stream_id)
+            session.close()
+            session.path.unlink(missing_ok = True)
+            session.path.with_name(session.path.name + ".json").unlink(missing_ok = True)
@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from mainapp.api.audio import SAMPLE_RATE, write_wav
+import numpy as np
+
+# rough Mandarin tone shapes as (start, end, dip) multipliers of the speaker's base f0
+TONE_SHAPES = {
+    1: (1.25, 1.25, None), # high level
+    2: (0.95, 1.30, None), # rising
+    3: (0.95, 0.95, 0.70), # dipping
+    4: (1.35, 0.80, None), # falling
+    5: (1.00, 0.95, None), # neutral: short + flat-ish
+}
+
+# f0 contour (Hz) for one syllable of `tone`, n samples long
+def tone_contour(tone, n, base_f0 = 180.0):
+    start, end, dip = TONE_SHAPES.get(tone, TONE_SHAPES[5])
+    x = np.linspace(0, 1, n)
+    if dip is None:
+        mult = start + (end - start) * x
+    else:
+        mult = np.where(x < 0.5, start + (dip - start) * (x / 0.5), dip + (end - dip) * ((x - 0.5) / 0.5))
+    return base_f0 * mult
+
+# synthesize a voiced "utterance" following the given tones (float32, -1..1)
+def render_tones(tones, sr = SAMPLE_RATE, syl_dur = 0.30, gap = 0.05, base_f0 = 180.0, noise = 0.0, lead = 0.0, seed = 0):
+    rng = np.random.default_rng(seed)
+    parts = [np.zeros(int(lead * sr), dtype = np.float32)]
+    for tone in tones:
+        n = int((syl_dur * 0.6 if tone == 5 else syl_dur) * sr) # neutral tones are shorter
+        f0 = tone_contour(tone, n, base_f0)
+        phase = 2 * np.pi * np.cumsum(f0) / sr # integrate frequency -> phase (no clicks)
+        sig = 0.5 * np.sin(phase) + 0.25 * np.sin(2 * phase) + 0.12 * np.sin(3 * phase) # a few harmonics so Praat locks on
+        env = np.minimum(1, np.minimum(np.arange(n), np.arange(n)[::-1]) / (0.01 * sr)) # 10 ms fade in/out
+        parts.append((sig * env).astype(np.float32))
+        parts.append(np.zeros(int(gap * sr), dtype = np.float32))
+    y = np.concatenate(parts)
+    if noise > 0:
+        y = y + rng.normal(0, noise, len(y)).astype(np.float32)
+    return np.clip(y, -1, 1).astype(np.float32)
+
+# offline stand-in for the OpenAI client: same `audio.speech.with_streaming_response.create` shape,
+# but renders a synthetic tone contour to WAV instead of calling the network
+class OfflineTTSClient:
+    def __init__(self, tones_for):
+        self.tones_for = tones_for # text -> list of tone numbers
+        self.audio = self
+        self.speech = self
+        self.with_streaming_response = self
+
+    @contextmanager
+    def create(self, input, **kwargs):
+        yield _OfflineResponse(self.tones_for(input))
+
+class _OfflineResponse:
+    def __init__(self, tones):
+        self.tones = tones
+
+    def stream_to_file(self, out_path):
+        write_wav(out_path, render_tones(self.tones))
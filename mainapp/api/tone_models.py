@@ -0,0 +1,198 @@
+from pathlib import Path
+from uuid import uuid4
+import json
+import os
+import numpy as np
+from mainapp.api.scoring import MIN_VOICED, score_windows, window_ids, window_features
+
+STORE_VERSION = 1
+POINTS = 16 # samples per syllable contour after resampling to a fixed length
+RANGE_PCT = (5, 95) # the speaker's f0 range = these percentiles of the utterance's voiced frames (semitones)
+MIN_SPAN = 4.0 # semitones; a flat speaker's range is widened to this so level tones don't turn into noise
+PER_KEY = 8 # templates kept per (tone, context, source) after clustering
+DIST_PENALTY = 120 # score points per unit of RMS distance (1 unit = the speaker's whole range)
+CONFUSED_SCORE = 55 # score cap when another tone's template is nearer than every template of the expected tone
+PASS_SCORE = 70 # below this the syllable is flagged (same threshold as the bad-span highlight)
+NEUTRAL = 5 # neutral-tone templates are only matched against, never offered as "sounds like": their shape follows the previous tone
+
+# where a syllable sits in its phrase: tone shapes differ at phrase ends (a final tone 3 dips and rises, a medial
+# one stays low) -> context index per position
+SOLO, INITIAL, MEDIAL, FINAL = range(4)
+ANY = -1 # context wildcard: used when no template was learned for (tone, context)
+
+def contexts(n):
+    if n == 1:
+        return np.array([SOLO])
+    return np.array([INITIAL] + [MEDIAL] * (n - 2) + [FINAL])
+
+# one fixed-length contour per syllable window, normalized to the speaker's f0 range
+# -> (n_windows, POINTS) float32; rows with fewer than MIN_VOICED voiced frames are NaN
+def syllable_vectors(t, f0, edges):
+    n = len(edges) - 1
+    out = np.full((n, POINTS), np.nan, dtype = np.float32)
+    voiced = np.isfinite(f0) & (f0 > 0)
+    inside = voiced & (t >= edges[0]) & (t < edges[-1])
+    if inside.sum() < MIN_VOICED:
+        return out
+
+    st = 12 * np.log2(f0[inside] / np.median(f0[inside])) # semitones around the speaker's median
+    lo, hi = np.percentile(st, RANGE_PCT)
+    span = max(hi - lo, MIN_SPAN)
+    z = (st - (lo + hi) / 2) / span # ~-0.5 (bottom of the range) .. 0.5 (top)
+
+    # first/last voiced time per window, then every window resampled in one np.interp over the voiced frames
+    tv = t[inside]
+    counts, first, last, _, _ = window_features(window_ids(tv, edges), tv, n)
+    ok = counts >= MIN_VOICED
+    if ok.any():
+        frac = np.linspace(0, 1, POINTS)
+        tq = first[ok, None] + (last[ok] - first[ok])[:, None] * frac # (windows, POINTS) query times
+        out[ok] = np.interp(tq.ravel(), tv, z).reshape(-1, POINTS)
+    return out
+
+# a loaded template set: one row per template plus its tone/context/source (plain arrays, picklable for workers)
+class ToneTemplates:
+    def __init__(self, matrix, tones, contexts, sources = None, build = ""):
+        self.matrix = np.asarray(matrix, dtype = np.float32) # (m, POINTS)
+        self.tones = np.asarray(tones, dtype = np.int8)
+        self.contexts = np.asarray(contexts, dtype = np.int8)
+        self.sources = list(sources or [])
+        self.build = build # changes with every store write (part of the compare result cache key)
+        self._norms = (self.matrix.astype(np.float64) ** 2).sum(1)
+        self._keys = set(zip(self.tones.tolist(), self.contexts.tolist()))
+        self._rival = np.where(self.tones == NEUTRAL, np.inf, 0.0) # added to distances when looking for a confusable tone
+
+    def __len__(self):
+        return len(self.matrix)
+
+    # RMS distance of every syllable vector to every template: (n, m) from one matrix product
+    def distances(self, vectors):
+        v = np.nan_to_num(vectors.astype(np.float64))
+        d2 = (v ** 2).sum(1)[:, None] + self._norms[None, :] - 2 * v @ self.matrix.T.astype(np.float64)
+        return np.sqrt(np.maximum(d2, 0) / POINTS)
+
+    # -> per syllable (score, label); syllables without templates for their tone (or without pitch) keep the rule verdict
+    def score(self, t, f0, edges, tones):
+        tones = np.asarray(tones)
+        n = len(edges) - 1
+        vectors = syllable_vectors(t, f0, edges)
+        voiced = np.isfinite(vectors).all(1)
+        if len(self) == 0 or not voiced.any():
+            return score_windows(t, f0, edges, tones)
+
+        ctx = contexts(n)
+        ctx = np.array([c if (int(g), int(c)) in self._keys else ANY for g, c in zip(tones, ctx)])
+        D = self.distances(vectors)
+        target = (self.tones[None, :] == tones[:, None]) & ((self.contexts[None, :] == ctx[:, None]) | (ctx[:, None] == ANY))
+        d_target = np.where(target, D, np.inf).min(1)
+        rival = D + self._rival
+        nearest = rival.argmin(1)
+        d_near, tone_near = rival[np.arange(n), nearest], self.tones[nearest]
+        fallback = ~voiced | ~np.isfinite(d_target)
+        rules = score_windows(t, f0, edges, tones) if fallback.any() else None # no pitch / no template for the tone
+
+        out = []
+        for i in range(n):
+            if fallback[i]:
+                out.append(rules[i])
+                continue
+            tone = int(tones[i])
+            score = int(round(float(np.clip(100 - DIST_PENALTY * d_target[i], 0, 100))))
+            if tone_near[i] != tone and d_near[i] < d_target[i]:
+                out.append((min(score, CONFUSED_SCORE), f"sounds like tone {int(tone_near[i])} (expected tone {tone})"))
+            elif score >= PASS_SCORE:
+                out.append((score, f"ok (tone {tone})"))
+            else:
+                out.append((score, f"off the tone {tone} contour"))
+        return out
+
+# k-means centroids (at most k) of the rows of x; deterministic farthest-point start
+def cluster(x, k = PER_KEY, iters = 20):
+    if len(x) <= k:
+        return x
+    centers = [x[0]]
+    d = ((x - x[0]) ** 2).sum(1)
+    for _ in range(k - 1):
+        centers.append(x[int(np.argmax(d))])
+        d = np.minimum(d, ((x - centers[-1]) ** 2).sum(1))
+    centers = np.array(centers)
+    for _ in range(iters):
+        label = ((x[:, None, :] - centers[None, :, :]) ** 2).sum(2).argmin(1)
+        moved = np.array([x[label == j].mean(0) if (label == j).any() else centers[j] for j in range(k)])
+        if np.allclose(moved, centers):
+            break
+        centers = moved
+    return centers
+
+# templates from labelled syllable vectors: [(tone, context, source, vector), ...] -> ToneTemplates
+# each (tone, context, source) group is reduced to PER_KEY centroids, so the set (and per-syllable cost) stays bounded
+def learn_templates(samples, per_key = PER_KEY):
+    groups = {}
+    for tone, ctx, source, vec in samples:
+        if np.isfinite(vec).all():
+            groups.setdefault((int(tone), int(ctx), source), []).append(vec)
+
+    rows, tones, ctxs, sources = [], [], [], []
+    for (tone, ctx, source), vecs in sorted(groups.items()):
+        for c in cluster(np.asarray(vecs, dtype = np.float64), per_key):
+            rows.append(c)
+            tones.append(tone)
+            ctxs.append(ctx)
+            sources.append(source)
+    return ToneTemplates(np.asarray(rows, dtype = np.float32).reshape(-1, POINTS), tones, ctxs, sources)
+
+# training examples from one clean utterance (a TTS clip, a synthetic item), windowed like analyze_pitch without a
+# reference: trim silence, split at intensity valleys -> [(tone, context, source, vector), ...]
+def utterance_examples(samples, tones, source, pitch = None):
+    from mainapp.api.pitch import extract_f0
+    from mainapp.api.segment import trim, syllable_edges
+    from mainapp.api.audio import SAMPLE_RATE
+
+    start, end = trim(samples)
+    t, f0, _ = extract_f0(samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], **(pitch or {}))
+    t = t + start
+    n = len(tones)
+    vectors = syllable_vectors(t, f0, syllable_edges(samples, n, start, end))
+    return [(tone, ctx, source, vec) for tone, ctx, vec in zip(tones, contexts(n), vectors)]
+
+# learned templates in one float32 matrix file, memory-mapped read-only (same layout idea as the ReferenceStore)
+class TemplateStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self._mtime = None
+        self._templates = None
+
+    # -> ToneTemplates, or None before `flask build-templates` has run
+    def get(self):
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            self._templates, self._mtime = None, None
+            return None
+        if mtime != self._mtime: # (re)map when a build has replaced the files
+            index = json.loads(self.index_path.read_text())
+            self._templates = None
+            if index.get("version") == STORE_VERSION and index.get("points") == POINTS and index["rows"]:
+                matrix = np.memmap(self.root / index["data"], dtype = np.float32, mode = "r", shape = (index["rows"], POINTS))
+                self._templates = ToneTemplates(matrix, index["tone"], index["context"], index["source"], index["data"])
+            self._mtime = mtime
+        return self._templates
+
+    # write a fresh store; readers keep their old mapping until the index flips
+    def write(self, templates):
+        self.root.mkdir(parents = True, exist_ok = True)
+        data_name = f"templates-{uuid4().hex[:12]}.f32" # new file per build so a live mapping is never overwritten
+        (self.root / data_name).write_bytes(np.ascontiguousarray(templates.matrix, dtype = "<f4").tobytes())
+
+        tmp_index = self.index_path.with_suffix(".json.tmp")
+        tmp_index.write_text(json.dumps({
+            "version": STORE_VERSION, "points": POINTS, "data": data_name, "rows": len(templates),
+            "tone": templates.tones.tolist(), "context": templates.contexts.tolist(), "source": templates.sources,
+        }))
+        os.replace(tmp_index, self.index_path) # atomic flip; readers remap when its mtime changes
+        self._mtime = None
+
+        for old in self.root.glob("templates-*.f32"): # unlinking is safe: existing mmaps keep the old inode alive
+            if old.name != data_name:
+                old.unlink(missing_ok = True)
@@ -0,0 +1,160 @@
+from pathlib import Path
+from datetime import datetime, timedelta
+from uuid import uuid4
+from contextlib import contextmanager
+from sqlalchemy import select, func
+from mainapp.models import TtsClip
+from mainapp import metrics
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# voice settings sent to OpenAI; part of the cache key so changing any of them re-renders
+TTS_SETTINGS = {
+    "model": "gpt-4o-mini-tts", # TTS model
+    "voice": "marin", # built-in voice
+    "instructions": "Speak Mandarin Chinese (zh-CN) clearly and naturally for a learner.", # style control
+    "response_format": "mp3",
+    "speed": 0.95, # slightly slower for learners
+}
+
+TOUCH_EVERY = timedelta(hours = 1) # only bump last_used_at this often (avoids a DB write per Listen click)
+CLIP_NAME = re.compile(r"^(?:[0-9a-f]{64}|[0-9a-f]{32}__tts)\.\w+$") # cache clips + legacy uuid__tts files; never manifest.json etc.
+
+# stable hash of (text + voice settings) -> used as filename + DB key
+def tts_cache_key(text, settings):
+    payload = json.dumps({"input": text, **settings}, sort_keys = True, ensure_ascii = False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# call the OpenAI speech endpoint (or anything shaped like it) and write audio to out_path
+def synthesize(client, text, settings, out_path):
+    with metrics.span("tts_upstream"), client.audio.speech.with_streaming_response.create(input = text, **settings) as response:
+        response.stream_to_file(out_path) # write audio bytes to disk
+
+class TTSCache:
+    def __init__(self, root, client, settings = None, max_bytes = None, max_age = None, blobs = None):
+        self.root = Path(root) # directory holding the cached audio
+        self.root.mkdir(parents = True, exist_ok = True)
+        self.client = client # OpenAI client or a local fake with the same `audio.speech` shape
+        self.settings = dict(settings or TTS_SETTINGS)
+        self.max_bytes = max_bytes # None = no size limit
+        self.max_age = max_age # timedelta; None = no age limit
+        self.blobs = blobs # shared backend: clips rendered on one node are fetched, not re-rendered, on the others
+
+        self._locks = {} # cache_key -> [lock, waiters] for single-flight
+        self._locks_guard = threading.Lock()
+
+    def filename_for(self, text):
+        key = tts_cache_key(text, self.settings)
+        return key, f"{key}.{self.settings.get('response_format', 'mp3')}"
+
+    # return filename of cached audio for `text`, rendering it once if missing
+    def get_or_render(self, db, text):
+        key, fname = self.filename_for(text)
+        path = self.root / fname
+
+        if path.exists(): # fast path: static file hit
+            self._touch(db, key)
+            return fname
+
+        with self._key_lock(key): # only one upstream call per key at a time
+            if path.exists(): # another thread may have rendered it while we waited
+                self._touch(db, key)
+            elif self.blobs is not None and self.blobs.get(f"tts/{fname}", path): # another node rendered it
+                self._touch(db, key)
+            else:
+                tmp = self.root / f".{uuid4().hex}.part" # write to temp name so readers never see half a file
+                try:
+                    synthesize(self.client, text, self.settings, tmp)
+                    os.replace(tmp, path) # atomic publish
+                finally:
+                    tmp.unlink(missing_ok = True)
+                if self.blobs is not None:
+                    self.blobs.put(f"tts/{fname}", path)
+
+                self._index(db, key, text, fname, path.stat().st_size)
+                self.evict(db)
+
+        return fname
+
+    # per-key lock; entries are dropped when nobody is waiting on them
+    @contextmanager
+    def _key_lock(self, key):
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    def _index(self, db, key, text, fname, size):
+        now = datetime.utcnow()
+        row = db.get(TtsClip, key)
+        if row is None:
+            row = TtsClip(cache_key = key, hanzi = text, filename = fname, created_at = now)
+            db.add(row)
+        row.size_bytes = size
+        row.last_used_at = now
+        db.commit()
+
+    def _touch(self, db, key):
+        row = db.get(TtsClip, key)
+        now = datetime.utcnow()
+        if row is None: # file on disk but not indexed (e.g. copied in by a deploy) -> index it
+            fname = f"{key}.{self.settings.get('response_format', 'mp3')}"
+            path = self.root / fname
+            if path.exists():
+                db.add(TtsClip(cache_key = key, hanzi = "", filename = fname, size_bytes = path.stat().st_size))
+                db.commit()
+            return
+        if now - row.last_used_at > TOUCH_EVERY:
+            row.last_used_at = now
+            db.commit()
+
+    # drop clips older than max_age, then least-recently-used clips until under max_bytes
+    def evict(self, db):
+        removed = []
+
+        if self.max_age is not None:
+            cutoff = datetime.utcnow() - self.max_age
+            for row in db.scalars(select(TtsClip).where(TtsClip.created_at < cutoff)):
+                removed.append(row)
+
+            # legacy/unindexed files (e.g. old uuid__tts.mp3) age out by mtime
+            indexed = set(db.scalars(select(TtsClip.filename)))
+            stale_mtime = time.time() - self.max_age.total_seconds()
+            for p in self.root.iterdir():
+                if p.is_file() and CLIP_NAME.match(p.name) and p.name not in indexed and p.stat().st_mtime < stale_mtime:
+                    p.unlink(missing_ok = True)
+
+        if self.max_bytes is not None:
+            total = db.scalar(select(func.coalesce(func.sum(TtsClip.size_bytes), 0)))
+            total -= sum(r.size_bytes for r in removed)
+            if total > self.max_bytes:
+                gone = {r.cache_key for r in removed}
+                for row in db.scalars(select(TtsClip).order_by(TtsClip.last_used_at)):
+                    if total <= self.max_bytes:
+                        break
+                    if row.cache_key in gone:
+                        continue
+                    removed.append(row)
+                    total -= row.size_bytes
+
+        for row in removed:
+            (self.root / row.filename).unlink(missing_ok = True)
+            if self.blobs is not None:
+                self.blobs.delete(f"tts/{row.filename}")
+            db.delete(row)
+        if removed:
+            db.commit()
+
+        return len(removed)
@@ -0,0 +1,145 @@
+from mainapp.api.audio import av, probe_audio, audio_duration
+from mainapp import metrics
+import hashlib
+import os
+import threading
+
+CHUNK = 64 * 1024 # bytes read from the request / written to disk per step
+PROBE_BYTES = 64 * 1024 # probe container + codec once this much has arrived (or at the end, for tiny files)
+PIPE_LIMIT = 4 * 1024 * 1024 # early decoder more than this far behind the upload -> give up on it (memory cap)
+
+class UploadRejected(Exception): # bad or too-long upload; `status` is the HTTP answer
+    def __init__(self, message, status = 400):
+        super().__init__(message)
+        self.status = status
+
+# copy an upload body to `out_path` in CHUNK blocks, checking it on the way:
+# - container/codec probed from the first PROBE_BYTES (not audio -> 415, header duration over `max_seconds` -> 413)
+# - seconds decoded so far by the early decoder over `max_seconds` -> 413 while still receiving
+# - at the end: decoded seconds (or header / packet-timestamp duration without the decoder) checked once more
+# the file only appears at `out_path` once it passed; -> probe info + {bytes, sha256, duration}
+def receive_upload(stream, out_path, max_seconds = None, decode_early = True):
+    tmp = out_path.with_name(f".{out_path.name}.part")
+    digest, size, probed, head = hashlib.sha256(), 0, False, b""
+    decoder = StreamingDecoder() if decode_early and max_seconds and av is not None else None
+    try:
+        with metrics.span("upload_receive"), open(tmp, "wb") as out:
+            for block in iter(lambda: stream.read(CHUNK), b""):
+                out.write(block)
+                digest.update(block)
+                size += len(block)
+                if decoder is not None:
+                    decoder.feed(block)
+                    _check_seconds(decoder.seconds, max_seconds)
+                if not probed:
+                    head += block
+                if not probed and size >= PROBE_BYTES: # reject non-audio before reading the rest
+                    out.flush()
+                    _probe(tmp, max_seconds)
+                    if max_seconds: # a partial WAV probes as a short one: its header states the real length
+                        _check_seconds(wav_seconds(head) or 0, max_seconds)
+                    probed, head = True, b""
+
+        if size == 0:
+            raise UploadRejected("empty upload")
+        info = _probe(tmp, max_seconds) # whole file now (a partial WAV/MP3 "duration" is only an estimate from its size)
+        if max_seconds:
+            if decoder is not None and decoder.finish():
+                info["duration"] = decoder.seconds # what was actually decoded: a lying header can't slip through
+            elif info["duration"] is None: # early decoding off, or it needs a seekable file (MP4 with the index at the end)
+                try:
+                    info["duration"] = audio_duration(tmp)
+                except ValueError as e:
+                    raise UploadRejected(str(e), 415)
+            _check_seconds(info["duration"], max_seconds)
+        os.replace(tmp, out_path) # publish only accepted files
+    finally:
+        if decoder is not None:
+            decoder.cancel()
+        tmp.unlink(missing_ok = True)
+
+    return {**info, "bytes": size, "sha256": digest.hexdigest()}
+
+def _probe(path, max_seconds):
+    try:
+        info = probe_audio(path)
+    except ValueError as e:
+        raise UploadRejected(str(e), 415)
+    if info["duration"] is not None:
+        _check_seconds(info["duration"], max_seconds)
+    return info
+
+# duration a RIFF/WAVE header declares (data chunk size / byte rate), or None: not WAV, header cut off, or a
+# streaming WAV whose writer left the size at 0 / 0xFFFFFFFF. A short claim is checked again after decoding.
+def wav_seconds(head):
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        chunk, size = head[pos:pos + 4], int.from_bytes(head[pos + 4:pos + 8], "little")
+        if chunk == b"fmt " and pos + 20 <= len(head):
+            byte_rate = int.from_bytes(head[pos + 16:pos + 20], "little")
+        elif chunk == b"data":
+            return size / byte_rate if byte_rate and 0 < size < 0xFFFFFFFF else None
+        pos += 8 + size + (size & 1) # chunks are word-aligned
+    return None
+
+def _check_seconds(seconds, max_seconds):
+    if max_seconds and seconds > max_seconds:
+        raise UploadRejected(f"recording longer than {max_seconds:g}s", 413)
+
+# decodes an upload on a background thread while its bytes are still arriving (PyAV reads from this object as
+# from a non-seekable file); `seconds` = audio decoded so far
+class StreamingDecoder:
+    def __init__(self):
+        self.seconds = 0.0
+        self.error = None
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self._eof = self._stop = False
+        self._thread = threading.Thread(target = self._run, name = "upload-decode", daemon = True)
+        self._thread.start()
+
+    def feed(self, data):
+        with self._cond:
+            if self._stop:
+                return
+            if len(self._buf) + len(data) > PIPE_LIMIT: # decoder stalled: stop it, the duration is measured after upload
+                self._stop = True
+                self.error = RuntimeError("early decoder fell behind")
+            else:
+                self._buf.extend(data)
+            self._cond.notify()
+
+    # end of body: wait for the decoder to drain -> True when it decoded the whole file
+    def finish(self, timeout = 10):
+        with self._cond:
+            self._eof = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        return not self._thread.is_alive() and self.error is None
+
+    def cancel(self):
+        with self._cond:
+            self._stop = self._eof = True
+            self._cond.notify()
+
+    def read(self, n):
+        with self._cond:
+            while not self._buf and not self._eof and not self._stop:
+                self._cond.wait()
+            if self._stop:
+                return b""
+            out = bytes(self._buf[:n])
+            del self._buf[:n]
+            return out
+
+    def _run(self):
+        try:
+            with av.open(self) as container:
+                for frame in container.decode(audio = 0):
+                    self.seconds += frame.samples / frame.sample_rate
+                    if self._stop:
+                        break
+        except Exception as e: # undecodable without seeking, or broken; receive_upload falls back to audio_duration
+            self.error = e
@@ -0,0 +1,139 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+import csv
+import json
+import multiprocessing
+import time
+
+# yield (audio_path, phrase_id, error) from a .jsonl ({"audio", "phrase_id"}) or .csv/.tsv (audio,phrase_id) manifest
+# a malformed line comes out with error = "line N: ..." (reported as one failed row, the rest of the run goes on)
+def read_manifest(path):
+    path = Path(path)
+    base = path.parent # relative audio paths are resolved against the manifest's folder
+
+    if path.suffix.lower() in (".csv", ".tsv"):
+        with open(path, newline = "") as f:
+            reader = csv.reader(f, delimiter = "\t" if path.suffix.lower() == ".tsv" else ",")
+            for row in reader:
+                if not row or row[0].startswith("#") or row[0] == "audio": # skip blanks, comments, header
+                    continue
+                if len(row) < 2 or not row[0].strip() or not row[1].strip():
+                    yield row[0], "", f"line {reader.line_num}: expected audio,phrase_id"
+                    continue
+                yield base / row[0], row[1].strip(), None
+    else:
+        with open(path) as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    yield "", "", f"line {n}: invalid JSON ({e})"
+                    continue
+                if not isinstance(item, dict) or not item.get("audio") or not item.get("phrase_id"):
+                    item = item if isinstance(item, dict) else {}
+                    yield item.get("audio") or "", item.get("phrase_id") or "", f'line {n}: expected "audio" and "phrase_id"'
+                    continue
+                yield base / item["audio"], item["phrase_id"], None
+
+_references = None # per-worker ReferenceStore (memory-mapped once per process)
+_templates = None # per-worker TemplateStore (same)
+
+# score one recording; runs in a worker process
+# `pitch` = extract_f0 options; with {"backend": "yin"} the worker never loads parselmouth
+def score_file(audio_path, phrase_id, plots_dir = None, pitch = None, segmentation = "energy"):
+    from mainapp.api.api import REF_DIR, TEMPLATE_DIR
+    from mainapp.api.analysis import analyze_pitch, plot_title
+    from mainapp.phrases import get_phrase_by_id
+    from mainapp.api.audio import decode_audio, SAMPLE_RATE
+    from mainapp.api.reference import ReferenceStore
+    from mainapp.api.tone_models import TemplateStore
+
+    global _references, _templates
+    if _references is None:
+        _references = ReferenceStore(REF_DIR)
+        _templates = TemplateStore(TEMPLATE_DIR)
+
+    row = {"audio": str(audio_path), "phrase_id": phrase_id}
+    phrase = get_phrase_by_id(phrase_id)
+    if not phrase:
+        return {**row, "error": "unknown phrase_id"}
+
+    try:
+        samples = decode_audio(audio_path)
+        overall, syllables, series = analyze_pitch(samples, phrase, _references.get(phrase_id), pitch, segmentation, _templates.get())
+    except Exception as e:
+        return {**row, "error": f"{type(e).__name__}: {e}"}
+
+    row.update(score = overall, syllables = syllables, duration = len(samples) / SAMPLE_RATE)
+
+    if plots_dir is not None: # plot-free by default
+        from mainapp.api.plotting import render_plot_png
+        out = Path(plots_dir) / f"{Path(audio_path).stem}__{phrase_id}.png"
+        out.write_bytes(render_plot_png(series, plot_title(phrase, overall)))
+        row["plot"] = str(out)
+
+    return row
+
+# stream manifest items through a process pool, yielding results as they finish (bounded in-flight work)
+def iter_scores(items, workers, plots_dir = None, pitch = None, segmentation = "energy"):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers = workers, mp_context = ctx) as pool:
+        inflight = set()
+        for audio_path, phrase_id, error in items:
+            if error is not None: # malformed manifest line: one failed row, nothing to score
+                yield {"audio": str(audio_path), "phrase_id": phrase_id, "error": error}
+                continue
+            if len(inflight) >= workers * 4: # keep memory flat on huge manifests
+                done, inflight = wait(inflight, return_when = FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+            inflight.add(pool.submit(score_file, audio_path, phrase_id, plots_dir, pitch, segmentation))
+
+        for fut in wait(inflight).done:
+            yield fut.result()
+
+# write rows to .jsonl (streamed) or .parquet (needs pyarrow); returns (n_rows, n_errors, audio_seconds)
+def write_results(rows, out_path):
+    out_path = Path(out_path)
+    n = errors = 0
+    audio_s = 0.0
+
+    if out_path.suffix.lower() == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("writing .parquet needs pyarrow (pip install pyarrow)")
+
+        table = []
+        for row in rows:
+            n, errors, audio_s = n + 1, errors + ("error" in row), audio_s + row.get("duration", 0.0)
+            table.append({**row, "syllables": json.dumps(row.get("syllables", []), ensure_ascii = False)})
+        pq.write_table(pa.Table.from_pylist(table), out_path)
+        return n, errors, audio_s
+
+    with open(out_path, "w") as f:
+        for row in rows:
+            n, errors, audio_s = n + 1, errors + ("error" in row), audio_s + row.get("duration", 0.0)
+            f.write(json.dumps(row, ensure_ascii = False) + "\n")
+    return n, errors, audio_s
+
+def run_batch(manifest, out_path, workers, plots_dir = None, pitch = None, segmentation = "energy"):
+    if plots_dir is not None:
+        Path(plots_dir).mkdir(parents = True, exist_ok = True)
+
+    t0 = time.perf_counter()
+    n, errors, audio_s = write_results(iter_scores(read_manifest(manifest), workers, plots_dir, pitch, segmentation), out_path)
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "files": n,
+        "errors": errors,
+        "seconds": elapsed,
+        "files_per_sec": n / elapsed if elapsed else 0.0,
+        "files_per_sec_per_core": n / elapsed / workers if elapsed else 0.0,
+        "audio_seconds": audio_s,
+        "realtime_factor": elapsed * workers / audio_s if audio_s else 0.0, # CPU-seconds per second of audio
+    }
@@ -0,0 +1,380 @@
+from pathlib import Path
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+STAGES = ("decode", "segment", "extract_f0", "score", "analyze", "plot", "pipeline") # in-process stages, timed per item
+HTTP_STAGES = ("http_upload", "http_compare", "http_compare_retry", "http_plot") # retry = same file_url again (result cache hit)
+TOLERANCE = 0.20 # a stage regresses when p50 or p90 grows by more than this fraction of the baseline...
+MIN_DELTA_MS = 0.5 # ...and by more than this many milliseconds (ignores jitter on sub-ms stages)
+ACCURACY_DROP = 0.01 # accuracy regresses when it falls by more than this
+BOUNDARY_DRIFT_MS = 10 # syllable boundary error regresses when it grows by more than this
+HEAVY_MODULES = ("numpy", "parselmouth", "av", "matplotlib", "openai") # must stay out of `import main` (loaded lazily)
+IMPORT_BUDGET_MS = 800 # default cold-start budget for `import main` (app creation included)
+
+# deterministic synthetic corpus: real phrases from the bank, rendered with varied speaker/noise settings
+# -> list of dicts {phrase, tones, audio (float32 16 kHz), params}
+def make_corpus(n, seed = 0):
+    from mainapp.phrases import get_registry
+    from mainapp.api.synth import render_tones
+    from mainapp.api.audio import SAMPLE_RATE
+
+    rng = random.Random(seed)
+    phrases = [p for p in get_registry().items if 2 <= len(p["tones"]) <= 5]
+    phrases.sort(key = lambda p: p["phrase_id"]) # stable across DB orderings
+    corpus = []
+    for i in range(n):
+        ph = rng.choice(phrases)
+        params = {
+            "syl_dur": round(rng.uniform(0.22, 0.45), 3),
+            "gap": round(rng.uniform(0.03, 0.12), 3),
+            "base_f0": round(rng.uniform(100, 260), 1), # low male .. high female voices
+            "noise": rng.choice([0.0, 0.0, 0.01, 0.03, 0.06]),
+            "lead": round(rng.uniform(0.0, 0.3), 3),
+            "seed": i,
+        }
+        tones = ph["surface_tones"] # rendered as spoken (sandhi applied), which is also what analyze_pitch expects
+        corpus.append({"phrase": ph, "tones": tones, "audio": render_tones(tones, SAMPLE_RATE, **params), "params": params})
+    return corpus
+
+def _timed(fn, *args, **kw):
+    t0 = time.perf_counter()
+    out = fn(*args, **kw)
+    return out, time.perf_counter() - t0
+
+def _summary(seconds):
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+# every stage of the analysis pipeline on each corpus item (encoded as Opus so decode does real work)
+# `templates` = ToneTemplates to score with (see train_templates); None = the rule scorer
+def bench_stages(corpus, workdir, plots = True, pitch = None, segmentation = "energy", templates = None):
+    from mainapp.api.audio import decode_audio, encode_audio, SAMPLE_RATE
+    from mainapp.api.pitch import extract_f0
+    from mainapp.api.segment import trim, syllable_edges
+    from mainapp.api.scoring import score_windows
+    from mainapp.api.plotting import render_plot_png
+    from mainapp.api.analysis import analyze_pitch, plot_title
+
+    pitch = pitch or {}
+    times = {s: [] for s in STAGES}
+    acc = _Accuracy(templates)
+    audio_s = 0.0
+
+    for k, item in enumerate(corpus):
+        src = Path(workdir) / f"item{k}.opus"
+        encode_audio(src, item["audio"]) # not timed: encoding is the client's job
+
+        t0 = time.perf_counter()
+        samples, dt = _timed(decode_audio, src)
+        times["decode"].append(dt)
+        n = len(item["tones"])
+        if segmentation == "energy":
+            (start, end), dt = _timed(trim, samples)
+            edges, dt2 = _timed(syllable_edges, samples, n, start, end)
+            times["segment"].append(dt + dt2)
+        (t, f0, dur), dt = _timed(extract_f0, samples, **pitch)
+        times["extract_f0"].append(dt)
+        if segmentation != "energy":
+            edges = np.linspace(0, dur, n + 1)
+        _, dt = _timed(templates.score if templates is not None else score_windows, t, f0, edges, item["tones"])
+        times["score"].append(dt)
+        (overall, syllables, series), dt = _timed(analyze_pitch, samples, item["phrase"], None, pitch, segmentation, templates)
+        times["analyze"].append(dt)
+        if plots:
+            _, dt = _timed(render_plot_png, series, plot_title(item["phrase"], overall))
+            times["plot"].append(dt)
+        times["pipeline"].append(time.perf_counter() - t0)
+        audio_s += len(samples) / SAMPLE_RATE
+        acc.add_tones(t, f0, syllables, item["tones"])
+        acc.add_edges(edges, item)
+
+    total = sum(times["pipeline"])
+    return {
+        "stages": {s: _summary(v) for s, v in times.items() if v},
+        "throughput_items_per_s": round(len(corpus) / total, 2) if total else None,
+        "realtime_factor": round(total / audio_s, 4) if audio_s else None,
+        "accuracy": acc.result(),
+    }
+
+# pitch backends head to head on the raw corpus audio: speed (per utterance, and YIN batched) + accuracy
+# against the contour each item was rendered from
+def bench_pitch(corpus, backends = ("praat", "yin"), batch = 16):
+    from mainapp.api.pitch import extract_f0, yin_batch, BACKENDS
+
+    times, accuracy = {}, {}
+    for backend in backends:
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown pitch backend {backend!r}")
+        for auto in (False, True):
+            name = backend + ("_auto" if auto else "")
+            opts = {"floor": None, "ceiling": None} if auto else {}
+            times[name], acc = [], _Accuracy()
+            for item in corpus:
+                (t, f0, _), dt = _timed(extract_f0, item["audio"], backend, **opts)
+                times[name].append(dt)
+                acc.add_track(t, f0, item)
+                acc.add_tones(t, f0, None, item["tones"])
+            accuracy[name] = acc.result()
+
+    if "yin" in backends: # many utterances per call; per-utterance time = batch time / batch size
+        times["yin_batch"] = []
+        for i in range(0, len(corpus), batch):
+            chunk = [item["audio"] for item in corpus[i:i + batch]]
+            _, dt = _timed(yin_batch, chunk)
+            times["yin_batch"].extend([dt / len(chunk)] * len(chunk))
+
+    return {"stages": {name: _summary(v) for name, v in times.items()}, "accuracy": accuracy}
+
+# f0 the synthesizer rendered at times `t` (NaN outside syllables, and within 20 ms of their edges)
+def _truth_f0(item, t):
+    from mainapp.api.synth import tone_contour
+    from mainapp.api.audio import SAMPLE_RATE
+
+    p, out = item["params"], np.full(len(t), np.nan)
+    pos = int(p["lead"] * SAMPLE_RATE) / SAMPLE_RATE
+    for tone in item["tones"]:
+        n = int((p["syl_dur"] * 0.6 if tone == 5 else p["syl_dur"]) * SAMPLE_RATE) # same lengths as render_tones
+        inside = (t >= pos + 0.02) & (t < pos + n / SAMPLE_RATE - 0.02)
+        contour = tone_contour(tone, n, p["base_f0"])
+        out[inside] = contour[np.clip(((t[inside] - pos) * SAMPLE_RATE).astype(int), 0, n - 1)]
+        pos += (n + int(p["gap"] * SAMPLE_RATE)) / SAMPLE_RATE
+    return out
+
+# running accuracy counters: tone verdicts and (when the true contour is known) frame-level pitch errors
+class _Accuracy:
+    def __init__(self, templates = None):
+        self.templates = templates # score tones with these instead of the rules
+        self.checked = self.correct = self.wrong_checked = self.false_accepts = 0
+        self.voiced = self.missed = self.gross = 0
+        self.boundaries, self.boundary_error = 0, 0.0
+
+    # a correct scorer passes each syllable for the tone it was rendered with, and fails it for the
+    # confusable one (1<->4, 2<->3); `syllables` gives the windows (None = uniform split)
+    def add_tones(self, t, f0, syllables, tones):
+        from mainapp.api.scoring import score_windows
+
+        if syllables:
+            edges = np.asarray([s["t0"] for s in syllables] + [syllables[-1]["t1"]])
+        else:
+            edges = np.linspace(0, t[-1] + (t[1] - t[0] if len(t) > 1 else 0.01), len(tones) + 1)
+        swapped = [{1: 4, 4: 1, 2: 3, 3: 2}.get(tn, tn) for tn in tones]
+        score = self.templates.score if self.templates is not None else score_windows
+        for tns, ok_expected in ((tones, True), (swapped, False)):
+            for (_, label), tn in zip(score(t, f0, edges, tns), tns):
+                if tn not in (1, 2, 3, 4):
+                    continue
+                if ok_expected:
+                    self.checked += 1
+                    self.correct += label.startswith("ok")
+                else:
+                    self.wrong_checked += 1
+                    self.false_accepts += label.startswith("ok")
+
+    # gross pitch error: > 20% off the true f0 (octave jumps etc.); missed: truly voiced frame reported unvoiced
+    def add_track(self, t, f0, item):
+        truth = _truth_f0(item, t)
+        voiced = np.isfinite(truth)
+        found = voiced & np.isfinite(f0)
+        self.voiced += int(voiced.sum())
+        self.missed += int((voiced & ~np.isfinite(f0)).sum())
+        self.gross += int((np.abs(f0[found] - truth[found]) > 0.2 * truth[found]).sum())
+
+    # syllable boundary error: how far each inner edge lands outside the silent gap between the syllables it separates
+    def add_edges(self, edges, item):
+        from mainapp.api.audio import SAMPLE_RATE
+
+        p, pos, gaps = item["params"], int(item["params"]["lead"] * SAMPLE_RATE), []
+        for tone in item["tones"]:
+            pos += int((p["syl_dur"] * 0.6 if tone == 5 else p["syl_dur"]) * SAMPLE_RATE)
+            gaps.append((pos / SAMPLE_RATE, (pos + int(p["gap"] * SAMPLE_RATE)) / SAMPLE_RATE))
+            pos += int(p["gap"] * SAMPLE_RATE)
+        for e, (a, b) in zip(edges[1:-1], gaps):
+            self.boundaries += 1
+            self.boundary_error += max(0.0, a - e, e - b)
+
+    def result(self):
+        out = {
+            "tone_recall": round(self.correct / self.checked, 4) if self.checked else None, # correct tone scored "ok"
+            "false_accept": round(self.false_accepts / self.wrong_checked, 4) if self.wrong_checked else None, # wrong tone scored "ok"
+            "syllables": self.checked,
+        }
+        if self.voiced:
+            out["gross_pitch_error"] = round(self.gross / max(1, self.voiced - self.missed), 4)
+            out["voicing_miss"] = round(self.missed / self.voiced, 4)
+        if self.boundaries:
+            out["boundary_error_ms"] = round(self.boundary_error / self.boundaries * 1000, 1)
+        return out
+
+# the same items through upload -> compare -> plot via Flask's test client (scratch DB, files cleaned up)
+def bench_http(corpus, workdir):
+    from mainapp import create_app
+    from mainapp.api.audio import write_wav
+
+    app = create_app({"DATABASE_URL": f"sqlite:///{Path(workdir) / 'bench.db'}", "COMPARE_MODE": "sync"})
+    client = app.test_client()
+    times = {s: [] for s in HTTP_STAGES}
+    created = []
+
+    for k, item in enumerate(corpus):
+        wav = Path(workdir) / f"http{k}.wav"
+        write_wav(wav, item["audio"])
+        phrase_id = item["phrase"]["phrase_id"]
+
+        with open(wav, "rb") as f:
+            r, dt = _timed(client.post, "/api/upload", data = {"audio": (f, "bench.wav"), "phrase_id": phrase_id})
+        times["http_upload"].append(dt)
+        file_url = r.get_json()["file_url"]
+        r, dt = _timed(client.post, "/api/compare", json = {"phrase_id": phrase_id, "file_url": file_url})
+        times["http_compare"].append(dt)
+        plot_url = r.get_json()["plot_url"]
+        _, dt = _timed(client.post, "/api/compare", json = {"phrase_id": phrase_id, "file_url": file_url})
+        times["http_compare_retry"].append(dt)
+        _, dt = _timed(client.get, plot_url)
+        times["http_plot"].append(dt)
+        created.append((file_url, plot_url))
+
+    with app.app_context(): # remove what the run wrote into uploads/ and artifacts/
+        from mainapp.api.api import get_storage
+        storage = get_storage()
+        for file_url, plot_url in created:
+            upload = storage.find_upload(file_url.rsplit("/", 1)[1])
+            upload.unlink(missing_ok = True)
+            upload.with_name(upload.name + ".json").unlink(missing_ok = True)
+            run = storage.find_run(plot_url.rstrip("/").split("/")[-2])
+            shutil.rmtree(run, ignore_errors = True)
+            for shard in (upload.parent, run.parent):
+                try:
+                    shard.rmdir() # only succeeds when the bench left it empty
+                except OSError:
+                    pass
+    app.extensions["db_engine"].dispose()
+
+    return {"stages": {s: _summary(v) for s, v in times.items()}}
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, timeout = 5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "git": rev or None,
+    }
+
+# cold start: `python -X importtime -c "import <target>"` in a fresh interpreter without an OpenAI key
+# -> {total_ms, heavy_loaded, top: slowest modules by self time}
+def import_profile(target = "main", top = 15):
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"} # the app must import without one
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd = Path(__file__).resolve().parent.parent, env = env, capture_output = True, text = True, timeout = 120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cum_us) / 1000))
+
+    names = {name for name, _, _ in rows}
+    return {
+        "target": target,
+        "total_ms": round(next(cum for name, _, cum in rows if name == target), 1),
+        "modules": len(rows),
+        "heavy_loaded": sorted(m for m in HEAVY_MODULES if m in names),
+        "top": [{"module": name, "self_ms": round(ms, 1)} for name, ms, _ in sorted(rows, key = lambda r: -r[1])[:top]],
+    }
+
+# tone templates learned from a held-out synthetic corpus (another seed), so accuracy is never measured on training audio
+def train_templates(n, seed):
+    from mainapp.api.tone_models import utterance_examples, learn_templates
+
+    examples = []
+    for item in make_corpus(n, seed):
+        examples += utterance_examples(item["audio"], item["tones"], "synthetic")
+    return learn_templates(examples)
+
+# `tone_model` = "rules" (score_window thresholds) or "templates" (nearest template, trained by train_templates)
+def run_bench(n = 100, seed = 0, http = True, plots = True, pitch_backends = ("praat", "yin"), segmentation = "energy", tone_model = "rules"):
+    cold_start = import_profile() # first, while nothing heavy is loaded in this process either
+    corpus = make_corpus(n, seed)
+    templates = train_templates(n, seed + 1) if tone_model == "templates" else None
+    with tempfile.TemporaryDirectory(prefix = "mta-bench-") as workdir:
+        bench_stages(corpus[:min(5, n)], workdir, plots, segmentation = segmentation, templates = templates) # warm-up: imports, Praat/matplotlib first-call costs
+        results = {"stages": bench_stages(corpus, workdir, plots, segmentation = segmentation, templates = templates)}
+        if pitch_backends:
+            results["pitch"] = bench_pitch(corpus, pitch_backends)
+        if http:
+            results["http"] = bench_http(corpus, workdir)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"n": n, "seed": seed, "http": http, "plots": plots, "pitch_backends": list(pitch_backends or []), "segmentation": segmentation, "tone_model": tone_model},
+        "environment": environment(),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), # Linux reports KiB
+        "cold_start": cold_start,
+        **results,
+    }
+
+# -> list of human-readable regressions of `current` vs `baseline` (empty = ok)
+def compare_to_baseline(current, baseline, tolerance = TOLERANCE):
+    problems = []
+    for section in ("stages", "pitch", "http"):
+        cur = (current.get(section) or {}).get("stages", {})
+        base = (baseline.get(section) or {}).get("stages", {})
+        for stage, b in base.items():
+            c = cur.get(stage)
+            if not b or not c:
+                continue
+            for q in ("p50_ms", "p90_ms"):
+                if c[q] > b[q] * (1 + tolerance) and c[q] - b[q] > MIN_DELTA_MS:
+                    problems.append(f"{stage} {q}: {b[q]:.2f} -> {c[q]:.2f} ms (+{(c[q] / b[q] - 1) * 100:.0f}%)")
+
+    cur_cold, base_cold = current.get("cold_start"), baseline.get("cold_start")
+    if cur_cold and base_cold:
+        b, c = base_cold["total_ms"], cur_cold["total_ms"]
+        if c > b * (1 + tolerance) and c - b > MIN_DELTA_MS:
+            problems.append(f"import main: {b:.0f} -> {c:.0f} ms (+{(c / b - 1) * 100:.0f}%)")
+        for m in set(cur_cold["heavy_loaded"]) - set(base_cold["heavy_loaded"]):
+            problems.append(f"import main now loads {m}")
+
+    pairs = [("", current["stages"]["accuracy"], (baseline.get("stages") or {}).get("accuracy", {}))]
+    for name, base_acc in ((baseline.get("pitch") or {}).get("accuracy") or {}).items():
+        cur_acc = ((current.get("pitch") or {}).get("accuracy") or {}).get(name)
+        if cur_acc:
+            pairs.append((f"{name} ", cur_acc, base_acc))
+    for prefix, cur_acc, base_acc in pairs:
+        for key, worse in (("tone_recall", -1), ("false_accept", 1), ("gross_pitch_error", 1), ("voicing_miss", 1)):
+            b, c = base_acc.get(key), cur_acc.get(key)
+            if b is not None and c is not None and (c - b) * worse > ACCURACY_DROP:
+                problems.append(f"{prefix}{key}: {b:.3f} -> {c:.3f}")
+        b, c = base_acc.get("boundary_error_ms"), cur_acc.get("boundary_error_ms")
+        if b is not None and c is not None and c - b > BOUNDARY_DRIFT_MS:
+            problems.append(f"{prefix}boundary_error_ms: {b:.1f} -> {c:.1f}")
+    return problems
+
+def load_results(path):
+    return json.loads(Path(path).read_text())
@@ -0,0 +1,374 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from mainapp.db import get_session
+from mainapp.models import Phrase
+import click
+import json
+import os
+import random
+import time
+
+# render one phrase, retrying with exponential backoff + jitter
+def _render_with_retry(app, cache, text, retries, backoff):
+    with app.app_context(): # worker threads need their own app context + scoped session
+        Session = get_session(app)
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    return cache.get_or_render(Session(), text)
+                except Exception:
+                    Session().rollback()
+                    if attempt == retries:
+                        raise
+                    time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff)) # back off before retrying
+        finally:
+            Session.remove()
+
+def _write_manifest(path, manifest):
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii = False, indent = 2, sort_keys = True))
+    os.replace(tmp, path) # atomic so an interrupted run never leaves a torn manifest
+
+# render reference audio for every phrase ahead of time
+@click.command("prewarm-tts")
+@click.option("--workers", default = 4, show_default = True, help = "concurrent TTS requests")
+@click.option("--retries", default = 3, show_default = True, help = "retries per phrase before giving up")
+@click.option("--backoff", default = 1.0, show_default = True, help = "base backoff in seconds (doubles per retry)")
+@click.option("--offline", is_flag = True, help = "use the synthetic tone stand-in instead of OpenAI")
+@click.option("--manifest", "manifest_path", type = click.Path(path_type = Path), default = None, help = "defaults to TTS_DIR/manifest.json")
+@with_appcontext
+def prewarm_tts(workers, retries, backoff, offline, manifest_path):
+    from mainapp.api.api import get_tts_cache
+    from mainapp.phrases import seed_phrases_if_empty
+
+    app = current_app._get_current_object()
+    if offline:
+        app.config["TTS_BACKEND"] = "offline"
+        app.extensions.pop("tts_cache", None) # rebuild with the offline client
+
+    seed_phrases_if_empty() # make sure the phrase bank is in the DB
+    cache = get_tts_cache()
+    manifest_path = manifest_path or cache.root / "manifest.json"
+
+    manifest = {}
+    if manifest_path.exists(): # resume: keep what earlier runs already rendered
+        manifest = json.loads(manifest_path.read_text())
+
+    db = get_session(app)()
+    todo = []
+    for ph in db.query(Phrase).order_by(Phrase.phrase_id):
+        _, fname = cache.filename_for(ph.hanzi)
+        if manifest.get(ph.phrase_id) == fname and (cache.root / fname).exists():
+            continue # already rendered with the current voice settings
+        todo.append((ph.phrase_id, ph.hanzi))
+
+    click.echo(f"{len(manifest)} already rendered, {len(todo)} to go ({workers} workers)")
+
+    failed = []
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        futures = {
+            pool.submit(_render_with_retry, app, cache, text, retries, backoff): phrase_id
+            for phrase_id, text in todo
+        }
+        for done, fut in enumerate(as_completed(futures), start = 1):
+            phrase_id = futures[fut]
+            try:
+                fname = fut.result()
+            except Exception as e:
+                failed.append(phrase_id)
+                click.echo(f"  {phrase_id}: failed ({e})", err = True)
+                continue
+
+            manifest[phrase_id] = fname
+            _write_manifest(manifest_path, manifest) # persist progress so a rerun resumes here
+
+            if done % 25 == 0:
+                click.echo(f"  {done}/{len(todo)}")
+
+    click.echo(f"rendered {len(todo) - len(failed)} in {time.perf_counter() - t0:.1f}s -> {manifest_path}")
+    if failed:
+        raise click.ClickException(f"{len(failed)} phrases failed: {', '.join(sorted(failed))}")
+
+# score a manifest of (audio, phrase_id) pairs offline across all cores
+@click.command("score-batch")
+@click.argument("manifest", type = click.Path(exists = True, dir_okay = False, path_type = Path))
+@click.option("--out", "out_path", type = click.Path(path_type = Path), default = Path("scores.jsonl"), show_default = True, help = ".jsonl or .parquet")
+@click.option("--workers", default = os.cpu_count() or 1, show_default = True, help = "worker processes")
+@click.option("--plots", "plots_dir", type = click.Path(path_type = Path), default = None, help = "also render plots into this folder (off by default)")
+@click.option("--pitch-backend", type = click.Choice(["praat", "yin"]), default = "praat", show_default = True, help = "yin = pure NumPy, no parselmouth")
+@click.option("--auto-range", is_flag = True, help = "estimate each recording's f0 range instead of 75-500 Hz")
+@click.option("--segmentation", type = click.Choice(["energy", "uniform"]), default = "energy", show_default = True, help = "energy = trim silence, split syllables at intensity valleys")
+def score_batch(manifest, out_path, workers, plots_dir, pitch_backend, auto_range, segmentation):
+    from mainapp.batch import run_batch
+
+    pitch = {"backend": pitch_backend}
+    if auto_range:
+        pitch.update(floor = None, ceiling = None)
+    try:
+        stats = run_batch(manifest, out_path, workers, plots_dir, pitch, segmentation)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(
+        f"scored {stats['files']} files ({stats['errors']} errors) in {stats['seconds']:.1f}s -> {out_path}\n"
+        f"  {stats['files_per_sec']:.1f} files/s, {stats['files_per_sec_per_core']:.2f} files/s/core, "
+        f"RTF {stats['realtime_factor']:.3f} over {stats['audio_seconds']:.0f}s of audio"
+    )
+
+# extract + store a normalized reference pitch contour for every phrase from its TTS audio
+@click.command("build-references")
+@click.option("--offline", is_flag = True, help = "render missing TTS with the synthetic tone stand-in")
+@with_appcontext
+def build_references(offline):
+    from mainapp.api.api import get_tts_cache, get_reference_store
+    from mainapp.api.pitch import extract_f0
+    from mainapp.phrases import seed_phrases_if_empty, pinyin_syllables
+    from mainapp.api.audio import decode_audio, to_sound
+    from mainapp.api.reference import normalize_contour
+    import numpy as np
+
+    app = current_app._get_current_object()
+    if offline:
+        app.config["TTS_BACKEND"] = "offline"
+        app.extensions.pop("tts_cache", None)
+
+    seed_phrases_if_empty()
+    cache = get_tts_cache()
+    db = get_session(app)()
+
+    contours = {}
+    t0 = time.perf_counter()
+    for ph in db.query(Phrase).order_by(Phrase.phrase_id):
+        fname = cache.get_or_render(db, ph.hanzi) # cache hit after prewarm-tts
+        _, f0, _ = extract_f0(to_sound(decode_audio(cache.root / fname)))
+        contour, _, _ = normalize_contour(f0)
+        n = max(1, len(pinyin_syllables(ph.pinyin)))
+        if len(contour) < max(2, n): # an even split needs at least one frame per syllable
+            click.echo(f"  {ph.phrase_id}: {len(contour)} voiced frames for {n} syllables, skipped", err = True)
+            continue
+        bounds = np.round(np.linspace(0, len(contour), n + 1)).astype(int) # TTS is clean speech: even split
+        contours[ph.phrase_id] = (contour, bounds)
+
+    store = get_reference_store()
+    store.write(contours)
+    click.echo(f"stored {len(contours)} contours in {time.perf_counter() - t0:.1f}s -> {store.root}")
+
+# learn per-tone, per-position contour templates from the TTS clips and from well-scored learner syllables
+@click.command("build-templates")
+@click.option("--offline", is_flag = True, help = "render missing TTS with the synthetic tone stand-in")
+@click.option("--min-score", default = 90, show_default = True, help = "learner syllables scoring at least this become examples")
+@click.option("--max-attempts", default = 5000, show_default = True, help = "most recent qualifying attempts to decode (0 = TTS only)")
+@click.option("--per-key", default = 8, show_default = True, help = "templates kept per (tone, position, source)")
+@with_appcontext
+def build_templates(offline, min_score, max_attempts, per_key):
+    from mainapp.api.api import get_tts_cache, get_template_store, get_storage
+    from mainapp.api.audio import decode_audio
+    from mainapp.api.pitch import extract_f0
+    from mainapp.api.tone_models import utterance_examples, syllable_vectors, contexts, learn_templates
+    from mainapp.models import Attempt
+    from mainapp.phrases import seed_phrases_if_empty, get_registry, get_phrase_by_id
+    from urllib.parse import urlparse
+    import numpy as np
+
+    app = current_app._get_current_object()
+    if offline:
+        app.config["TTS_BACKEND"] = "offline"
+        app.extensions.pop("tts_cache", None)
+
+    seed_phrases_if_empty()
+    cache = get_tts_cache()
+    db = get_session(app)()
+    t0 = time.perf_counter()
+
+    examples = []
+    voice = f"tts:{cache.settings.get('model')}/{cache.settings.get('voice')}" # one template family per TTS voice
+    for ph in sorted(get_registry().items, key = lambda p: p["phrase_id"]):
+        fname = cache.get_or_render(db, ph["hanzi"]) # cache hit after prewarm-tts
+        examples += utterance_examples(decode_audio(cache.root / fname), ph["surface_tones"], voice)
+    n_tts = len(examples)
+
+    n_attempts = 0
+    if max_attempts:
+        storage = get_storage()
+        rows = db.query(Attempt).filter(Attempt.score >= min_score).order_by(Attempt.created_at.desc()).limit(max_attempts)
+        for row in rows:
+            ph = get_phrase_by_id(row.phrase_id)
+            syllables = json.loads(row.syllables_json or "[]")
+            src = storage.fetch_upload(Path(urlparse(row.file_url).path).name)
+            if not ph or not syllables or len(syllables) != len(ph["surface_tones"]) or not src.is_file():
+                continue # phrase edited since, or the recording was deleted by retention
+            try:
+                t, f0, _ = extract_f0(decode_audio(src))
+            except Exception as e:
+                click.echo(f"  attempt {row.id}: {e}", err = True)
+                continue
+            edges = np.array([s["t0"] for s in syllables] + [syllables[-1]["t1"]]) # the windows it was scored on
+            vectors = syllable_vectors(t, f0, edges)
+            for s, ctx, vec in zip(syllables, contexts(len(syllables)), vectors):
+                if s["score"] >= min_score:
+                    examples.append((s.get("surface_tone", ph["surface_tones"][s["idx"]]), ctx, "learners", vec))
+            n_attempts += 1
+
+    templates = learn_templates(examples, per_key)
+    store = get_template_store()
+    store.write(templates)
+    click.echo(
+        f"stored {len(templates)} templates from {n_tts} TTS syllables and {len(examples) - n_tts} learner syllables "
+        f"({n_attempts} attempts) in {time.perf_counter() - t0:.1f}s -> {store.root}"
+    )
+
+# compile the Phrase table (+ reference contours) into the memory-mapped phrase bank every worker shares
+@click.command("build-phrasebank")
+@click.option("--out", type = click.Path(dir_okay = False, path_type = Path), default = None, help = "default: PHRASEBANK_PATH or artifacts/phrasebank.bin")
+@click.option("--references/--no-references", default = True, show_default = True, help = "include contours from `flask build-references`")
+@with_appcontext
+def build_phrasebank(out, references):
+    from mainapp.phrasebank import build_bank, DEFAULT_PATH
+    from mainapp.phrases import seed_phrases_if_empty
+
+    app = current_app._get_current_object()
+    seed_phrases_if_empty()
+    db = get_session(app)()
+    t0 = time.perf_counter()
+
+    contours = None
+    if references:
+        from mainapp.api.api import get_reference_store
+        contours = dict(get_reference_store().items())
+    rows = db.query(Phrase.phrase_id, Phrase.hanzi, Phrase.pinyin).yield_per(5000) # streamed: 100k+ rows stay cheap
+    path = out or Path(app.config.get("PHRASEBANK_PATH") or DEFAULT_PATH)
+    info = build_bank(rows, path, contours)
+    click.echo(
+        f"compiled {info['count']} phrases ({info['syllables']} syllables, {len(contours or {})} reference contours) "
+        f"into {info['bytes'] / 1024:.0f} KiB in {time.perf_counter() - t0:.1f}s -> {path}"
+    )
+
+# replay a recording through /api/stream in fixed-size byte chunks and print verdicts as they arrive
+@click.command("replay-stream")
+@click.argument("audio", type = click.Path(exists = True, dir_okay = False, path_type = Path))
+@click.argument("phrase_id")
+@click.option("--chunk-kb", default = 4, show_default = True, help = "bytes per chunk, in KiB (~250 ms of Opus at 128 kbps)")
+@with_appcontext
+def replay_stream(audio, phrase_id, chunk_kb):
+    client = current_app.test_client()
+    r = client.post("/api/stream", json = {"phrase_id": phrase_id, "ext": audio.suffix})
+    if r.status_code != 200:
+        raise click.ClickException(r.get_json()["error"])
+    urls = r.get_json()
+
+    data = audio.read_bytes()
+    step = chunk_kb * 1024
+    t0 = time.perf_counter()
+    shown = 0
+    for i in range(0, len(data), step):
+        j = client.post(urls["chunk_url"], data = data[i:i + step]).get_json()
+        for v in j["syllables"]:
+            click.echo(f"{time.perf_counter() - t0:6.2f}s  #{v['idx']} {v['syllable']} (tone {v['tone']}): {v['score']} {v['label']}")
+            shown += 1
+
+    j = client.post(urls["finish_url"]).get_json()
+    for v in j["streamed_syllables"][shown:]: # the last syllable is only closed by finish
+        click.echo(f"{time.perf_counter() - t0:6.2f}s  #{v['idx']} {v['syllable']} (tone {v['tone']}): {v['score']} {v['label']}")
+    click.echo(f"{time.perf_counter() - t0:6.2f}s  final score {j['score']}")
+
+# apply the STORAGE_* retention policy to uploads/ and artifacts/ once
+@click.command("storage-gc")
+@click.option("--dry-run", is_flag = True, help = "report what would be deleted/compressed without touching anything")
+@with_appcontext
+def storage_gc(dry_run):
+    from mainapp.api.api import get_storage
+
+    Session = get_session(current_app)
+    t0 = time.perf_counter()
+    stats = get_storage().gc(Session(), dry_run = dry_run)
+    Session.remove()
+
+    click.echo(
+        f"{'would delete' if dry_run else 'deleted'} {stats['deleted_uploads']} uploads + {stats['deleted_runs']} runs "
+        f"({stats['freed_bytes'] / 1e6:.1f} MB), {stats['cold']} to cold tier, "
+        f"{stats['resharded']} resharded, {stats['rows_updated']} attempt rows updated, "
+        f"{stats['scanned']} scanned in {time.perf_counter() - t0:.1f}s"
+    )
+
+# recompute attempt_syllables + the *_stats aggregates from the attempts table
+@click.command("rebuild-analytics")
+@with_appcontext
+def rebuild_analytics():
+    from mainapp.analytics import rebuild
+
+    Session = get_session(current_app)
+    t0 = time.perf_counter()
+    n = rebuild(Session())
+    Session.remove()
+    click.echo(f"rebuilt analytics from {n} attempts in {time.perf_counter() - t0:.1f}s")
+
+# reproducible benchmark on a synthetic tone corpus; exits non-zero on a regression vs --baseline
+@click.command("bench")
+@click.option("--n", "n", default = 100, show_default = True, help = "synthetic utterances in the corpus")
+@click.option("--seed", default = 0, show_default = True, help = "corpus seed (same seed = same audio)")
+@click.option("--out", "out_path", type = click.Path(path_type = Path), default = Path("bench.json"), show_default = True)
+@click.option("--baseline", type = click.Path(exists = True, dir_okay = False, path_type = Path), default = None, help = "earlier bench.json to compare against")
+@click.option("--tolerance", default = 0.2, show_default = True, help = "allowed p50/p90 slowdown as a fraction of the baseline")
+@click.option("--http/--no-http", default = True, show_default = True, help = "also time upload -> compare -> plot through the test client")
+@click.option("--plots/--no-plots", default = True, show_default = True, help = "include plot rendering")
+@click.option("--pitch-backends", default = "praat,yin", show_default = True, help = "pitch trackers to compare (empty = skip)")
+@click.option("--segmentation", type = click.Choice(["energy", "uniform"]), default = "energy", show_default = True, help = "syllable windows for the pipeline stages")
+@click.option("--tone-model", type = click.Choice(["rules", "templates"]), default = "rules", show_default = True, help = "templates = nearest-template scoring, trained on a held-out synthetic corpus")
+def bench(n, seed, out_path, baseline, tolerance, http, plots, pitch_backends, segmentation, tone_model):
+    from mainapp.bench import run_bench, compare_to_baseline, load_results
+
+    backends = tuple(b.strip() for b in pitch_backends.split(",") if b.strip())
+    try:
+        results = run_bench(n, seed, http, plots, backends, segmentation, tone_model)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    out_path.write_text(json.dumps(results, indent = 2))
+
+    for section in ("stages", "pitch", "http"):
+        for stage, s in (results.get(section) or {}).get("stages", {}).items():
+            click.echo(f"  {stage:<18} p50 {s['p50_ms']:8.2f}  p90 {s['p90_ms']:8.2f}  p99 {s['p99_ms']:8.2f} ms")
+    acc = results["stages"]["accuracy"]
+    click.echo(
+        f"{results['stages']['throughput_items_per_s']} items/s, RTF {results['stages']['realtime_factor']}, "
+        f"peak RSS {results['peak_rss_mb']} MB, tone recall {acc['tone_recall']}, false accept {acc['false_accept']}, "
+        f"boundary error {acc.get('boundary_error_ms')} ms -> {out_path}"
+    )
+    for name, a in (results.get("pitch") or {}).get("accuracy", {}).items():
+        click.echo(f"  {name:<11} gross pitch error {a['gross_pitch_error']}, voicing miss {a['voicing_miss']}, tone recall {a['tone_recall']}, false accept {a['false_accept']}")
+
+    if baseline is not None:
+        problems = compare_to_baseline(results, load_results(baseline), tolerance)
+        for p in problems:
+            click.echo(f"REGRESSION {p}", err = True)
+        if problems:
+            raise SystemExit(1)
+        click.echo(f"no regressions vs {baseline}")
+
+# cold-start check: time `import main` in a fresh interpreter; fails over budget or when a heavy module is loaded eagerly
+@click.command("import-budget")
+@click.option("--budget-ms", default = None, type = float, help = "fail above this many ms (default: IMPORT_BUDGET_MS)")
+@click.option("--top", default = 15, show_default = True, help = "slowest modules to list")
+def import_budget(budget_ms, top):
+    from mainapp.bench import import_profile, IMPORT_BUDGET_MS
+
+    budget_ms = budget_ms or IMPORT_BUDGET_MS
+    try:
+        prof = import_profile(top = top)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    for row in prof["top"]:
+        click.echo(f"  {row['self_ms']:8.1f} ms  {row['module']}")
+    click.echo(f"import main: {prof['total_ms']:.0f} ms over {prof['modules']} modules (budget {budget_ms:.0f} ms)")
+
+    problems = [f"eagerly imports {m}" for m in prof["heavy_loaded"]]
+    if prof["total_ms"] > budget_ms:
+        problems.append(f"{prof['total_ms']:.0f} ms is over the {budget_ms:.0f} ms budget")
+    for p in problems:
+        click.echo(f"OVER BUDGET {p}", err = True)
+    if problems:
+        raise SystemExit(1)
@@ -1,19 +1,48 @@
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, scoped_session, DeclarativeBase
+import atexit
+import logging
+import queue
+import threading
+import time
+from mainapp import metrics
+
+log = logging.getLogger(__name__)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500) # rows per write-behind commit
 
 class Base(DeclarativeBase): # SQLAlchemy declarative base
     pass
 
 def init_db(app): # call this once during app startup
-    db_path = Path(app.root_path) / "app.db" # store SQLite DB inside mainapp by default
-    app.config["DB_PATH"] = str(db_path) # path for debugging
+    cfg = app.config
+    url = cfg.get("DATABASE_URL") # e.g. postgresql+psycopg://user@host/db; default: SQLite file inside mainapp
+    if not url:
+        db_path = Path(app.root_path) / "app.db" # store SQLite DB inside mainapp by default
+        app.config["DB_PATH"] = str(db_path) # path for debugging
+        url = f"sqlite:///{db_path}"
 
-    engine = create_engine(
-        f"sqlite:///{db_path}", # SQLite file path
-        echo = False, # False for no SQL logs
-        connect_args = {"check_same_thread": False} # allow use across Flask threads
-    )
+    pool = {"pool_size": cfg.get("DB_POOL_SIZE", 10), "max_overflow": cfg.get("DB_MAX_OVERFLOW", 20)} # pooled connections
+    if url.startswith("sqlite"):
+        memory = ":memory:" in url or url.rstrip("/") == "sqlite:" # in-memory DBs keep SQLAlchemy's per-thread pool
+        engine = create_engine(
+            url,
+            echo = False, # False for no SQL logs
+            connect_args = {
+                "check_same_thread": False, # allow use across Flask threads
+                "timeout": cfg.get("DB_BUSY_TIMEOUT_MS", 5000) / 1000, # wait on a locked DB instead of failing at once
+            },
+            **({} if memory else pool),
+        )
+        if not memory:
+            event.listen(engine, "connect", _sqlite_pragmas(cfg.get("DB_BUSY_TIMEOUT_MS", 5000)))
+    else:
+        engine = create_engine(
+            url,
+            echo = False,
+            pool_pre_ping = True, # drop connections the server closed while idle
+            **pool,
+        )
 
     Session = scoped_session(sessionmaker(bind = engine, autoflush = False, autocommit = False)) # per-thread sessions
     app.extensions["db_engine"] = engine # store engine on app
@@ -25,5 +54,102 @@ def init_db(app): # call this once during app startup
 
     return engine, Session
 
+# per-connection SQLite tuning: WAL lets readers run alongside the single writer
+def _sqlite_pragmas(busy_timeout_ms):
+    def on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL") # persistent in the file; cheap no-op after the first connection
+        cur.execute("PRAGMA synchronous=NORMAL") # fsync at checkpoints, not every commit (safe with WAL)
+        cur.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cur.close()
+    return on_connect
+
+# add nullable columns declared on the models that an older database file is missing
+def ensure_columns(engine):
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            have = {c["name"] for c in existing.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have and col.nullable:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}'))
+
+# create indexes declared on the models that an older database file is missing (create_all skips existing tables)
+def ensure_indexes(engine):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind = engine, checkfirst = True)
+
 def get_session(app): # grab current scoped session
-    return app.extensions["db_session"]
\ No newline at end of file
+    return app.extensions["db_session"]
+
+# write-behind queue: request threads hand over new ORM rows, one thread group-commits them
+class WriteBehind:
+    def __init__(self, Session, batch_size = 100, flush_ms = 50, retries = 3):
+        self.Session = Session
+        self.batch_size = batch_size # max rows per commit
+        self.flush_s = flush_ms / 1000 # how long to wait for more rows before committing a partial batch
+        self.retries = retries
+        self.queue = queue.Queue()
+        self.written = 0
+        self.failed = 0
+        self.thread = threading.Thread(target = self._loop, name = "db-write-behind", daemon = True)
+        self.thread.start()
+        atexit.register(self.close) # don't lose queued rows on a clean shutdown
+
+    def submit(self, row): # row: a new (transient) ORM object
+        self.queue.put(row)
+
+    def flush(self, timeout = None): # block until everything submitted so far is committed
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout = 10)
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            batch, markers, stop = [], [], item is None
+            deadline = time.monotonic() + self.flush_s
+            while item is not None:
+                (markers if isinstance(item, threading.Event) else batch).append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout = max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                stop = item is None
+
+            if batch:
+                self._commit(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+    def _commit(self, batch):
+        for attempt in range(self.retries + 1):
+            db = self.Session()
+            try:
+                db.add_all(batch)
+                with metrics.span("db_batch_commit"):
+                    db.commit() # one transaction (one fsync) for the whole batch
+                metrics.observe("db_batch_rows", len(batch), BATCH_BUCKETS)
+                self.written += len(batch)
+                return
+            except Exception:
+                db.rollback()
+                if attempt == self.retries:
+                    self.failed += len(batch)
+                    log.exception("write-behind: dropped %d rows", len(batch))
+                    return
+                time.sleep(0.05 * (2 ** attempt))
+            finally:
+                self.Session.remove()
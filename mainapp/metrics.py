@@ -0,0 +1,285 @@
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import bisect
+import json
+import re
+import sys
+import threading
+import time
+
+PREFIX = "mta_" # metric name prefix in the /metrics exposition
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+
+_enabled = False # flipped by init_metrics; every recording helper checks this first
+_NULL = nullcontext() # shared no-op span for the disabled path
+_local = threading.local() # per-thread capture list (request trace / worker job)
+
+# process-local counters, gauges and fixed-bucket histograms
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {} # (name, labels) -> float
+        self.histograms = {} # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.buckets = {} # name -> bucket bounds
+        self.gauges = {} # name -> callable returning {labels: value} (read at scrape time)
+        self.help = {}
+
+    def inc(self, name, value = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets = LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                self.buckets.setdefault(name, buckets)
+                h = self.histograms[key] = [0] * (len(self.buckets[name]) + 2)
+            h[bisect.bisect_left(self.buckets[name], value)] += 1 # first bucket with bound >= value (le semantics)
+            h[-1] += value
+
+    def gauge(self, name, fn, help = ""):
+        self.gauges[name] = fn
+        self.help[name] = help
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        out = []
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+
+        for name in sorted({n for n, _ in counters}):
+            out.append(f"# TYPE {PREFIX}{name} counter")
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    out.append(f"{PREFIX}{name}{_labels(labels)} {_num(v)}")
+
+        for name in sorted({n for n, _ in histograms}):
+            out.append(f"# TYPE {PREFIX}{name} histogram")
+            bounds = self.buckets[name]
+            for (n, labels), h in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cum = 0
+                for le, count in zip([*bounds, "+Inf"], h[:-1]):
+                    cum += count
+                    out.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', le),))} {cum}")
+                out.append(f"{PREFIX}{name}_sum{_labels(labels)} {_num(h[-1])}")
+                out.append(f"{PREFIX}{name}_count{_labels(labels)} {cum}")
+
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                values = fn()
+            except Exception: # a broken gauge must not break the scrape
+                continue
+            if self.help.get(name):
+                out.append(f"# HELP {PREFIX}{name} {self.help[name]}")
+            out.append(f"# TYPE {PREFIX}{name} gauge")
+            for labels, v in sorted(values.items()):
+                out.append(f"{PREFIX}{name}{_labels(labels)} {_num(v)}")
+
+        return "\n".join(out) + "\n"
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+registry = Registry()
+
+def enabled():
+    return _enabled
+
+# time a pipeline stage: `with span("pitch"): ...` -> stage_seconds{stage="pitch"}
+def span(stage):
+    if not _enabled:
+        return _NULL
+    return _timed(stage)
+
+@contextmanager
+def _timed(stage):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(("span", stage, time.perf_counter() - t0))
+
+# apply one measurement, or hold it for the parent while running under call_captured
+def _record(event):
+    captured = getattr(_local, "captured", None)
+    if captured is not None:
+        captured.append(event)
+        return
+
+    kind, a, b = event
+    if kind == "span":
+        registry.observe("stage_seconds", b, stage = a)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append((a, round(b, 6)))
+    else: # "realtime": audio seconds, processing seconds
+        registry.inc("audio_seconds_total", a)
+        registry.inc("analysis_seconds_total", b)
+        registry.observe("realtime_factor", b / a, RTF_BUCKETS)
+
+def inc(name, value = 1, **labels):
+    if _enabled:
+        registry.inc(name, value, **labels)
+
+def observe(name, value, buckets = LATENCY_BUCKETS, **labels):
+    if _enabled:
+        registry.observe(name, value, buckets, **labels)
+
+# audio seconds vs processing seconds for one analysed recording
+def record_realtime(audio_s, elapsed_s):
+    if _enabled and audio_s > 0:
+        _record(("realtime", audio_s, elapsed_s))
+
+# run fn(*args) with its measurements held back -> (result, events); top-level so pool workers can run it
+# (worker processes have their own registry, so the parent replays the events with merge_captured)
+def call_captured(enabled_in_parent, fn, *args):
+    global _enabled
+    _enabled = enabled_in_parent # spawn-started workers don't inherit the flag
+    _local.captured = []
+    try:
+        return fn(*args), _local.captured
+    finally:
+        _local.captured = None
+
+def merge_captured(events):
+    if _enabled:
+        for event in events:
+            _record(event)
+
+# --- sampling profiler for slow requests (opt-in) ---
+
+# one background thread samples the stacks of threads currently serving requests
+class SlowRequestProfiler:
+    def __init__(self, out_dir, threshold_s, interval_s = 0.005, keep = 50, min_gap_s = 10):
+        self.out_dir = Path(out_dir)
+        self.threshold_s = threshold_s
+        self.interval_s = interval_s
+        self.keep = keep # newest dumps kept on disk; older ones are pruned after each write
+        self.min_gap_s = min_gap_s # at most one dump per this many seconds
+        self.last_dump = None # monotonic time of the last dump written
+        self.active = {} # thread id -> {collapsed stack: samples}
+        self.lock = threading.Lock()
+        threading.Thread(target = self._loop, name = "slow-request-profiler", daemon = True).start()
+
+    def start(self):
+        with self.lock:
+            self.active[threading.get_ident()] = {}
+
+    # stop sampling this thread; write a dump if the request was slow -> dump path or None
+    def finish(self, label, elapsed_s, trace):
+        with self.lock:
+            stacks = self.active.pop(threading.get_ident(), {})
+        if elapsed_s < self.threshold_s:
+            return None
+        with self.lock: # a slow backend makes every request slow; one dump per gap is enough to see why
+            now = time.monotonic()
+            if self.last_dump is not None and now - self.last_dump < self.min_gap_s:
+                registry.inc("slow_request_dumps_skipped_total")
+                return None
+            self.last_dump = now
+
+        self.out_dir.mkdir(parents = True, exist_ok = True)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}_{int(elapsed_s * 1000)}ms_{re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')}"
+        (self.out_dir / f"{stem}.folded").write_text( # flamegraph.pl / speedscope "collapsed stacks" format
+            "".join(f"{stack} {n}\n" for stack, n in sorted(stacks.items(), key = lambda kv: -kv[1]))
+        )
+        (self.out_dir / f"{stem}.json").write_text(json.dumps({
+            "request": label, "elapsed_s": round(elapsed_s, 4), "samples": sum(stacks.values()),
+            "spans": [{"stage": s, "seconds": dt} for s, dt in trace or []],
+        }, indent = 2))
+        self._prune()
+        return self.out_dir / f"{stem}.json"
+
+    # drop all but the newest `keep` dumps (each is a .json + .folded pair)
+    def _prune(self):
+        dumps = sorted(self.out_dir.glob("*.json"), key = lambda p: p.stat().st_mtime_ns, reverse = True)
+        for old in dumps[self.keep:]:
+            old.unlink(missing_ok = True)
+            old.with_suffix(".folded").unlink(missing_ok = True)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval_s)
+            with self.lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for tid, stacks in self.active.items():
+                    frame = frames.get(tid)
+                    if frame is None:
+                        continue
+                    parts = []
+                    while frame is not None:
+                        code = frame.f_code
+                        parts.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                        frame = frame.f_back
+                    key = ";".join(reversed(parts))
+                    stacks[key] = stacks.get(key, 0) + 1
+
+# wire request timing + (optional) slow-request profiling into the app
+def init_metrics(app):
+    global _enabled
+    _enabled = bool(app.config.get("METRICS_ENABLED"))
+    if not _enabled:
+        return
+
+    from flask import request, g
+
+    slow_ms = app.config.get("METRICS_SLOW_MS")
+    profiler = None
+    if slow_ms:
+        profiler = SlowRequestProfiler(
+            app.config.get("METRICS_PROFILE_DIR") or Path(app.root_path) / "artifacts" / "profiles",
+            slow_ms / 1000,
+            app.config.get("METRICS_SAMPLE_MS", 5) / 1000,
+            app.config.get("METRICS_PROFILE_KEEP", 50),
+            app.config.get("METRICS_PROFILE_GAP_S", 10),
+        )
+    app.extensions["slow_profiler"] = profiler
+
+    def depth(name, attr): # queue depth of an app extension, 0 until it is created
+        def read():
+            ext = app.extensions.get(name)
+            return {(): attr(ext) if ext is not None else 0}
+        return read
+
+    registry.gauge("compare_queue_depth", depth("job_queue", lambda q: q.depth()), "async compares queued or running")
+    registry.gauge("attempt_write_queue_depth", depth("attempt_writer", lambda w: w.queue.qsize()), "Attempt rows waiting for a group commit")
+    registry.gauge("open_streams", depth("streams", lambda s: len(s.sessions)), "streamed recordings in progress")
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+        _local.trace = []
+        if profiler is not None:
+            profiler.start()
+
+    @app.teardown_request
+    def _metrics_stop(exc = None):
+        t0 = g.pop("_metrics_t0", None)
+        if t0 is None:
+            return
+        elapsed = time.perf_counter() - t0
+        endpoint = request.endpoint or "unmatched"
+        status = getattr(g, "_metrics_status", 500 if exc else 200)
+        registry.observe("http_request_seconds", elapsed, endpoint = endpoint, method = request.method)
+        registry.inc("http_requests_total", endpoint = endpoint, method = request.method, status = status)
+        trace, _local.trace = _local.trace, None
+        if profiler is not None:
+            profiler.finish(f"{request.method} {request.path}", elapsed, trace)
+
+    @app.after_request
+    def _metrics_status(response):
+        g._metrics_status = response.status_code
+        return response
@@ -1,6 +1,8 @@
-from sqlalchemy import String, Integer, DateTime, Text, ForeignKey
+from sqlalchemy import String, Integer, Float, DateTime, Text, ForeignKey, Index, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
 from .db import Base
 
 class Phrase(Base):
@@ -9,21 +11,156 @@ class Phrase(Base):
     phrase_id: Mapped[str] = mapped_column(String(10), primary_key = True) # "p001"
     hanzi: Mapped[str] = mapped_column(String(64), nullable = False) # 汉字
     pinyin: Mapped[str] = mapped_column(String(128), nullable = False) # pinyin with tone marks
+    updated_at: Mapped[datetime] = mapped_column( # with the row count, the version other workers poll (phrase_marker)
+        DateTime, nullable = True, default = datetime.utcnow, onupdate = datetime.utcnow, index = True
+    )
 
     attempts = relationship("Attempt", back_populates = "phrase") # Phrase -> Attempt(s)
 
 class Attempt(Base):
     __tablename__ = "attempts"
+    __table_args__ = (
+        Index("ix_attempts_phrase_created", "phrase_id", "created_at"), # per-phrase history, newest/oldest first
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key = True, autoincrement = True) # attempt id
     phrase_id: Mapped[str] = mapped_column(String(10), ForeignKey("phrases.phrase_id"), nullable = False) # link to phrase
+    learner_id: Mapped[str] = mapped_column(String(64), nullable = True, index = True) # anonymous learner id from the client (None = unknown)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow) # timestam
+    created_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow, index = True) # timestam (time-range queries)
 
     file_url: Mapped[str] = mapped_column(Text, nullable = False) # uploaded audio URL
     score: Mapped[int] = mapped_column(Integer, nullable = True) # overall score (nullable if not compared yet)
 
     syllables_json: Mapped[str] = mapped_column(Text, default = "[]") # store per-syllable scores as JSON string
     plot_url: Mapped[str] = mapped_column(Text, default = "") # plot.png URL
+    upload_name: Mapped[str] = mapped_column(String(128), nullable = True, index = True) # file name in file_url (storage GC looks rows up by it)
+    run_id: Mapped[str] = mapped_column(String(64), nullable = True, index = True) # artifacts folder in plot_url ("" = none)
 
-    phrase = relationship("Phrase", back_populates = "attempts") # Attempt -> Phrase
\ No newline at end of file
+    phrase = relationship("Phrase", back_populates = "attempts") # Attempt -> Phrase
+
+# upload name / run id of an Attempt's URLs ("" when cleared): "/api/uploads/x.webm" -> "x.webm",
+# "/api/artifacts/<run_id>/plot.png" -> "<run_id>"
+def attempt_file_keys(file_url, plot_url):
+    plot = PurePosixPath(urlparse(plot_url or "").path)
+    return PurePosixPath(urlparse(file_url or "").path).name, plot.parent.name if plot.name else ""
+
+@event.listens_for(Attempt, "before_insert")
+@event.listens_for(Attempt, "before_update")
+def _attempt_file_keys(mapper, connection, row):
+    row.upload_name, row.run_id = attempt_file_keys(row.file_url, row.plot_url)
+
+class TtsClip(Base):
+    __tablename__ = "tts_clips"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key = True) # sha256 of (hanzi, model, voice, speed, instructions)
+    hanzi: Mapped[str] = mapped_column(String(64), nullable = False) # text that was spoken
+    filename: Mapped[str] = mapped_column(String(128), nullable = False) # file inside TTS_DIR
+    size_bytes: Mapped[int] = mapped_column(Integer, default = 0) # for size-based eviction
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow, index = True) # for age-based eviction
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow, index = True) # for LRU eviction
+
+# persistent tier of the compare result cache (mainapp/api/result_cache.py); one row per (audio, phrase, scorer) key
+class CompareResult(Base):
+    __tablename__ = "compare_results"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key = True) # sha256 of (audio sha256, phrase_id, scorer version, options)
+    phrase_id: Mapped[str] = mapped_column(String(10), nullable = False)
+    scorer_version: Mapped[str] = mapped_column(String(16), nullable = False, index = True) # rows of other versions are pruned
+    run_id: Mapped[str] = mapped_column(String(64), nullable = False, index = True) # artifacts folder holding the plot
+    result_json: Mapped[str] = mapped_column(Text, nullable = False) # {score, syllables, pitch, plot_url}
+    created_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow)
+
+# shared registry of async compare jobs, so /api/jobs/<id> answers on any node (the local JobQueue only knows its own),
+# and of live streams, which only their owning worker process can continue
+class CompareJob(Base):
+    __tablename__ = "compare_jobs"
+
+    job_id: Mapped[str] = mapped_column(String(32), primary_key = True)
+    status: Mapped[str] = mapped_column(String(10), nullable = False) # "queued" / "streaming" until the owner finishes it, then "done" / "error"
+    owner: Mapped[str] = mapped_column(String(128), nullable = True) # streams: "<NODE_ID>:<pid>" of the process holding the session
+    result_json: Mapped[str] = mapped_column(Text, nullable = True) # the /api/compare payload once done
+    error: Mapped[str] = mapped_column(Text, nullable = True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default = datetime.utcnow, index = True) # for pruning
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable = True)
+
+# one row per scored syllable of an Attempt (written alongside it; see mainapp/analytics.py)
+class AttemptSyllable(Base):
+    __tablename__ = "attempt_syllables"
+    __table_args__ = (
+        Index("ix_attempt_syllables_syllable_tone", "syllable", "tone"), # per-syllable drill-down
+        Index("ix_attempt_syllables_tone_created", "tone", "created_at"), # per-tone time ranges
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key = True, autoincrement = True)
+    attempt_id: Mapped[int] = mapped_column(Integer, ForeignKey("attempts.id"), nullable = False, index = True)
+    phrase_id: Mapped[str] = mapped_column(String(10), nullable = False) # denormalized so queries skip the join
+    idx: Mapped[int] = mapped_column(Integer, nullable = False) # position in the phrase
+    syllable: Mapped[str] = mapped_column(String(16), nullable = False) # pinyin with tone mark
+    tone: Mapped[int] = mapped_column(Integer, nullable = False) # 1-4, 5 = neutral
+    score: Mapped[int] = mapped_column(Integer, nullable = False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable = False)
+
+# running totals, bumped in the same transaction as each Attempt insert
+class PhraseStats(Base):
+    __tablename__ = "phrase_stats"
+
+    phrase_id: Mapped[str] = mapped_column(String(10), primary_key = True)
+    attempts: Mapped[int] = mapped_column(Integer, default = 0)
+    score_sum: Mapped[int] = mapped_column(Integer, default = 0)
+    best: Mapped[int] = mapped_column(Integer, default = 0)
+    last_score: Mapped[int] = mapped_column(Integer, default = 0)
+    first_at: Mapped[datetime] = mapped_column(DateTime, nullable = True)
+    last_at: Mapped[datetime] = mapped_column(DateTime, nullable = True)
+
+class ToneStats(Base):
+    __tablename__ = "tone_stats"
+
+    tone: Mapped[int] = mapped_column(Integer, primary_key = True) # 1-4, 5 = neutral
+    attempts: Mapped[int] = mapped_column(Integer, default = 0) # syllables scored with this tone
+    score_sum: Mapped[int] = mapped_column(Integer, default = 0)
+    passed: Mapped[int] = mapped_column(Integer, default = 0) # syllables scoring >= PASS_SCORE
+
+class SyllableStats(Base):
+    __tablename__ = "syllable_stats"
+
+    syllable: Mapped[str] = mapped_column(String(16), primary_key = True)
+    tone: Mapped[int] = mapped_column(Integer, primary_key = True)
+    attempts: Mapped[int] = mapped_column(Integer, default = 0)
+    score_sum: Mapped[int] = mapped_column(Integer, default = 0)
+    passed: Mapped[int] = mapped_column(Integer, default = 0)
+
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+
+    day: Mapped[str] = mapped_column(String(10), primary_key = True) # "YYYY-MM-DD" (UTC)
+    phrase_id: Mapped[str] = mapped_column(String(10), primary_key = True) # "" = all phrases
+    attempts: Mapped[int] = mapped_column(Integer, default = 0)
+    score_sum: Mapped[int] = mapped_column(Integer, default = 0)
+
+# spaced-repetition state per (learner, phrase); the (learner_id, due_at) index makes "next due" one index seek
+class LearnerItem(Base):
+    __tablename__ = "learner_items"
+    __table_args__ = (
+        Index("ix_learner_items_due", "learner_id", "due_at"),
+    )
+
+    learner_id: Mapped[str] = mapped_column(String(64), primary_key = True)
+    phrase_id: Mapped[str] = mapped_column(String(10), primary_key = True)
+    due_at: Mapped[datetime] = mapped_column(DateTime, nullable = False) # when it should be shown again
+    interval_s: Mapped[float] = mapped_column(Float, default = 0.0) # last scheduled gap
+    ease: Mapped[float] = mapped_column(Float, default = 2.5) # SM-2 style growth factor
+    reps: Mapped[int] = mapped_column(Integer, default = 0) # passes in a row
+    lapses: Mapped[int] = mapped_column(Integer, default = 0) # failed reviews
+    last_score: Mapped[int] = mapped_column(Integer, nullable = True)
+    last_at: Mapped[datetime] = mapped_column(DateTime, nullable = True)
+
+# per-learner running (exponential moving) average score for each tone
+class LearnerTone(Base):
+    __tablename__ = "learner_tones"
+
+    learner_id: Mapped[str] = mapped_column(String(64), primary_key = True)
+    tone: Mapped[int] = mapped_column(Integer, primary_key = True) # 1-4, 5 = neutral
+    ema: Mapped[float] = mapped_column(Float, nullable = False)
+    n: Mapped[int] = mapped_column(Integer, default = 0)
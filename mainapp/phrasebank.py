@@ -0,0 +1,332 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from functools import lru_cache
+from pathlib import Path
+from uuid import uuid4
+import json
+import mmap
+import os
+import random
+import sys
+import time
+from mainapp.phrases import compile_phrase, phrase_source, PhraseRegistry, _bucket_value
+
+# the phrase bank compiled into one read-only binary file (`flask build-phrasebank`): phrase ids, hanzi, normalized
+# pinyin, syllable spans, lexical + sandhi tones, difficulty, the registry's random-pick buckets and (optionally)
+# reference contours. Workers mmap it, so 100k+ phrases cost page cache shared by every process instead of a dict
+# index per worker, and startup reads only a small JSON header. Stdlib only: `import main` must not load numpy.
+
+MAGIC = b"MTAPBANK"
+BANK_VERSION = 2 # 2: header source hashes the rows as stored in the DB
+DEFAULT_PATH = Path(__file__).resolve().parent / "artifacts" / "phrasebank.bin"
+ALIGN = 8 # every section starts on an 8-byte boundary so memoryview.cast() can view it in place
+PHRASE_CACHE = 4096 # phrase dicts kept per process (the rest are decoded from the mapping on demand)
+PICK_TRIES = 32 # random draws from the smallest bucket before a filtered pick scans it
+RECHECK_S = 2.0 # default for how often a registry stats the file for a rebuild (lookups in between cost no syscall)
+
+# rows = iterable of (phrase_id, hanzi, pinyin); references = {phrase_id: (contour, bounds)} or None
+# writes `path` atomically -> {"count", "syllables", "bytes", "source"}
+def build_bank(rows, path = DEFAULT_PATH, references = None):
+    if sys.byteorder != "little": # sections are written + read in native order; the format says little-endian
+        raise RuntimeError("the phrase bank format is little-endian")
+    rows = list(rows)
+    source = phrase_source(rows) # open_bank compares this to the DB's rows
+    phrases = sorted((compile_phrase(*row) for row in rows), key = lambda p: p["phrase_id"])
+    ids = [p["phrase_id"].encode("utf-8") for p in phrases]
+    width = max((len(i) for i in ids), default = 1)
+
+    texts = {"hanzi": bytearray(), "pinyin": bytearray(), "syllable": bytearray()} # one UTF-8 blob per field
+    def put(field, text):
+        texts[field].extend(text.encode("utf-8"))
+        return len(texts[field])
+
+    hanzi_off, pinyin_off, syl_text_off = array("q", [0]), array("q", [0]), array("q", [0])
+    syl_start, tones, surface, difficulty = array("i", [0]), array("b"), array("b"), array("b")
+    ref_off, ref_data, bounds_start, ref_bounds = array("q", [0]), array("f"), array("i", [0]), array("i")
+    buckets = {}
+    for i, ph in enumerate(phrases):
+        hanzi_off.append(put("hanzi", ph["hanzi"]))
+        pinyin_off.append(put("pinyin", ph["pinyin"]))
+        for syl in ph["syllables"]:
+            syl_text_off.append(put("syllable", syl))
+        syl_start.append(len(syl_text_off) - 1)
+        tones.extend(ph["tones"])
+        surface.extend(ph["surface_tones"])
+        difficulty.append(ph["difficulty"])
+        for key in ("syllables", "tones", "difficulty"):
+            buckets.setdefault(f"{key}:{_bucket_value(ph, key)}", []).append(i)
+        for tone in sorted(set(ph["tones"])):
+            buckets.setdefault(f"has_tone:{tone}", []).append(i)
+
+        ref = (references or {}).get(ph["phrase_id"])
+        if ref is not None:
+            ref_data.extend(float(v) for v in ref[0])
+            ref_bounds.extend(int(b) for b in ref[1])
+        ref_off.append(len(ref_data))
+        bounds_start.append(len(ref_bounds))
+
+    bucket_items, bucket_index = array("i"), {}
+    for key in sorted(buckets):
+        bucket_index[key] = [len(bucket_items), len(bucket_items) + len(buckets[key])]
+        bucket_items.extend(buckets[key])
+
+    sections = [
+        ("ids", b"".join(i.ljust(width, b"\0") for i in ids), "B"),
+        ("hanzi", bytes(texts["hanzi"]), "B"), ("pinyin", bytes(texts["pinyin"]), "B"), ("syllable", bytes(texts["syllable"]), "B"),
+        ("hanzi_off", hanzi_off, "q"), ("pinyin_off", pinyin_off, "q"), ("syl_text_off", syl_text_off, "q"),
+        ("syl_start", syl_start, "i"), ("tones", tones, "b"), ("surface", surface, "b"), ("difficulty", difficulty, "b"),
+        ("bucket_items", bucket_items, "i"),
+        ("ref_off", ref_off, "q"), ("ref_data", ref_data, "f"), ("bounds_start", bounds_start, "i"), ("ref_bounds", ref_bounds, "i"),
+    ]
+    layout, offset = {}, 0
+    for name, data, code in sections:
+        size = len(bytes(data)) if code == "B" else len(data) * data.itemsize
+        layout[name] = [offset, size, code]
+        offset += -(-size // ALIGN) * ALIGN
+
+    header = json.dumps({
+        "version": BANK_VERSION, "count": len(phrases), "id_width": width, "source": source,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "sections": layout, "buckets": bucket_index,
+    }).encode("utf-8")
+    base = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN # data starts after magic + lengths + header, aligned
+
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    tmp = path.with_name(f".{path.name}.{uuid4().hex}.part")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + array("I", [BANK_VERSION, len(header)]).tobytes() + header)
+        for name, data, code in sections:
+            f.seek(base + layout[name][0])
+            f.write(bytes(data) if code == "B" else data.tobytes())
+        f.truncate(base + offset)
+    os.replace(tmp, path) # atomic: running workers keep their mapping of the old inode
+    return {"count": len(phrases), "syllables": len(tones), "bytes": base + offset, "source": source}
+
+# read-only view of a compiled bank; phrase i is decoded from the mapping when asked for
+class PhraseBank:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) # stays valid after close
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a phrase bank")
+        version, header_len = array("I", self._mm[len(MAGIC):len(MAGIC) + 8])
+        if version != BANK_VERSION:
+            raise ValueError(f"{self.path} is phrase bank version {version}, expected {BANK_VERSION} (rebuild it)")
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[start:start + header_len])
+        base = -(-(start + header_len) // ALIGN) * ALIGN
+
+        view = memoryview(self._mm)
+        self._s = {name: view[base + off:base + off + size].cast(code) for name, (off, size, code) in self.header["sections"].items()}
+        self.count = self.header["count"]
+        self.source = self.header["source"]
+        self._width = self.header["id_width"]
+        self._ids = _Ids(self._s["ids"], self._width, self.count)
+        self.mtime = self.path.stat().st_mtime
+
+    def __len__(self):
+        return self.count
+
+    # position of `phrase_id` (ids are sorted: one binary search over the mapping), or None
+    def index(self, phrase_id):
+        key = phrase_id.encode("utf-8")
+        if len(key) > self._width:
+            return None
+        key = key.ljust(self._width, b"\0")
+        i = bisect_left(self._ids, key)
+        return i if i < self.count and self._ids[i] == key else None
+
+    def _text(self, field, a, b):
+        return bytes(self._s[field][a:b]).decode("utf-8")
+
+    # phrase dict for position i (same keys as compile_phrase)
+    def phrase(self, i):
+        s = self._s
+        a, b = s["syl_start"][i], s["syl_start"][i + 1]
+        tones = s["tones"][a:b].tolist()
+        return {
+            "phrase_id": self._ids[i].rstrip(b"\0").decode("utf-8"),
+            "hanzi": self._text("hanzi", s["hanzi_off"][i], s["hanzi_off"][i + 1]),
+            "pinyin": self._text("pinyin", s["pinyin_off"][i], s["pinyin_off"][i + 1]),
+            "syllables": [self._text("syllable", s["syl_text_off"][k], s["syl_text_off"][k + 1]) for k in range(a, b)],
+            "tones": tones,
+            "surface_tones": s["surface"][a:b].tolist(),
+            "tone_pattern": "".join(str(t) for t in tones),
+            "difficulty": s["difficulty"][i],
+        }
+
+    # positions in one random-pick bucket ("syllables:3", "tones:214", "difficulty:1", "has_tone:3"), as a view
+    def bucket(self, key):
+        span = self.header["buckets"].get(key)
+        return self._s["bucket_items"][span[0]:span[1]] if span else self._s["bucket_items"][0:0]
+
+    # does position i fall in every (key, value) bucket of `filters`? (read from the tables, no phrase dict)
+    def matches(self, i, filters):
+        s = self._s
+        a, b = s["syl_start"][i], s["syl_start"][i + 1]
+        for key, value in filters:
+            if key == "syllables" and b - a != int(value):
+                return False
+            if key == "difficulty" and s["difficulty"][i] != int(value):
+                return False
+            if key == "tones" and "".join(str(t) for t in s["tones"][a:b].tolist()) != str(value):
+                return False
+        return True
+
+    # (float32 contour view, syllable bounds) compiled in from the ReferenceStore, or None
+    def reference(self, i):
+        s = self._s
+        a, b = s["ref_off"][i], s["ref_off"][i + 1]
+        if a == b:
+            return None
+        return s["ref_data"][a:b], s["ref_bounds"][s["bounds_start"][i]:s["bounds_start"][i + 1]].tolist()
+
+class _Ids(Sequence): # fixed-width id slots of the mapping, for bisect
+    def __init__(self, view, width, count):
+        self.view, self.width, self.count = view, width, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return bytes(self.view[i * self.width:(i + 1) * self.width])
+
+class _Phrases(Sequence): # phrases at the given positions (all of them when None), decoded on access
+    def __init__(self, registry, positions = None):
+        self.registry, self.positions = registry, positions
+
+    def __len__(self):
+        return len(self.positions) if self.positions is not None else len(self.registry.bank)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[j] for j in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        return self.registry._phrase(self.positions[k] if self.positions is not None else k)
+
+class _Buckets: # registry.buckets.get(("difficulty", 1)) over the bank's bucket sections
+    def __init__(self, registry):
+        self.registry = registry
+
+    def get(self, key, default = None):
+        positions = self.registry.bank.bucket(f"{key[0]}:{key[1]}")
+        return _Phrases(self.registry, positions) if len(positions) else default
+
+# PhraseRegistry interface (get / items / buckets / with_tone / random) served from a mapped bank. Once Phrase rows
+# are edited at runtime (or the DB no longer matches the bank's count), it answers from a DB-built PhraseRegistry
+# until the bank is rebuilt
+class MappedPhraseRegistry:
+    def __init__(self, path, loader = None):
+        self.path = Path(path)
+        self._loader = loader # () -> rows from the DB (None = the bank is the only source)
+        self._db = None
+        self._marker = None # () -> phrase_marker of the DB: edits by other processes move it
+        self._seen = None
+        self._checked = time.monotonic() # last stat of the file (and marker poll)
+        self.recheck_s = RECHECK_S
+        self._load(PhraseBank(self.path))
+
+    # also poll the DB's phrase_marker every `every` seconds; the bank matches the DB as it is now (open_bank checked)
+    def watch(self, marker, every):
+        self._marker, self.recheck_s = marker, every
+        self._seen = marker()
+        return self
+
+    def _load(self, bank):
+        self.bank = bank
+        self._phrase = lru_cache(maxsize = PHRASE_CACHE)(bank.phrase)
+        self._items = _Phrases(self)
+        self._buckets = _Buckets(self)
+
+    @property
+    def items(self): # sequence of phrase dicts (len / index / iterate / random.sample)
+        reg = self._fresh()
+        return reg.items if reg is not self else self._items
+
+    @property
+    def buckets(self):
+        reg = self._fresh()
+        return reg.buckets if reg is not self else self._buckets
+
+    # the registry to answer from: this bank (remapped if a build replaced the file), or the DB fallback;
+    # the file is stat'ed (and the marker polled) at most once per recheck_s
+    def _fresh(self):
+        now = time.monotonic()
+        if now - self._checked >= self.recheck_s:
+            self._checked = now
+            try:
+                if self.path.stat().st_mtime != self.bank.mtime: # rebuilt (after the edits, if any): back on the bank
+                    self._load(PhraseBank(self.path))
+                    self._db = None
+                    self._seen = self._marker() if self._marker is not None else None
+            except (OSError, ValueError): # removed or broken mid-deploy: keep the current mapping
+                pass
+            if self._db is None and self._marker is not None and self._marker() != self._seen: # edited elsewhere
+                self.invalidate()
+        return self._db._fresh() if self._db is not None else self
+
+    # Phrase rows changed: the bank is stale until the next `flask build-phrasebank`
+    def invalidate(self):
+        self._checked = float("-inf") # a build may already have replaced the file: look on the next lookup
+        if self._db is None and self._loader is not None:
+            self._db = PhraseRegistry()
+            self._db._loader = self._loader
+            if self._marker is not None:
+                self._db.watch(self._marker, self.recheck_s)
+        if self._db is not None:
+            self._db.invalidate()
+
+    def get(self, phrase_id):
+        reg = self._fresh()
+        if reg is not self:
+            return reg.get(phrase_id)
+        i = self.bank.index(phrase_id)
+        return self._phrase(i) if i is not None else None
+
+    def __len__(self):
+        reg = self._fresh()
+        return len(reg) if reg is not self else len(self.bank)
+
+    def with_tone(self, tone):
+        reg = self._fresh()
+        return reg.with_tone(tone) if reg is not self else self._buckets.get(("has_tone", tone), [])
+
+    # same filters as PhraseRegistry.random; combined filters intersect the bank's position buckets
+    def random(self, syllables = None, tones = None, difficulty = None):
+        reg = self._fresh()
+        if reg is not self:
+            return reg.random(syllables, tones, difficulty)
+        filters = [(k, v) for k, v in (("syllables", syllables), ("tones", tones), ("difficulty", difficulty)) if v is not None]
+        if not filters:
+            return self._phrase(random.randrange(len(self.bank))) if len(self.bank) else None
+
+        filters.sort(key = lambda f: len(self.bank.bucket(f"{f[0]}:{f[1]}"))) # start from the smallest bucket
+        pool = self.bank.bucket(f"{filters[0][0]}:{filters[0][1]}")
+        rest = filters[1:]
+        if not len(pool):
+            return None
+        if not rest:
+            return self._phrase(random.choice(pool))
+        for _ in range(PICK_TRIES): # combined filters: random members of the smallest bucket that match the rest
+            i = random.choice(pool)
+            if self.bank.matches(i, rest):
+                return self._phrase(i)
+        pool = [i for i in pool if self.bank.matches(i, rest)] # rare combination: narrow the whole bucket
+        return self._phrase(random.choice(pool)) if pool else None
+
+    # compiled-in reference contour, or None; on the DB fallback only for phrases whose text the bank still matches
+    def reference(self, phrase_id):
+        reg = self._fresh()
+        i = self.bank.index(phrase_id)
+        if i is None:
+            return None
+        if reg is not self:
+            current, compiled = reg.get(phrase_id), self._phrase(i)
+            if current is None or (current["hanzi"], current["pinyin"]) != (compiled["hanzi"], compiled["pinyin"]):
+                return None
+        return self.bank.reference(i)
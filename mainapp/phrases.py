@@ -0,0 +1,560 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session as OrmSession
+from mainapp.db import get_session
+from mainapp.models import Phrase
+from pathlib import Path
+import hashlib
+import random
+import threading
+import time
+import unicodedata
+import logging
+
+log = logging.getLogger(__name__)
+
+PHRASES = [  # 300 common phrases (2–5 syllables); from ChatGPT
+    {"phrase_id": "p001", "hanzi": "你好", "pinyin": "nǐ hǎo"},
+    {"phrase_id": "p002", "hanzi": "谢谢", "pinyin": "xiè xie"},
+    {"phrase_id": "p003", "hanzi": "不客气", "pinyin": "bú kè qì"},
+    {"phrase_id": "p004", "hanzi": "对不起", "pinyin": "duì bù qǐ"},
+    {"phrase_id": "p005", "hanzi": "没关系", "pinyin": "méi guān xì"},
+    {"phrase_id": "p006", "hanzi": "再见", "pinyin": "zài jiàn"},
+    {"phrase_id": "p007", "hanzi": "早上好", "pinyin": "zǎo shang hǎo"},
+    {"phrase_id": "p008", "hanzi": "晚上好", "pinyin": "wǎn shang hǎo"},
+    {"phrase_id": "p009", "hanzi": "中午好", "pinyin": "zhōng wǔ hǎo"},
+    {"phrase_id": "p010", "hanzi": "你好吗", "pinyin": "nǐ hǎo ma"},
+    {"phrase_id": "p011", "hanzi": "我很好", "pinyin": "wǒ hěn hǎo"},
+    {"phrase_id": "p012", "hanzi": "还不错", "pinyin": "hái bú cuò"},
+    {"phrase_id": "p013", "hanzi": "你呢", "pinyin": "nǐ ne"},
+    {"phrase_id": "p014", "hanzi": "太好了", "pinyin": "tài hǎo le"},
+    {"phrase_id": "p015", "hanzi": "太棒了", "pinyin": "tài bàng le"},
+    {"phrase_id": "p016", "hanzi": "没问题", "pinyin": "méi wèn tí"},
+    {"phrase_id": "p017", "hanzi": "可以吗", "pinyin": "kě yǐ ma"},
+    {"phrase_id": "p018", "hanzi": "可以", "pinyin": "kě yǐ"},
+    {"phrase_id": "p019", "hanzi": "不可以", "pinyin": "bù kě yǐ"},
+    {"phrase_id": "p020", "hanzi": "当然", "pinyin": "dāng rán"},
+    {"phrase_id": "p021", "hanzi": "没事", "pinyin": "méi shì"},
+    {"phrase_id": "p022", "hanzi": "真的", "pinyin": "zhēn de"},
+    {"phrase_id": "p023", "hanzi": "是吗", "pinyin": "shì ma"},
+    {"phrase_id": "p024", "hanzi": "不是", "pinyin": "bú shì"},
+    {"phrase_id": "p025", "hanzi": "是的", "pinyin": "shì de"},
+    {"phrase_id": "p026", "hanzi": "好的", "pinyin": "hǎo de"},
+    {"phrase_id": "p027", "hanzi": "好吧", "pinyin": "hǎo ba"},
+    {"phrase_id": "p028", "hanzi": "等等我", "pinyin": "děng děng wǒ"},
+    {"phrase_id": "p029", "hanzi": "快点", "pinyin": "kuài diǎn"},
+    {"phrase_id": "p030", "hanzi": "慢一点", "pinyin": "màn yì diǎn"},
+    {"phrase_id": "p031", "hanzi": "别着急", "pinyin": "bié zháo jí"},
+    {"phrase_id": "p032", "hanzi": "没时间", "pinyin": "méi shí jiān"},
+    {"phrase_id": "p033", "hanzi": "有时间", "pinyin": "yǒu shí jiān"},
+    {"phrase_id": "p034", "hanzi": "我不知道", "pinyin": "wǒ bù zhī dào"},
+    {"phrase_id": "p035", "hanzi": "我明白", "pinyin": "wǒ míng bái"},
+    {"phrase_id": "p036", "hanzi": "我懂了", "pinyin": "wǒ dǒng le"},
+    {"phrase_id": "p037", "hanzi": "听不懂", "pinyin": "tīng bù dǒng"},
+    {"phrase_id": "p038", "hanzi": "看不懂", "pinyin": "kàn bù dǒng"},
+    {"phrase_id": "p039", "hanzi": "再说一遍", "pinyin": "zài shuō yí biàn"},
+    {"phrase_id": "p040", "hanzi": "慢慢说", "pinyin": "màn màn shuō"},
+    {"phrase_id": "p041", "hanzi": "你说什么", "pinyin": "nǐ shuō shén me"},
+    {"phrase_id": "p042", "hanzi": "什么意思", "pinyin": "shén me yì si"},
+    {"phrase_id": "p043", "hanzi": "我不懂", "pinyin": "wǒ bù dǒng"},
+    {"phrase_id": "p044", "hanzi": "我会说", "pinyin": "wǒ huì shuō"},
+    {"phrase_id": "p045", "hanzi": "我会写", "pinyin": "wǒ huì xiě"},
+    {"phrase_id": "p046", "hanzi": "你会吗", "pinyin": "nǐ huì ma"},
+    {"phrase_id": "p047", "hanzi": "你会说吗", "pinyin": "nǐ huì shuō ma"},
+    {"phrase_id": "p048", "hanzi": "你会写吗", "pinyin": "nǐ huì xiě ma"},
+    {"phrase_id": "p049", "hanzi": "我在学习", "pinyin": "wǒ zài xué xí"},
+    {"phrase_id": "p050", "hanzi": "我在工作", "pinyin": "wǒ zài gōng zuò"},
+    {"phrase_id": "p051", "hanzi": "你忙吗", "pinyin": "nǐ máng ma"},
+    {"phrase_id": "p052", "hanzi": "我很忙", "pinyin": "wǒ hěn máng"},
+    {"phrase_id": "p053", "hanzi": "不太忙", "pinyin": "bú tài máng"},
+    {"phrase_id": "p054", "hanzi": "辛苦了", "pinyin": "xīn kǔ le"},
+    {"phrase_id": "p055", "hanzi": "加油", "pinyin": "jiā yóu"},
+    {"phrase_id": "p056", "hanzi": "没办法", "pinyin": "méi bàn fǎ"},
+    {"phrase_id": "p057", "hanzi": "太贵了", "pinyin": "tài guì le"},
+    {"phrase_id": "p058", "hanzi": "便宜一点", "pinyin": "pián yí yì diǎn"},
+    {"phrase_id": "p059", "hanzi": "多少钱", "pinyin": "duō shǎo qián"},
+    {"phrase_id": "p060", "hanzi": "我买这个", "pinyin": "wǒ mǎi zhè ge"},
+    {"phrase_id": "p061", "hanzi": "我不要", "pinyin": "wǒ bú yào"},
+    {"phrase_id": "p062", "hanzi": "我要这个", "pinyin": "wǒ yào zhè ge"},
+    {"phrase_id": "p063", "hanzi": "我想要", "pinyin": "wǒ xiǎng yào"},
+    {"phrase_id": "p064", "hanzi": "我想去", "pinyin": "wǒ xiǎng qù"},
+    {"phrase_id": "p065", "hanzi": "我想看", "pinyin": "wǒ xiǎng kàn"},
+    {"phrase_id": "p066", "hanzi": "我想吃", "pinyin": "wǒ xiǎng chī"},
+    {"phrase_id": "p067", "hanzi": "我想喝", "pinyin": "wǒ xiǎng hē"},
+    {"phrase_id": "p068", "hanzi": "我饿了", "pinyin": "wǒ è le"},
+    {"phrase_id": "p069", "hanzi": "我渴了", "pinyin": "wǒ kě le"},
+    {"phrase_id": "p070", "hanzi": "我累了", "pinyin": "wǒ lèi le"},
+    {"phrase_id": "p071", "hanzi": "我困了", "pinyin": "wǒ kùn le"},
+    {"phrase_id": "p072", "hanzi": "我生病了", "pinyin": "wǒ shēng bìng le"},
+    {"phrase_id": "p073", "hanzi": "不舒服", "pinyin": "bù shū fu"},
+    {"phrase_id": "p074", "hanzi": "头疼", "pinyin": "tóu téng"},
+    {"phrase_id": "p075", "hanzi": "肚子疼", "pinyin": "dù zi téng"},
+    {"phrase_id": "p076", "hanzi": "发烧了", "pinyin": "fā shāo le"},
+    {"phrase_id": "p077", "hanzi": "我没事", "pinyin": "wǒ méi shì"},
+    {"phrase_id": "p078", "hanzi": "小心点", "pinyin": "xiǎo xīn diǎn"},
+    {"phrase_id": "p079", "hanzi": "没关系的", "pinyin": "méi guān xì de"},
+    {"phrase_id": "p080", "hanzi": "太可爱了", "pinyin": "tài kě ài le"},
+    {"phrase_id": "p081", "hanzi": "太帅了", "pinyin": "tài shuài le"},
+    {"phrase_id": "p082", "hanzi": "太漂亮了", "pinyin": "tài piào liang le"},
+    {"phrase_id": "p083", "hanzi": "真厉害", "pinyin": "zhēn lì hài"},
+    {"phrase_id": "p084", "hanzi": "太难了", "pinyin": "tài nán le"},
+    {"phrase_id": "p085", "hanzi": "不难", "pinyin": "bù nán"},
+    {"phrase_id": "p086", "hanzi": "很容易", "pinyin": "hěn róng yì"},
+    {"phrase_id": "p087", "hanzi": "我喜欢", "pinyin": "wǒ xǐ huān"},
+    {"phrase_id": "p088", "hanzi": "我不喜欢", "pinyin": "wǒ bù xǐ huān"},
+    {"phrase_id": "p089", "hanzi": "你喜欢吗", "pinyin": "nǐ xǐ huān ma"},
+    {"phrase_id": "p090", "hanzi": "我爱你", "pinyin": "wǒ ài nǐ"},
+    {"phrase_id": "p091", "hanzi": "我想你", "pinyin": "wǒ xiǎng nǐ"},
+    {"phrase_id": "p092", "hanzi": "开心一点", "pinyin": "kāi xīn yì diǎn"},
+    {"phrase_id": "p093", "hanzi": "别难过", "pinyin": "bié nán guò"},
+    {"phrase_id": "p094", "hanzi": "别担心", "pinyin": "bié dān xīn"},
+    {"phrase_id": "p095", "hanzi": "我很高兴", "pinyin": "wǒ hěn gāo xìng"},
+    {"phrase_id": "p096", "hanzi": "我很开心", "pinyin": "wǒ hěn kāi xīn"},
+    {"phrase_id": "p097", "hanzi": "我很紧张", "pinyin": "wǒ hěn jǐn zhāng"},
+    {"phrase_id": "p098", "hanzi": "我有点怕", "pinyin": "wǒ yǒu diǎn pà"},
+    {"phrase_id": "p099", "hanzi": "太尴尬了", "pinyin": "tài gān gà le"},
+    {"phrase_id": "p100", "hanzi": "真好玩", "pinyin": "zhēn hǎo wán"},
+    {"phrase_id": "p101", "hanzi": "好无聊", "pinyin": "hǎo wú liáo"},
+    {"phrase_id": "p102", "hanzi": "好好吃", "pinyin": "hǎo hǎo chī"},
+    {"phrase_id": "p103", "hanzi": "好喝吗", "pinyin": "hǎo hē ma"},
+    {"phrase_id": "p104", "hanzi": "很好喝", "pinyin": "hěn hǎo hē"},
+    {"phrase_id": "p105", "hanzi": "太辣了", "pinyin": "tài là le"},
+    {"phrase_id": "p106", "hanzi": "不太辣", "pinyin": "bú tài là"},
+    {"phrase_id": "p107", "hanzi": "太甜了", "pinyin": "tài tián le"},
+    {"phrase_id": "p108", "hanzi": "太咸了", "pinyin": "tài xián le"},
+    {"phrase_id": "p109", "hanzi": "少放盐", "pinyin": "shǎo fàng yán"},
+    {"phrase_id": "p110", "hanzi": "别放辣", "pinyin": "bié fàng là"},
+    {"phrase_id": "p111", "hanzi": "来一份", "pinyin": "lái yí fèn"},
+    {"phrase_id": "p112", "hanzi": "来一杯", "pinyin": "lái yì bēi"},
+    {"phrase_id": "p113", "hanzi": "再来一个", "pinyin": "zài lái yí ge"},
+    {"phrase_id": "p114", "hanzi": "不要了", "pinyin": "bú yào le"},
+    {"phrase_id": "p115", "hanzi": "打包带走", "pinyin": "dǎ bāo dài zǒu"},
+    {"phrase_id": "p116", "hanzi": "在这吃", "pinyin": "zài zhè chī"},
+    {"phrase_id": "p117", "hanzi": "用现金", "pinyin": "yòng xiàn jīn"},
+    {"phrase_id": "p118", "hanzi": "刷卡吗", "pinyin": "shuā kǎ ma"},
+    {"phrase_id": "p119", "hanzi": "用微信", "pinyin": "yòng wēi xìn"},
+    {"phrase_id": "p120", "hanzi": "用支付宝", "pinyin": "yòng zhī fù bǎo"},
+    {"phrase_id": "p121", "hanzi": "给你", "pinyin": "gěi nǐ"},
+    {"phrase_id": "p122", "hanzi": "给我", "pinyin": "gěi wǒ"},
+    {"phrase_id": "p123", "hanzi": "请给我", "pinyin": "qǐng gěi wǒ"},
+    {"phrase_id": "p124", "hanzi": "请帮我", "pinyin": "qǐng bāng wǒ"},
+    {"phrase_id": "p125", "hanzi": "帮个忙", "pinyin": "bāng ge máng"},
+    {"phrase_id": "p126", "hanzi": "麻烦你", "pinyin": "má fan nǐ"},
+    {"phrase_id": "p127", "hanzi": "谢谢你", "pinyin": "xiè xie nǐ"},
+    {"phrase_id": "p128", "hanzi": "不用谢", "pinyin": "bú yòng xiè"},
+    {"phrase_id": "p129", "hanzi": "请进", "pinyin": "qǐng jìn"},
+    {"phrase_id": "p130", "hanzi": "请坐", "pinyin": "qǐng zuò"},
+    {"phrase_id": "p131", "hanzi": "请稍等", "pinyin": "qǐng shāo děng"},
+    {"phrase_id": "p132", "hanzi": "等一下", "pinyin": "děng yí xià"},
+    {"phrase_id": "p133", "hanzi": "快一点", "pinyin": "kuài yì diǎn"},
+    {"phrase_id": "p134", "hanzi": "慢一点", "pinyin": "màn yì diǎn"},
+    {"phrase_id": "p135", "hanzi": "大声点", "pinyin": "dà shēng diǎn"},
+    {"phrase_id": "p136", "hanzi": "小声点", "pinyin": "xiǎo shēng diǎn"},
+    {"phrase_id": "p137", "hanzi": "听清楚", "pinyin": "tīng qīng chu"},
+    {"phrase_id": "p138", "hanzi": "看清楚", "pinyin": "kàn qīng chu"},
+    {"phrase_id": "p139", "hanzi": "你说吧", "pinyin": "nǐ shuō ba"},
+    {"phrase_id": "p140", "hanzi": "我说完了", "pinyin": "wǒ shuō wán le"},
+    {"phrase_id": "p141", "hanzi": "我走了", "pinyin": "wǒ zǒu le"},
+    {"phrase_id": "p142", "hanzi": "我来了", "pinyin": "wǒ lái le"},
+    {"phrase_id": "p143", "hanzi": "我回家", "pinyin": "wǒ huí jiā"},
+    {"phrase_id": "p144", "hanzi": "回头见", "pinyin": "huí tóu jiàn"},
+    {"phrase_id": "p145", "hanzi": "明天见", "pinyin": "míng tiān jiàn"},
+    {"phrase_id": "p146", "hanzi": "下次见", "pinyin": "xià cì jiàn"},
+    {"phrase_id": "p147", "hanzi": "周末见", "pinyin": "zhōu mò jiàn"},
+    {"phrase_id": "p148", "hanzi": "生日快乐", "pinyin": "shēng rì kuài lè"},
+    {"phrase_id": "p149", "hanzi": "新年快乐", "pinyin": "xīn nián kuài lè"},
+    {"phrase_id": "p150", "hanzi": "节日快乐", "pinyin": "jié rì kuài lè"},
+    {"phrase_id": "p151", "hanzi": "恭喜你", "pinyin": "gōng xǐ nǐ"},
+    {"phrase_id": "p152", "hanzi": "祝你好运", "pinyin": "zhù nǐ hǎo yùn"},
+    {"phrase_id": "p153", "hanzi": "一路顺风", "pinyin": "yí lù shùn fēng"},
+    {"phrase_id": "p154", "hanzi": "一路平安", "pinyin": "yí lù píng ān"},
+    {"phrase_id": "p155", "hanzi": "保重身体", "pinyin": "bǎo zhòng shēn tǐ"},
+    {"phrase_id": "p156", "hanzi": "注意安全", "pinyin": "zhù yì ān quán"},
+    {"phrase_id": "p157", "hanzi": "注意休息", "pinyin": "zhù yì xiū xi"},
+    {"phrase_id": "p158", "hanzi": "早点睡", "pinyin": "zǎo diǎn shuì"},
+    {"phrase_id": "p159", "hanzi": "睡个好觉", "pinyin": "shuì ge hǎo jiào"},
+    {"phrase_id": "p160", "hanzi": "做个好梦", "pinyin": "zuò ge hǎo mèng"},
+    {"phrase_id": "p161", "hanzi": "几点了", "pinyin": "jǐ diǎn le"},
+    {"phrase_id": "p162", "hanzi": "现在几点", "pinyin": "xiàn zài jǐ diǎn"},
+    {"phrase_id": "p163", "hanzi": "今天几号", "pinyin": "jīn tiān jǐ hào"},
+    {"phrase_id": "p164", "hanzi": "今天星期几", "pinyin": "jīn tiān xīng qī jǐ"},
+    {"phrase_id": "p165", "hanzi": "明天星期几", "pinyin": "míng tiān xīng qī jǐ"},
+    {"phrase_id": "p166", "hanzi": "我迟到了", "pinyin": "wǒ chí dào le"},
+    {"phrase_id": "p167", "hanzi": "我快到了", "pinyin": "wǒ kuài dào le"},
+    {"phrase_id": "p168", "hanzi": "马上到", "pinyin": "mǎ shàng dào"},
+    {"phrase_id": "p169", "hanzi": "再等我", "pinyin": "zài děng wǒ"},
+    {"phrase_id": "p170", "hanzi": "别走", "pinyin": "bié zǒu"},
+    {"phrase_id": "p171", "hanzi": "去哪儿", "pinyin": "qù nǎr"},
+    {"phrase_id": "p172", "hanzi": "你去哪儿", "pinyin": "nǐ qù nǎr"},
+    {"phrase_id": "p173", "hanzi": "我去哪儿", "pinyin": "wǒ qù nǎr"},
+    {"phrase_id": "p174", "hanzi": "在哪里", "pinyin": "zài nǎ lǐ"},
+    {"phrase_id": "p175", "hanzi": "你在哪儿", "pinyin": "nǐ zài nǎr"},
+    {"phrase_id": "p176", "hanzi": "我在这儿", "pinyin": "wǒ zài zhèr"},
+    {"phrase_id": "p177", "hanzi": "在那边", "pinyin": "zài nà biān"},
+    {"phrase_id": "p178", "hanzi": "在这边", "pinyin": "zài zhè biān"},
+    {"phrase_id": "p179", "hanzi": "往左走", "pinyin": "wǎng zuǒ zǒu"},
+    {"phrase_id": "p180", "hanzi": "往右走", "pinyin": "wǎng yòu zǒu"},
+    {"phrase_id": "p181", "hanzi": "直走", "pinyin": "zhí zǒu"},
+    {"phrase_id": "p182", "hanzi": "前面", "pinyin": "qián miàn"},
+    {"phrase_id": "p183", "hanzi": "后面", "pinyin": "hòu miàn"},
+    {"phrase_id": "p184", "hanzi": "左边", "pinyin": "zuǒ biān"},
+    {"phrase_id": "p185", "hanzi": "右边", "pinyin": "yòu biān"},
+    {"phrase_id": "p186", "hanzi": "附近有吗", "pinyin": "fù jìn yǒu ma"},
+    {"phrase_id": "p187", "hanzi": "离这儿近吗", "pinyin": "lí zhèr jìn ma"},
+    {"phrase_id": "p188", "hanzi": "怎么走", "pinyin": "zěn me zǒu"},
+    {"phrase_id": "p189", "hanzi": "走过去", "pinyin": "zǒu guò qù"},
+    {"phrase_id": "p190", "hanzi": "坐地铁", "pinyin": "zuò dì tiě"},
+    {"phrase_id": "p191", "hanzi": "坐公交", "pinyin": "zuò gōng jiāo"},
+    {"phrase_id": "p192", "hanzi": "打车去", "pinyin": "dǎ chē qù"},
+    {"phrase_id": "p193", "hanzi": "到这里", "pinyin": "dào zhè lǐ"},
+    {"phrase_id": "p194", "hanzi": "到那里", "pinyin": "dào nà lǐ"},
+    {"phrase_id": "p195", "hanzi": "到北京", "pinyin": "dào běi jīng"},
+    {"phrase_id": "p196", "hanzi": "到上海", "pinyin": "dào shàng hǎi"},
+    {"phrase_id": "p197", "hanzi": "到机场", "pinyin": "dào jī chǎng"},
+    {"phrase_id": "p198", "hanzi": "到车站", "pinyin": "dào chē zhàn"},
+    {"phrase_id": "p199", "hanzi": "到酒店", "pinyin": "dào jiǔ diàn"},
+    {"phrase_id": "p200", "hanzi": "到学校", "pinyin": "dào xué xiào"},
+    {"phrase_id": "p201", "hanzi": "我想问", "pinyin": "wǒ xiǎng wèn"},
+    {"phrase_id": "p202", "hanzi": "你叫什么", "pinyin": "nǐ jiào shén me"},
+    {"phrase_id": "p203", "hanzi": "我叫小明", "pinyin": "wǒ jiào xiǎo míng"},
+    {"phrase_id": "p204", "hanzi": "你几岁", "pinyin": "nǐ jǐ suì"},
+    {"phrase_id": "p205", "hanzi": "我二十岁", "pinyin": "wǒ èr shí suì"},
+    {"phrase_id": "p206", "hanzi": "你多大", "pinyin": "nǐ duō dà"},
+    {"phrase_id": "p207", "hanzi": "我多大", "pinyin": "wǒ duō dà"},
+    {"phrase_id": "p208", "hanzi": "你是哪里人", "pinyin": "nǐ shì nǎ lǐ rén"},
+    {"phrase_id": "p209", "hanzi": "我是美国人", "pinyin": "wǒ shì měi guó rén"},
+    {"phrase_id": "p210", "hanzi": "我是学生", "pinyin": "wǒ shì xué shēng"},
+    {"phrase_id": "p211", "hanzi": "我是老师", "pinyin": "wǒ shì lǎo shī"},
+    {"phrase_id": "p212", "hanzi": "我在上课", "pinyin": "wǒ zài shàng kè"},
+    {"phrase_id": "p213", "hanzi": "我在开会", "pinyin": "wǒ zài kāi huì"},
+    {"phrase_id": "p214", "hanzi": "我在吃饭", "pinyin": "wǒ zài chī fàn"},
+    {"phrase_id": "p215", "hanzi": "我在睡觉", "pinyin": "wǒ zài shuì jiào"},
+    {"phrase_id": "p216", "hanzi": "我在等你", "pinyin": "wǒ zài děng nǐ"},
+    {"phrase_id": "p217", "hanzi": "我在找你", "pinyin": "wǒ zài zhǎo nǐ"},
+    {"phrase_id": "p218", "hanzi": "你在干嘛", "pinyin": "nǐ zài gàn ma"},
+    {"phrase_id": "p219", "hanzi": "我在干嘛", "pinyin": "wǒ zài gàn ma"},
+    {"phrase_id": "p220", "hanzi": "你在做什么", "pinyin": "nǐ zài zuò shén me"},
+    {"phrase_id": "p221", "hanzi": "我在做饭", "pinyin": "wǒ zài zuò fàn"},
+    {"phrase_id": "p222", "hanzi": "我在洗澡", "pinyin": "wǒ zài xǐ zǎo"},
+    {"phrase_id": "p223", "hanzi": "我在跑步", "pinyin": "wǒ zài pǎo bù"},
+    {"phrase_id": "p224", "hanzi": "我在学习", "pinyin": "wǒ zài xué xí"},
+    {"phrase_id": "p225", "hanzi": "我在复习", "pinyin": "wǒ zài fù xí"},
+    {"phrase_id": "p226", "hanzi": "你吃了吗", "pinyin": "nǐ chī le ma"},
+    {"phrase_id": "p227", "hanzi": "我吃了", "pinyin": "wǒ chī le"},
+    {"phrase_id": "p228", "hanzi": "还没吃", "pinyin": "hái méi chī"},
+    {"phrase_id": "p229", "hanzi": "一起吃饭", "pinyin": "yì qǐ chī fàn"},
+    {"phrase_id": "p230", "hanzi": "一起喝咖啡", "pinyin": "yì qǐ hē kā fēi"},
+    {"phrase_id": "p231", "hanzi": "一起去吧", "pinyin": "yì qǐ qù ba"},
+    {"phrase_id": "p232", "hanzi": "我们走吧", "pinyin": "wǒ men zǒu ba"},
+    {"phrase_id": "p233", "hanzi": "我们回家", "pinyin": "wǒ men huí jiā"},
+    {"phrase_id": "p234", "hanzi": "我们开始", "pinyin": "wǒ men kāi shǐ"},
+    {"phrase_id": "p235", "hanzi": "我们继续", "pinyin": "wǒ men jì xù"},
+    {"phrase_id": "p236", "hanzi": "我们结束", "pinyin": "wǒ men jié shù"},
+    {"phrase_id": "p237", "hanzi": "休息一下", "pinyin": "xiū xi yí xià"},
+    {"phrase_id": "p238", "hanzi": "喝点水", "pinyin": "hē diǎn shuǐ"},
+    {"phrase_id": "p239", "hanzi": "吃点东西", "pinyin": "chī diǎn dōng xi"},
+    {"phrase_id": "p240", "hanzi": "去洗手间", "pinyin": "qù xǐ shǒu jiān"},
+    {"phrase_id": "p241", "hanzi": "洗手间在哪", "pinyin": "xǐ shǒu jiān zài nǎ"},
+    {"phrase_id": "p242", "hanzi": "我迷路了", "pinyin": "wǒ mí lù le"},
+    {"phrase_id": "p243", "hanzi": "我找不到", "pinyin": "wǒ zhǎo bú dào"},
+    {"phrase_id": "p244", "hanzi": "你能帮我吗", "pinyin": "nǐ néng bāng wǒ ma"},
+    {"phrase_id": "p245", "hanzi": "你能说中文吗", "pinyin": "nǐ néng shuō zhōng wén ma"},
+    {"phrase_id": "p246", "hanzi": "我说中文", "pinyin": "wǒ shuō zhōng wén"},
+    {"phrase_id": "p247", "hanzi": "我学中文", "pinyin": "wǒ xué zhōng wén"},
+    {"phrase_id": "p248", "hanzi": "说得很好", "pinyin": "shuō de hěn hǎo"},
+    {"phrase_id": "p249", "hanzi": "说得不错", "pinyin": "shuō de bú cuò"},
+    {"phrase_id": "p250", "hanzi": "再试一次", "pinyin": "zài shì yí cì"},
+    {"phrase_id": "p251", "hanzi": "没听见", "pinyin": "méi tīng jiàn"},
+    {"phrase_id": "p252", "hanzi": "听到了", "pinyin": "tīng dào le"},
+    {"phrase_id": "p253", "hanzi": "看到了", "pinyin": "kàn dào le"},
+    {"phrase_id": "p254", "hanzi": "我明天去", "pinyin": "wǒ míng tiān qù"},
+    {"phrase_id": "p255", "hanzi": "我今天去", "pinyin": "wǒ jīn tiān qù"},
+    {"phrase_id": "p256", "hanzi": "我现在去", "pinyin": "wǒ xiàn zài qù"},
+    {"phrase_id": "p257", "hanzi": "我等一下", "pinyin": "wǒ děng yí xià"},
+    {"phrase_id": "p258", "hanzi": "我马上来", "pinyin": "wǒ mǎ shàng lái"},
+    {"phrase_id": "p259", "hanzi": "你放心", "pinyin": "nǐ fàng xīn"},
+    {"phrase_id": "p260", "hanzi": "我放心", "pinyin": "wǒ fàng xīn"},
+    {"phrase_id": "p261", "hanzi": "我知道了", "pinyin": "wǒ zhī dào le"},
+    {"phrase_id": "p262", "hanzi": "我忘了", "pinyin": "wǒ wàng le"},
+    {"phrase_id": "p263", "hanzi": "我记得", "pinyin": "wǒ jì de"},
+    {"phrase_id": "p264", "hanzi": "我不记得", "pinyin": "wǒ bù jì de"},
+    {"phrase_id": "p265", "hanzi": "别说了", "pinyin": "bié shuō le"},
+    {"phrase_id": "p266", "hanzi": "别闹了", "pinyin": "bié nào le"},
+    {"phrase_id": "p267", "hanzi": "开玩笑", "pinyin": "kāi wán xiào"},
+    {"phrase_id": "p268", "hanzi": "别开玩笑", "pinyin": "bié kāi wán xiào"},
+    {"phrase_id": "p269", "hanzi": "你说得对", "pinyin": "nǐ shuō de duì"},
+    {"phrase_id": "p270", "hanzi": "你说得好", "pinyin": "nǐ shuō de hǎo"},
+    {"phrase_id": "p271", "hanzi": "我同意", "pinyin": "wǒ tóng yì"},
+    {"phrase_id": "p272", "hanzi": "我不同意", "pinyin": "wǒ bù tóng yì"},
+    {"phrase_id": "p273", "hanzi": "没意思", "pinyin": "méi yì si"},
+    {"phrase_id": "p274", "hanzi": "有意思", "pinyin": "yǒu yì si"},
+    {"phrase_id": "p275", "hanzi": "真有趣", "pinyin": "zhēn yǒu qù"},
+    {"phrase_id": "p276", "hanzi": "太有趣了", "pinyin": "tài yǒu qù le"},
+    {"phrase_id": "p277", "hanzi": "太安静了", "pinyin": "tài ān jìng le"},
+    {"phrase_id": "p278", "hanzi": "太吵了", "pinyin": "tài chǎo le"},
+    {"phrase_id": "p279", "hanzi": "太冷了", "pinyin": "tài lěng le"},
+    {"phrase_id": "p280", "hanzi": "太热了", "pinyin": "tài rè le"},
+    {"phrase_id": "p281", "hanzi": "下雨了", "pinyin": "xià yǔ le"},
+    {"phrase_id": "p282", "hanzi": "下雪了", "pinyin": "xià xuě le"},
+    {"phrase_id": "p283", "hanzi": "刮风了", "pinyin": "guā fēng le"},
+    {"phrase_id": "p284", "hanzi": "天气真好", "pinyin": "tiān qì zhēn hǎo"},
+    {"phrase_id": "p285", "hanzi": "天气不好", "pinyin": "tiān qì bù hǎo"},
+    {"phrase_id": "p286", "hanzi": "我喜欢你", "pinyin": "wǒ xǐ huān nǐ"},
+    {"phrase_id": "p287", "hanzi": "我想试试", "pinyin": "wǒ xiǎng shì shì"},
+    {"phrase_id": "p288", "hanzi": "我想看看", "pinyin": "wǒ xiǎng kàn kan"},
+    {"phrase_id": "p289", "hanzi": "我想听听", "pinyin": "wǒ xiǎng tīng ting"},
+    {"phrase_id": "p290", "hanzi": "我想学学", "pinyin": "wǒ xiǎng xué xue"},
+    {"phrase_id": "p291", "hanzi": "我先走了", "pinyin": "wǒ xiān zǒu le"},
+    {"phrase_id": "p292", "hanzi": "我先回去", "pinyin": "wǒ xiān huí qù"},
+    {"phrase_id": "p293", "hanzi": "你先走吧", "pinyin": "nǐ xiān zǒu ba"},
+    {"phrase_id": "p294", "hanzi": "你先说吧", "pinyin": "nǐ xiān shuō ba"},
+    {"phrase_id": "p295", "hanzi": "我先看看", "pinyin": "wǒ xiān kàn kan"},
+    {"phrase_id": "p296", "hanzi": "我再想想", "pinyin": "wǒ zài xiǎng xiǎng"},
+    {"phrase_id": "p297", "hanzi": "我再试试", "pinyin": "wǒ zài shì shì"},
+    {"phrase_id": "p298", "hanzi": "我再问问", "pinyin": "wǒ zài wèn wen"},
+    {"phrase_id": "p299", "hanzi": "回头再说", "pinyin": "huí tóu zài shuō"},
+    {"phrase_id": "p300", "hanzi": "以后再说", "pinyin": "yǐ hòu zài shuō"},
+]
+TONE_MARKS = { # very small tone-mark lookup for common vowel diacritics
+    "ā":1,"á":2,"ǎ":3,"à":4,
+    "ē":1,"é":2,"ě":3,"è":4,
+    "ī":1,"í":2,"ǐ":3,"ì":4,
+    "ō":1,"ó":2,"ǒ":3,"ò":4,
+    "ū":1,"ú":2,"ǔ":3,"ù":4,
+    "ǖ":1,"ǘ":2,"ǚ":3,"ǜ":4,
+} # if none found -> neutral/unknown
+
+
+# copy `PHRASES` list into DB once
+def seed_phrases_if_empty():
+    Session = get_session(current_app) # get scoped session
+    db = Session() # open session
+
+    count = db.query(Phrase).count() # how many phrases exist
+    if count == 0: # only seed if DB is empty
+        for ph in PHRASES:
+            db.add(Phrase(phrase_id = ph["phrase_id"], hanzi = ph["hanzi"], pinyin = ph["pinyin"])) # insert phrase
+        db.commit() # persist to SQLite
+
+# detect tone number from tone mark (super simple)
+def tone_from_pinyin_syllable(syl):
+    for ch in syl:
+        if ch in TONE_MARKS:
+            return TONE_MARKS[ch]
+    return 5 # treat as neutral/unknown
+
+# split pinyin string into syllables
+def pinyin_syllables(pinyin):
+    return [s for s in pinyin.strip().split() if s]
+
+# composed tone marks (a + U+0301 -> á, else the syllable reads as neutral) and single spaces
+def normalize_pinyin(pinyin):
+    return " ".join(unicodedata.normalize("NFC", pinyin).split())
+
+# tones as actually spoken: a run of third tones keeps only the last one (nǐ hǎo -> ní hǎo), 不 before tone 4
+# and 一 before tone 4 rise, 一 before other tones falls; pinyin that already spells the changed tone is left alone
+def sandhi_tones(hanzi, tones):
+    out = list(tones)
+    chars = [c for c in hanzi if "\u4e00" <= c <= "\u9fff"]
+    aligned = len(chars) == len(tones) # characters and syllables pair up (no punctuation/latin in between)
+    for i in range(len(out) - 1):
+        ch = chars[i] if aligned else None
+        if ch == "不" and out[i] == 4 and tones[i + 1] == 4:
+            out[i] = 2
+        elif ch == "一" and out[i] == 1 and tones[i + 1] in (1, 2, 3, 4) and (i == 0 or chars[i - 1] != "第"): # not ordinals
+            out[i] = 2 if tones[i + 1] == 4 else 4
+    for i in range(len(out) - 1):
+        if tones[i] == 3 and tones[i + 1] == 3:
+            out[i] = 2
+    return out
+
+# rough difficulty: 1 = easy, 2 = medium, 3 = hard (long phrases + third tones are harder)
+def phrase_difficulty(tones):
+    if len(tones) >= 4 or tones.count(3) >= 2:
+        return 3
+    if len(tones) <= 2 and 3 not in tones:
+        return 1
+    return 2
+
+# phrase dict with syllables/tones precomputed once (same keys as a PHRASES entry, plus extras)
+def compile_phrase(phrase_id, hanzi, pinyin):
+    pinyin = normalize_pinyin(pinyin)
+    syls = pinyin_syllables(pinyin)
+    tones = [tone_from_pinyin_syllable(s) for s in syls]
+    return {
+        "phrase_id": phrase_id,
+        "hanzi": hanzi,
+        "pinyin": pinyin,
+        "syllables": syls,
+        "tones": tones,
+        "surface_tones": sandhi_tones(hanzi, tones), # what to listen for (third-tone / 一 / 不 sandhi applied)
+        "tone_pattern": "".join(str(t) for t in tones), # e.g. "33" for nǐ hǎo
+        "difficulty": phrase_difficulty(tones),
+    }
+
+# sha256 of the (phrase_id, hanzi, pinyin) rows as stored, in id order: the phrase bank records it at build time and
+# is only used while the DB still hashes the same (an edited pinyin keeps the count but changes this)
+def phrase_source(rows):
+    digest = hashlib.sha256()
+    for phrase_id, hanzi, pinyin in sorted(rows, key = lambda r: r[0]):
+        digest.update(f"{phrase_id}\t{hanzi}\t{pinyin}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def _bucket_value(ph, key):
+    return {"syllables": len(ph["syllables"]), "tones": ph["tone_pattern"], "difficulty": ph["difficulty"]}[key]
+
+# cheap version of the phrases table: (row count, newest updated_at). Commits in this process invalidate the
+# registry directly; other workers notice edits by polling this (an add/delete changes the count, an ORM edit or
+# a replaced row moves updated_at; raw SQL that leaves updated_at alone is not seen until a restart)
+def phrase_marker(db):
+    return tuple(db.execute(select(func.count(), func.max(Phrase.updated_at)).select_from(Phrase)).one())
+
+# in-memory phrase bank: dict index by id + buckets for O(1) random picks
+class PhraseRegistry:
+    def __init__(self):
+        self.by_id = {}
+        self.items = [] # list for random.choice
+        self.buckets = {} # ("syllables"|"tones"|"difficulty"|"has_tone", value) -> [phrase, ...]
+        self.stale = True
+        self._lock = threading.Lock()
+        self._loader = None # () -> iterable of (phrase_id, hanzi, pinyin)
+        self._marker = None # () -> phrase_marker of the DB (None = only invalidate() marks it stale)
+        self._seen = None # marker the current index was built at
+        self._checked = 0.0 # monotonic time of the last marker poll
+        self.recheck_s = 5.0
+
+    # poll `marker` at most every `every` seconds and rebuild when it moves (edits made by other processes)
+    def watch(self, marker, every):
+        self._marker, self.recheck_s = marker, every
+        return self
+
+    def _build(self, rows):
+        by_id, buckets = {}, {}
+        for phrase_id, hanzi, pinyin in rows:
+            ph = compile_phrase(phrase_id, hanzi, pinyin)
+            by_id[phrase_id] = ph
+            for key in ("syllables", "tones", "difficulty"):
+                buckets.setdefault((key, _bucket_value(ph, key)), []).append(ph)
+            for tone in set(ph["tones"]): # phrases that practice a given tone anywhere (used by the scheduler)
+                buckets.setdefault(("has_tone", tone), []).append(ph)
+
+        self.by_id, self.buckets = by_id, buckets # swap in whole structures so readers never see a half-built index
+        self.items = list(by_id.values())
+        self.stale = False
+
+    # reload from `loader` if the DB phrase bank changed since the last build
+    def _fresh(self):
+        if self._marker is not None and not self.stale and time.monotonic() - self._checked >= self.recheck_s:
+            self._checked = time.monotonic()
+            if self._marker() != self._seen:
+                self.stale = True
+        if self.stale and self._loader is not None:
+            with self._lock:
+                if self.stale:
+                    seen = self._marker() if self._marker is not None else None # before the read: a racing edit rebuilds again
+                    self._build(self._loader())
+                    self._seen, self._checked = seen, time.monotonic()
+        return self
+
+    def load(self, loader):
+        self._loader = loader
+        self.invalidate()
+        return self._fresh()
+
+    def invalidate(self):
+        self.stale = True
+
+    def get(self, phrase_id):
+        return self._fresh().by_id.get(phrase_id)
+
+    def __len__(self):
+        return len(self._fresh().items)
+
+    def with_tone(self, tone): # phrases containing `tone` in any syllable
+        return self._fresh().buckets.get(("has_tone", tone), [])
+
+    # random phrase, optionally filtered by syllable count, tone pattern ("33") and/or difficulty (1-3)
+    def random(self, syllables = None, tones = None, difficulty = None):
+        self._fresh()
+        filters = [(k, v) for k, v in (("syllables", syllables), ("tones", tones), ("difficulty", difficulty)) if v is not None]
+        if not filters:
+            return random.choice(self.items) if self.items else None
+
+        filters.sort(key = lambda f: len(self.buckets.get(f, []))) # start from the smallest bucket
+        pool = self.buckets.get(filters[0], [])
+        if len(filters) > 1: # combined filters: narrow the smallest bucket by the remaining ones
+            pool = [p for p in pool if all(_bucket_value(p, k) == v for k, v in filters[1:])]
+        return random.choice(pool) if pool else None
+
+_static = None # used outside an app (batch workers): the compiled bank if built, else the PHRASES literal
+
+# the compiled phrase bank at `path` (default artifacts/phrasebank.bin) as a registry, or None when it isn't built,
+# can't be read, or was built from other rows than `source` (phrase_source of the DB: it changed since `flask build-phrasebank`)
+def open_bank(path = None, loader = None, source = None):
+    from mainapp.phrasebank import MappedPhraseRegistry, DEFAULT_PATH
+    path = Path(path or DEFAULT_PATH)
+    if not path.is_file():
+        return None
+    try:
+        registry = MappedPhraseRegistry(path, loader)
+    except (OSError, ValueError) as e:
+        log.warning("phrase bank %s not used: %s", path, e)
+        return None
+    if source is not None and registry.bank.source != source:
+        log.warning("phrase bank %s was built from other phrase rows than the DB has: using the DB (run `flask build-phrasebank`)", path)
+        return None
+    return registry
+
+# the app's registry: the memory-mapped bank when it matches the DB, else built from the DB; kept in sync with
+# Phrase commits in this process at once, and with other processes' edits within PHRASES_RECHECK_S
+def init_registry(app):
+    Session = get_session(app)
+
+    def load_rows():
+        db = Session()
+        return [(p.phrase_id, p.hanzi, p.pinyin) for p in db.query(Phrase)]
+
+    def marker():
+        return phrase_marker(Session())
+
+    with app.app_context():
+        seed_phrases_if_empty() # DB is the source of truth; seed it once from PHRASES
+        rows = Session().execute(select(Phrase.phrase_id, Phrase.hanzi, Phrase.pinyin).order_by(Phrase.phrase_id)) # plain tuples: hashing 100k rows stays well under a second
+        registry = open_bank(app.config.get("PHRASEBANK_PATH"), load_rows, phrase_source(rows))
+        if registry is None:
+            registry = PhraseRegistry()
+        registry.watch(marker, app.config.get("PHRASES_RECHECK_S", 5))
+        if isinstance(registry, PhraseRegistry):
+            registry.load(load_rows)
+        Session.remove()
+
+    app.extensions["phrases"] = registry
+    return registry
+
+def get_registry():
+    global _static
+    if has_app_context() and "phrases" in current_app.extensions:
+        return current_app.extensions["phrases"]
+    if _static is None:
+        _static = open_bank()
+        if _static is None:
+            _static = PhraseRegistry()
+            _static.load(lambda: [(ph["phrase_id"], ph["hanzi"], ph["pinyin"]) for ph in PHRASES])
+    return _static
+
+# fetch phrase dict by phrase_id
+def get_phrase_by_id(phrase_id):
+    return get_registry().get(phrase_id)
+
+# mark registries stale when a flush touches Phrase rows; they rebuild lazily on next use
+@event.listens_for(OrmSession, "after_flush")
+def _phrases_flushed(session, flush_context):
+    if any(isinstance(o, Phrase) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.info["phrases_changed"] = True
+
+@event.listens_for(OrmSession, "after_commit")
+def _phrases_committed(session):
+    if session.info.pop("phrases_changed", False) and has_app_context():
+        registry = current_app.extensions.get("phrases")
+        if registry is not None:
+            registry.invalidate()
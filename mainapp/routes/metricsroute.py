@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from mainapp import metrics
+
+metricsapp = Blueprint("metricsroutes",
+                       __name__)
+
+# Prometheus scrape endpoint (404 unless METRICS_ENABLED)
+@metricsapp.route("/metrics")
+def metrics_endpoint():
+    if not metrics.enabled():
+        return Response("metrics disabled (set METRICS_ENABLED / METRICS=1)\n", status = 404, mimetype = "text/plain")
+    return Response(metrics.registry.render(), mimetype = "text/plain; version=0.0.4")
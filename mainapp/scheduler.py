@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, insert, update, delete, func, case
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session as OrmSession
+from mainapp.models import Attempt, LearnerItem, LearnerTone
+from mainapp.analytics import PASS_SCORE
+import json
+import random
+import re
+
+LEARNER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+RELEARN_S = 10 * 60 # a failed phrase comes back after this
+FIRST_S = 24 * 3600 # first successful review
+SECOND_S = 3 * 24 * 3600 # second successful review; after that interval *= ease
+MAX_INTERVAL_S = 365 * 24 * 3600 # growth stops here (uncapped, a long pass streak overflows datetime)
+MIN_EASE, MAX_EASE = 1.3, 3.0
+SNOOZE_S = 5 * 60 # a served-but-not-attempted phrase is held back this long
+TONE_ALPHA = 0.2 # weight of the newest syllable score in a tone's moving average
+TONE_TARGET = 85 # tone averages below this shorten intervals of phrases using that tone
+NEW_SAMPLES = 20 # random candidates tried when introducing a new phrase
+
+# --- write side: each learner-tagged Attempt reschedules its phrase ---
+
+# next state for one (learner, phrase) after scoring `score`; `tone_floor` = weakest tone average in the phrase
+def next_state(state, score, tone_floor, now):
+    ease = state.get("ease", 2.5)
+    reps = state.get("reps", 0)
+    lapses = state.get("lapses", 0)
+    interval = state.get("interval_s", 0.0)
+
+    if score < PASS_SCORE:
+        reps, lapses = 0, lapses + 1
+        ease = max(MIN_EASE, ease - 0.2)
+        interval = RELEARN_S
+    else:
+        reps += 1
+        ease = min(MAX_EASE, max(MIN_EASE, ease + (score / 100 - 0.85) * 0.5)) # 85 keeps ease flat; higher grows it
+        interval = FIRST_S if reps == 1 else SECOND_S if reps == 2 else min(MAX_INTERVAL_S, max(interval, SECOND_S) * ease)
+        if tone_floor is not None and tone_floor < TONE_TARGET: # weak tones come back sooner
+            interval *= max(0.3, tone_floor / TONE_TARGET)
+
+    return {
+        "ease": ease, "reps": reps, "lapses": lapses, "interval_s": interval,
+        "due_at": now + timedelta(seconds = interval), "last_score": score, "last_at": now,
+    }
+
+def apply_attempts(conn, attempts): # attempts: [(learner_id, phrase_id, score, syllables_json, created_at)]
+    for learner_id, phrase_id, score, syllables_json, created_at in sorted(attempts, key = lambda a: a[4] or datetime.utcnow()):
+        now = created_at or datetime.utcnow()
+        syllables = json.loads(syllables_json or "[]")
+
+        emas = dict(conn.execute(select(LearnerTone.tone, LearnerTone.ema).where(LearnerTone.learner_id == learner_id)).all())
+        counts = {}
+        for s in syllables:
+            tone, sc = s.get("tone", 5), float(s.get("score", 0))
+            emas[tone] = sc if tone not in emas else emas[tone] + TONE_ALPHA * (sc - emas[tone])
+            counts[tone] = counts.get(tone, 0) + 1
+        for tone, n in counts.items():
+            _put(conn, LearnerTone.__table__, ["learner_id", "tone"], {"learner_id": learner_id, "tone": tone, "ema": emas[tone], "n": n}, add = ("n",))
+
+        row = conn.execute(select(LearnerItem).where(LearnerItem.learner_id == learner_id, LearnerItem.phrase_id == phrase_id)).mappings().first()
+        phrase_tones = {s.get("tone", 5) for s in syllables}
+        tone_floor = min((emas[t] for t in phrase_tones if t in emas), default = None)
+        state = next_state(dict(row) if row else {}, score or 0, tone_floor, now)
+        _put(conn, LearnerItem.__table__, ["learner_id", "phrase_id"], {"learner_id": learner_id, "phrase_id": phrase_id, **state})
+
+# insert or overwrite one row by primary key; columns in `add` are summed instead of overwritten
+def _put(conn, table, keys, row, add = ()):
+    c = table.c
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(table)
+        values = {k: (c[k] + stmt.excluded[k]) if k in add else stmt.excluded[k] for k in row if k not in keys}
+        conn.execute(stmt.on_conflict_do_update(index_elements = keys, set_ = values), [row])
+        return
+    values = {k: (c[k] + v) if k in add else v for k, v in row.items() if k not in keys}
+    if conn.execute(update(table).where(*[c[k] == row[k] for k in keys]).values(values)).rowcount == 0:
+        conn.execute(insert(table), [row])
+
+@event.listens_for(OrmSession, "after_flush")
+def _attempts_flushed(session, flush_context):
+    new = [o for o in session.new if isinstance(o, Attempt) and o.learner_id]
+    if new:
+        apply_attempts(session.connection(), [(a.learner_id, a.phrase_id, a.score, a.syllables_json, a.created_at) for a in new])
+
+# --- read side ---
+
+# -> (phrase dict, reason) where reason is "review" (due), "new", "ahead" (nothing due, earliest upcoming) or "random"
+def next_phrase(db, learner_id, registry, now = None):
+    now = now or datetime.utcnow()
+    snooze = now + timedelta(seconds = SNOOZE_S)
+
+    for reason, cond in (("review", LearnerItem.due_at <= now), ("new", None), ("ahead", LearnerItem.due_at > now)):
+        if reason == "new":
+            ph = _pick_new(db, learner_id, registry)
+            if ph is not None:
+                db.add(LearnerItem(learner_id = learner_id, phrase_id = ph["phrase_id"], due_at = snooze))
+                db.commit()
+                return ph, reason
+            continue
+
+        while True:
+            row = db.execute( # one seek on ix_learner_items_due
+                select(LearnerItem.phrase_id).where(LearnerItem.learner_id == learner_id, cond).order_by(LearnerItem.due_at).limit(1)
+            ).first()
+            if row is None:
+                break
+            ph = registry.get(row[0])
+            if ph is None: # phrase deleted since it was scheduled: drop the row, or it heads the due index forever
+                db.execute(delete(LearnerItem).where(LearnerItem.learner_id == learner_id, LearnerItem.phrase_id == row[0]))
+                continue
+            db.execute(update(LearnerItem).where(LearnerItem.learner_id == learner_id, LearnerItem.phrase_id == ph["phrase_id"])
+                       .values(due_at = case((LearnerItem.due_at < snooze, snooze), else_ = LearnerItem.due_at))) # not again on the next click unless attempted
+            db.commit()
+            return ph, reason
+        db.commit() # orphans dropped above, if any
+
+    return registry.random(), "random"
+
+# an unseen phrase, preferring the learner's weakest tone (or easy phrases for a new learner)
+def _pick_new(db, learner_id, registry):
+    weakest = db.execute(
+        select(LearnerTone.tone, LearnerTone.ema).where(LearnerTone.learner_id == learner_id).order_by(LearnerTone.ema).limit(1)
+    ).first()
+    if weakest is None:
+        pool = registry.buckets.get(("difficulty", 1)) or registry.items
+    elif weakest[1] < TONE_TARGET:
+        pool = registry.with_tone(weakest[0]) or registry.items
+    else:
+        pool = registry.items
+
+    for pool in (pool, registry.items):
+        for ph in random.sample(pool, min(NEW_SAMPLES, len(pool))):
+            if db.get(LearnerItem, (learner_id, ph["phrase_id"])) is None: # primary-key lookup
+                return ph
+    return None
+
+# small summary for the client: queue sizes + per-tone averages
+def learner_summary(db, learner_id, now = None):
+    now = now or datetime.utcnow()
+    base = select(func.count()).select_from(LearnerItem).where(LearnerItem.learner_id == learner_id)
+    tones = db.execute(select(LearnerTone.tone, LearnerTone.ema, LearnerTone.n).where(LearnerTone.learner_id == learner_id).order_by(LearnerTone.tone)).all()
+    nxt = db.execute(select(func.min(LearnerItem.due_at)).where(LearnerItem.learner_id == learner_id)).scalar()
+    return {
+        "learner_id": learner_id,
+        "phrases_seen": db.execute(base).scalar(),
+        "due_now": db.execute(base.where(LearnerItem.due_at <= now)).scalar(),
+        "next_due_at": nxt.isoformat() if nxt else None,
+        "tones": [{"tone": t, "average": round(e, 1), "syllables": n} for t, e, n in tones],
+    }
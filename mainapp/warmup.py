@@ -0,0 +1,24 @@
+import gc
+import time
+
+# load + exercise the lazily imported subsystems once, in the process that forks the workers
+# (gunicorn --preload): children then share those pages copy-on-write instead of each paying the first request
+def warmup(app):
+    t0 = time.perf_counter()
+    from mainapp.api import analysis, plotting, streaming # numpy, Praat, PyAV, matplotlib
+    from mainapp.api.synth import render_tones
+    from mainapp.phrases import get_registry
+    from mainapp.api.api import pitch_options
+
+    with app.app_context():
+        phrase = get_registry().items[0]
+        samples = render_tones(phrase["tones"])
+        overall, _, pitch = analysis.analyze_pitch(samples, phrase, pitch = pitch_options()) # pitch backend + scoring code paths
+        plotting.render_plot_png(pitch, analysis.plot_title(phrase, overall)) # font cache, Agg renderer, this thread's figure
+
+        if app.config.get("TTS_BACKEND") != "offline":
+            import openai # import only: the client (and its connection pool) is built per worker on first use
+
+    gc.collect()
+    gc.freeze() # move everything loaded so far out of the collector's reach so children don't dirty the shared pages
+    app.logger.info("warmup done in %.0f ms", (time.perf_counter() - t0) * 1000)
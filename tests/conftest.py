@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # import mainapp from the repo root
+os.environ.setdefault("OPENAI_API_KEY", "test") # the TTS client is never built in tests; fakes stand in for it
+
+import pytest
+
+# an app on a scratch SQLite DB whose uploads/artifacts live under tmp_path (the module-level dirs are patched)
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from mainapp import create_app
+    from mainapp.api import api
+    monkeypatch.setattr(api, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(api, "ARTIFACT_DIR", tmp_path / "artifacts")
+    monkeypatch.setattr(api, "REF_DIR", tmp_path / "artifacts" / "ref")
+    monkeypatch.setattr(api, "TEMPLATE_DIR", tmp_path / "artifacts" / "templates")
+    monkeypatch.setattr(api, "TTS_DIR", tmp_path / "artifacts" / "tts")
+    app = create_app({
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+        "PHRASEBANK_PATH": str(tmp_path / "phrasebank.bin"), # not built: the registry loads from the DB
+        "TTS_BACKEND": "offline",
+        "TESTING": True,
+    })
+    yield app
+    from mainapp.db import get_session
+    get_session(app).remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
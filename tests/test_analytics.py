@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+import json
+import random
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker, scoped_session
+from mainapp.models import Base, Attempt, AttemptSyllable, PhraseStats, ToneStats, SyllableStats, DailyStats
+from mainapp.analytics import rebuild, tone_accuracy, weakest_syllables, phrase_progress
+from mainapp.db import WriteBehind
+
+AGGREGATES = (PhraseStats, ToneStats, SyllableStats, DailyStats)
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind = engine))
+    yield Session
+    Session.remove()
+    engine.dispose()
+
+def random_attempts(n, seed = 0):
+    rng = random.Random(seed)
+    syllables = [("nǐ", 3), ("hǎo", 3), ("xiè", 4), ("xie", 5), ("mā", 1), ("má", 2)]
+    start = datetime(2026, 3, 1)
+    for _ in range(n):
+        picked = rng.sample(syllables, rng.randint(1, 4))
+        syls = [{"idx": i, "syllable": s, "tone": t, "score": rng.randint(0, 100)} for i, (s, t) in enumerate(picked)]
+        yield Attempt(
+            phrase_id = rng.choice(["p001", "p002", "p003"]),
+            file_url = "/api/uploads/x.webm",
+            score = rng.choice([None, rng.randint(0, 100)]),
+            syllables_json = json.dumps(syls) if rng.random() > 0.05 else None,
+            created_at = start + timedelta(hours = rng.randint(0, 24 * 10)), # not in insertion order
+        )
+
+def snapshot(db):
+    out = {m.__tablename__: sorted(tuple(r) for r in db.execute(select(*m.__table__.c)).all()) for m in AGGREGATES}
+    out["attempt_syllables"] = sorted(
+        tuple(r) for r in db.execute(select(*[c for c in AttemptSyllable.__table__.c if c.name != "id"])).all()
+    )
+    return out
+
+def test_incremental_aggregates_match_rebuild(Session):
+    db = Session()
+    attempts = list(random_attempts(300))
+    i = 0
+    for size in (1, 7, 50, 1, 100, 141): # flushes of different sizes, each applied by the after_flush hook
+        db.add_all(attempts[i:i + size])
+        db.commit()
+        i += size
+
+    writer = WriteBehind(Session, batch_size = 16, flush_ms = 5) # the write-behind path group-commits through the same hook
+    for a in random_attempts(120, seed = 1):
+        writer.submit(a)
+    assert writer.flush(10)
+    writer.close()
+
+    incremental = snapshot(db)
+    assert incremental["tone_stats"] and sum(r[1] for r in incremental["phrase_stats"]) == 420
+    assert rebuild(db, chunk = 64) == 420
+    assert snapshot(db) == incremental
+
+def test_read_side_over_aggregates(Session):
+    db = Session()
+    db.add_all(list(random_attempts(50)))
+    db.commit()
+    tones = {t["tone"]: t for t in tone_accuracy(db)}
+    assert set(tones) == {1, 2, 3, 4, 5} and all(0 <= t["pass_rate"] <= 1 for t in tones.values() if t["syllables"])
+    weakest = weakest_syllables(db, limit = 3)
+    assert [w["mean"] for w in weakest] == sorted(w["mean"] for w in weakest)
+    progress = phrase_progress(db, "p001")
+    assert progress["attempts"] == len(progress["history"]) and progress["best"] >= progress["mean"]
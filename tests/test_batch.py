@@ -0,0 +1,28 @@
+from mainapp.batch import read_manifest, iter_scores
+
+def test_csv_rows_with_one_column_are_reported(tmp_path):
+    manifest = tmp_path / "m.csv"
+    manifest.write_text("audio,phrase_id\na.wav,p001\n# comment\nlonely.wav\n\nb.wav, p002\n,p003\n")
+    rows = list(read_manifest(manifest))
+    assert rows == [
+        (tmp_path / "a.wav", "p001", None),
+        ("lonely.wav", "", "line 4: expected audio,phrase_id"),
+        (tmp_path / "b.wav", "p002", None),
+        ("", "", "line 7: expected audio,phrase_id"),
+    ]
+
+def test_jsonl_lines_missing_keys_are_reported(tmp_path):
+    manifest = tmp_path / "m.jsonl"
+    manifest.write_text('{"audio": "a.wav", "phrase_id": "p001"}\n{"audio": "b.wav"}\n\n{not json\n[1, 2]\n{"phrase_id": "p002"}\n')
+    rows = list(read_manifest(manifest))
+    assert rows[0] == (tmp_path / "a.wav", "p001", None)
+    assert rows[1] == ("b.wav", "", 'line 2: expected "audio" and "phrase_id"')
+    assert rows[2][2].startswith("line 4: invalid JSON")
+    assert rows[3] == ("", "", 'line 5: expected "audio" and "phrase_id"')
+    assert rows[4] == ("", "p002", 'line 6: expected "audio" and "phrase_id"')
+
+def test_bad_lines_become_error_rows_without_stopping_the_run(tmp_path):
+    items = [("lonely.wav", "", "line 4: expected audio,phrase_id"), (tmp_path / "missing.wav", "p001", None)]
+    rows = list(iter_scores(items, workers = 1))
+    assert rows[0] == {"audio": "lonely.wav", "phrase_id": "", "error": "line 4: expected audio,phrase_id"}
+    assert rows[1]["phrase_id"] == "p001" and "error" in rows[1] # scored (and failed) in the pool
@@ -0,0 +1,109 @@
+from pathlib import Path
+import shutil
+import pytest
+from mainapp.api.blobstore import LocalBlobStore, S3BlobStore, blobstore_from_config
+
+class ClientError(Exception): # shaped like botocore.exceptions.ClientError (S3BlobStore checks .response only)
+    def __init__(self, code, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {"Error": {"Code": code}}
+
+# boto3-shaped S3 client over a directory: the calls S3BlobStore makes, with S3's error codes for missing keys
+class FakeS3Client:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, bucket, key):
+        return self.root / bucket / key
+
+    def upload_file(self, filename, bucket, key):
+        dest = self._path(bucket, key)
+        dest.parent.mkdir(parents = True, exist_ok = True)
+        shutil.copyfile(filename, dest)
+
+    def download_file(self, bucket, key, filename):
+        if not self._path(bucket, key).is_file():
+            raise ClientError("404", "HeadObject") # boto3's transfer manager HEADs first
+        shutil.copyfile(self._path(bucket, key), filename)
+
+    def head_object(self, Bucket, Key):
+        if not self._path(Bucket, Key).is_file():
+            raise ClientError("404", "HeadObject")
+        return {"ContentLength": self._path(Bucket, Key).stat().st_size}
+
+    def get_object(self, Bucket, Key):
+        if not self._path(Bucket, Key).is_file():
+            raise ClientError("NoSuchKey", "GetObject")
+        return {"Body": open(self._path(Bucket, Key), "rb")}
+
+    def delete_object(self, Bucket, Key): # deleting a missing key is not an error on S3
+        self._path(Bucket, Key).unlink(missing_ok = True)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+@pytest.fixture(params = ["local", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        return LocalBlobStore(tmp_path / "shared")
+    return S3BlobStore("bucket", prefix = "/mta/", client = FakeS3Client(tmp_path / "s3"))
+
+def test_put_get_exists_open_delete(store, tmp_path):
+    src = tmp_path / "a.webm"
+    src.write_bytes(b"audio" * 1000)
+    key = "uploads/a.webm"
+
+    store.put(key, src)
+    assert store.exists(key)
+
+    dest = tmp_path / "node-b" / "a.webm"
+    dest.parent.mkdir()
+    assert store.get(key, dest) is True
+    assert dest.read_bytes() == src.read_bytes()
+    assert [p.name for p in dest.parent.iterdir()] == ["a.webm"] # no temp files left behind
+
+    f = store.open(key)
+    try:
+        assert f.read() == src.read_bytes()
+    finally:
+        f.close()
+
+    store.put(key, tmp_path / "a.webm") # overwrite is fine (same content-addressed name)
+    store.delete(key)
+    assert not store.exists(key)
+
+def test_missing_keys(store, tmp_path):
+    dest = tmp_path / "missing.webm"
+    assert store.exists("runs/nope/plot.png") is False
+    assert store.get("runs/nope/plot.png", dest) is False
+    assert not dest.exists() and not list(tmp_path.glob(".missing.webm.*"))
+    assert store.open("runs/nope/plot.png") is None
+    store.delete("runs/nope/plot.png") # no error
+
+def test_nested_keys_and_urls(store, tmp_path):
+    src = tmp_path / "plot.png"
+    src.write_bytes(b"png")
+    store.put("runs/1_abcdef01/plot.png", src)
+    assert store.exists("runs/1_abcdef01/plot.png") and not store.exists("runs/1_abcdef01")
+    url = store.url("runs/1_abcdef01/plot.png", 60)
+    if isinstance(store, S3BlobStore):
+        assert url == "https://s3.test/bucket/mta/runs/1_abcdef01/plot.png?X-Amz-Expires=60" # prefix normalized to "mta/"
+    else:
+        assert url is None # local backend: the app streams the file
+
+def test_other_client_errors_propagate(tmp_path):
+    class Denied(FakeS3Client):
+        def head_object(self, Bucket, Key):
+            raise ClientError("403", "HeadObject")
+    store = S3BlobStore("bucket", client = Denied(tmp_path))
+    with pytest.raises(ClientError):
+        store.exists("uploads/a.webm")
+
+def test_from_config(tmp_path):
+    assert blobstore_from_config({}) is None
+    assert isinstance(blobstore_from_config({"BLOB_BACKEND": "local", "BLOB_ROOT": str(tmp_path)}), LocalBlobStore)
+    with pytest.raises(RuntimeError):
+        blobstore_from_config({"BLOB_BACKEND": "local"})
+    with pytest.raises(RuntimeError):
+        blobstore_from_config({"BLOB_BACKEND": "gcs"})
@@ -0,0 +1,49 @@
+import threading
+import pytest
+from mainapp.db import get_session
+from mainapp.models import CompareJob
+from mainapp.api.jobs import JobQueue, QueueFull
+from mainapp.api.audio import write_wav
+from mainapp.api.synth import render_tones
+
+def test_queue_refuses_past_max_pending():
+    queue = JobQueue(workers = 1, max_pending = 2, executor = "thread")
+    release = threading.Event()
+    jobs = [queue.submit(release.wait, 10) for _ in range(2)]
+    with pytest.raises(QueueFull):
+        queue.submit(sum, [1, 2])
+    assert jobs[1].status() == "queued" # one worker, held by the first job
+
+    release.set()
+    assert queue.wait(jobs[1].job_id, 5).to_dict() == {"job_id": jobs[1].job_id, "status": "done", "result": True}
+    job = queue.submit(sum, [1, 2], on_done = lambda r: {"total": r}) # slots are freed once jobs finish
+    assert queue.wait(job.job_id, 5).result == {"total": 3}
+
+def test_failed_job_reports_error():
+    queue = JobQueue(workers = 1, executor = "thread")
+    job = queue.submit(int, "x")
+    assert queue.wait(job.job_id, 5).to_dict()["status"] == "error"
+    assert queue.pending == 0
+
+def test_compare_answers_429_when_queue_is_full(app, client, tmp_path):
+    app.config.update(COMPARE_EXECUTOR = "thread", COMPARE_WORKERS = 1, COMPARE_QUEUE_SIZE = 1, RESULT_CACHE = False)
+    write_wav(tmp_path / "take.wav", render_tones([3, 3], lead = 0.2))
+    file_url = client.post("/api/upload?phrase_id=p001", data = (tmp_path / "take.wav").read_bytes(), content_type = "audio/wav").get_json()["file_url"]
+    body = {"phrase_id": "p001", "file_url": file_url, "mode": "async"}
+
+    release = threading.Event()
+    with app.app_context():
+        from mainapp.api.api import get_job_queue
+        blocker = get_job_queue().submit(release.wait, 30) # the only slot is taken
+
+    resp = client.post("/api/compare", json = body)
+    assert resp.status_code == 429 and resp.headers["Retry-After"] == "2"
+    with app.app_context():
+        assert get_session(app)().query(CompareJob).count() == 0 # the refused job is not left registered
+
+    release.set()
+    blocker.future.result(5)
+    resp = client.post("/api/compare", json = body)
+    assert resp.status_code == 202
+    done = client.get(resp.get_json()["status_url"] + "?wait=30").get_json()
+    assert done["status"] == "done" and len(done["result"]["syllables"]) == 2
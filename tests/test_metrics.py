@@ -0,0 +1,22 @@
+import os
+from mainapp.metrics import SlowRequestProfiler
+
+def test_profiler_keeps_newest_dumps(tmp_path):
+    profiler = SlowRequestProfiler(tmp_path, threshold_s = 0.1, keep = 3, min_gap_s = 0)
+    paths = []
+    for i in range(6):
+        profiler.start()
+        paths.append(profiler.finish(f"GET /api/req{i}", 0.5, [("decode", 0.4)]))
+        os.utime(paths[-1], ns = (i * 10**9, i * 10**9)) # distinct mtimes, oldest first
+    profiler._prune()
+    assert sorted(tmp_path.glob("*.json")) == sorted(paths[-3:])
+    assert sorted(p.stem for p in tmp_path.glob("*.folded")) == sorted(p.stem for p in paths[-3:])
+
+def test_profiler_rate_limits_dumps(tmp_path):
+    profiler = SlowRequestProfiler(tmp_path, threshold_s = 0.1, min_gap_s = 60)
+    assert profiler.finish("GET /a", 0.05, []) is None # fast requests never dump
+    assert profiler.finish("GET /b", 0.5, []) is not None
+    assert profiler.finish("GET /c", 0.5, []) is None # within the gap
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    profiler.last_dump -= 60
+    assert profiler.finish("GET /d", 0.5, []) is not None
@@ -0,0 +1,71 @@
+import os
+import pytest
+from mainapp.phrasebank import build_bank, MappedPhraseRegistry
+from mainapp.phrases import open_bank, phrase_source, compile_phrase, PHRASES
+
+ROWS = [(ph["phrase_id"], ph["hanzi"], ph["pinyin"]) for ph in PHRASES]
+REFS = {"p001": ([0.0, 1.0, 2.0, 1.5], [0, 2, 4]), "p002": ([-1.0, 0.5], [0, 1, 2])}
+
+@pytest.fixture
+def bank(tmp_path):
+    path = tmp_path / "phrasebank.bin"
+    build_bank(reversed(ROWS), path, REFS) # input order does not matter
+    return path
+
+def test_build_open_lookup(bank):
+    registry = open_bank(bank, source = phrase_source(ROWS))
+    assert isinstance(registry, MappedPhraseRegistry) and len(registry) == len(ROWS)
+    for phrase_id, hanzi, pinyin in ROWS:
+        assert registry.get(phrase_id) == compile_phrase(phrase_id, hanzi, pinyin)
+    assert registry.get("p999") is None and registry.get("x" * 50) is None
+    assert [ph["phrase_id"] for ph in registry.items[:3]] == ["p001", "p002", "p003"]
+
+    compiled = [compile_phrase(*row) for row in ROWS]
+    assert len(registry.with_tone(3)) == sum(3 in ph["tones"] for ph in compiled)
+    assert len(registry.buckets.get(("difficulty", 1))) == sum(ph["difficulty"] == 1 for ph in compiled)
+    for _ in range(20):
+        ph = registry.random(syllables = 3, difficulty = 2)
+        assert len(ph["syllables"]) == 3 and ph["difficulty"] == 2
+    assert registry.random(tones = "999") is None
+
+    contour, bounds = registry.reference("p001")
+    assert list(contour) == REFS["p001"][0] and bounds == [0, 2, 4]
+    assert registry.reference("p003") is None
+
+def test_stale_bank_is_not_opened(bank):
+    edited = [(pid, hanzi, "nǐ hāo" if pid == "p001" else pinyin) for pid, hanzi, pinyin in ROWS] # same count
+    assert open_bank(bank, source = phrase_source(edited)) is None
+    assert open_bank(bank, source = phrase_source(ROWS[:-1] + [("p999", "好", "hǎo")])) is None
+    assert open_bank(bank, source = phrase_source(ROWS)) is not None
+    assert open_bank(bank.with_name("missing.bin")) is None
+
+def test_invalidate_falls_back_to_db_and_rebuild_remaps(bank):
+    db = list(ROWS)
+    registry = open_bank(bank, lambda: db, phrase_source(ROWS))
+    db[0] = ("p001", "你好", "nǐ hāo") # edited at runtime: the contour compiled for the old text no longer applies
+    registry.invalidate()
+    assert registry.get("p001")["pinyin"] == "nǐ hāo"
+    assert registry.reference("p001") is None
+    assert registry.reference("p002") is not None # unchanged phrase keeps its contour
+
+    build_bank(db, bank, REFS)
+    os.utime(bank, (1, 1)) # distinct mtime even if both builds land in the same tick
+    registry.recheck_s = 0
+    assert registry.get("p001")["pinyin"] == "nǐ hāo" and registry._db is None # back on the (rebuilt) bank
+
+def test_lookups_stat_the_file_once_per_interval(bank, monkeypatch):
+    registry = open_bank(bank)
+    stats = []
+    real_stat = type(bank).stat
+    monkeypatch.setattr(type(bank), "stat", lambda self, *a, **kw: stats.append(self) or real_stat(self, *a, **kw))
+    for _ in range(1000):
+        registry.get("p001")
+        len(registry)
+    assert stats == []
+
+    build_bank(ROWS[:10], bank)
+    os.utime(bank, (1, 1))
+    stats.clear()
+    assert len(registry) == len(ROWS) and stats == [] # not noticed within the interval
+    registry._checked -= registry.recheck_s
+    assert len(registry) == 10 and stats # the next check sees the rebuild
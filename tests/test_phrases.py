@@ -0,0 +1,85 @@
+import pytest
+from mainapp import create_app
+from mainapp.db import get_session
+from mainapp.models import Phrase
+from mainapp.phrasebank import build_bank, MappedPhraseRegistry
+from mainapp.phrases import PhraseRegistry, PHRASES, compile_phrase, phrase_marker, get_registry, get_phrase_by_id
+
+ROWS = [(ph["phrase_id"], ph["hanzi"], ph["pinyin"]) for ph in PHRASES]
+
+# a second worker process on the same DB (its own registry; this process's commits do not invalidate it)
+@pytest.fixture
+def worker(app, tmp_path):
+    other = create_app({"DATABASE_URL": app.config["DATABASE_URL"], "PHRASEBANK_PATH": str(tmp_path / "phrasebank.bin"), "PHRASES_RECHECK_S": 0})
+    yield other
+    get_session(other).remove()
+
+def edit_pinyin(app, phrase_id, pinyin):
+    with app.app_context():
+        db = get_session(app)()
+        db.get(Phrase, phrase_id).pinyin = pinyin
+        db.commit()
+
+def lookup(app, phrase_id):
+    with app.app_context(): # one request: the session (and its read snapshot) ends with it
+        return get_phrase_by_id(phrase_id)
+
+def test_registry_lookup_and_buckets():
+    registry = PhraseRegistry().load(lambda: ROWS)
+    compiled = [compile_phrase(*row) for row in ROWS]
+    assert len(registry) == len(ROWS) and registry.get("p001") == compiled[0] and registry.get("nope") is None
+    assert registry.buckets[("syllables", 2)] == [ph for ph in compiled if len(ph["syllables"]) == 2]
+    assert registry.with_tone(5) == [ph for ph in compiled if 5 in ph["tones"]]
+    for _ in range(20):
+        ph = registry.random(syllables = 2, tones = "33")
+        assert ph["tone_pattern"] == "33"
+    assert registry.random(syllables = 9) is None
+
+def test_invalidate_rebuilds_from_loader():
+    rows = list(ROWS)
+    registry = PhraseRegistry().load(lambda: rows)
+    rows.append(("p999", "好", "hǎo"))
+    assert registry.get("p999") is None # built once; loads are not repeated per lookup
+    registry.invalidate()
+    assert registry.get("p999")["tones"] == [3] and len(registry) == len(ROWS) + 1
+
+def test_commit_in_this_process_invalidates(app):
+    edit_pinyin(app, "p001", "nǐ hāo")
+    assert lookup(app, "p001")["tones"] == [3, 1]
+
+def test_marker_moves_on_edit_add_and_delete(app):
+    with app.app_context():
+        db = get_session(app)()
+        seen = [phrase_marker(db)]
+        db.get(Phrase, "p002").pinyin = "xiè xiè"
+        db.commit()
+        seen.append(phrase_marker(db))
+        db.add(Phrase(phrase_id = "p999", hanzi = "好", pinyin = "hǎo"))
+        db.commit()
+        seen.append(phrase_marker(db))
+        db.delete(db.get(Phrase, "p001"))
+        db.commit()
+        seen.append(phrase_marker(db))
+    assert len(set(seen)) == 4
+
+def test_other_worker_sees_edits_after_recheck(app, worker):
+    assert lookup(worker, "p001")["pinyin"] == "nǐ hǎo"
+    edit_pinyin(app, "p001", "nǐ hāo")
+    assert lookup(worker, "p001")["pinyin"] == "nǐ hāo"
+
+    worker.extensions["phrases"].recheck_s = 3600
+    edit_pinyin(app, "p001", "nǐ hǎo")
+    assert lookup(worker, "p001")["pinyin"] == "nǐ hāo" # within the interval: not polled yet
+
+def test_other_worker_on_the_bank_falls_back_to_db(app, tmp_path):
+    build_bank(ROWS, tmp_path / "phrasebank.bin")
+    banked = create_app({"DATABASE_URL": app.config["DATABASE_URL"], "PHRASEBANK_PATH": str(tmp_path / "phrasebank.bin"), "PHRASES_RECHECK_S": 0})
+    try:
+        assert isinstance(banked.extensions["phrases"], MappedPhraseRegistry)
+        edit_pinyin(app, "p002", "xiè xiè")
+        assert lookup(banked, "p002")["tones"] == [4, 4]
+    finally:
+        get_session(banked).remove()
+
+def test_outside_an_app_uses_the_literal_bank():
+    assert get_registry().get("p001")["hanzi"] == "你好"
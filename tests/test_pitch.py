@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from mainapp.api.pitch import yin_batch, estimate_range, extract_f0, AUTO_FLOOR, AUTO_CEILING, PITCH_FLOOR, PITCH_CEILING
+from mainapp.api.synth import render_tones
+from mainapp.api.audio import SAMPLE_RATE
+
+# plain harmonic tone at a fixed f0 (a few harmonics, like render_tones)
+def tone(f0, dur = 0.5, sr = SAMPLE_RATE):
+    phase = 2 * np.pi * f0 * np.arange(int(dur * sr)) / sr
+    return (0.5 * np.sin(phase) + 0.25 * np.sin(2 * phase) + 0.12 * np.sin(3 * phase)).astype(np.float32)
+
+@pytest.mark.parametrize("f0", [90.0, 150.0, 220.0, 400.0])
+def test_yin_tracks_a_steady_tone(f0):
+    t, f = yin_batch([tone(f0)])[0]
+    assert len(t) == len(f) and np.all(np.diff(t) > 0)
+    voiced = f[np.isfinite(f)]
+    assert len(voiced) > 0.9 * len(f)
+    assert abs(np.median(voiced) / f0 - 1) < 0.02
+
+def test_yin_level_rendered_tone():
+    y = render_tones([1], base_f0 = 160.0) # tone 1 = 1.25 x base, level
+    _, f0, dur = extract_f0(y, backend = "yin")
+    voiced = f0[np.isfinite(f0)]
+    assert abs(np.median(voiced) / 200.0 - 1) < 0.03
+    assert dur == pytest.approx(len(y) / SAMPLE_RATE)
+
+def test_yin_follows_a_rising_contour():
+    y = render_tones([2], base_f0 = 160.0, syl_dur = 0.5) # 152 -> 208 Hz
+    _, f0 = yin_batch([y])[0]
+    voiced = f0[np.isfinite(f0)]
+    third = len(voiced) // 3
+    assert np.median(voiced[:third]) < np.median(voiced[-third:])
+    assert voiced.min() > 152 * 0.95 and voiced.max() < 208 * 1.05
+
+def test_yin_silence_is_unvoiced():
+    sr = SAMPLE_RATE
+    y = np.concatenate([np.zeros(int(0.3 * sr), dtype = np.float32), tone(200.0, 0.4), np.zeros(int(0.3 * sr), dtype = np.float32)])
+    t, f0 = yin_batch([y])[0]
+    assert np.isnan(f0[t < 0.2]).all() and np.isnan(f0[t > 0.85]).all()
+    mid = f0[(t > 0.4) & (t < 0.6)]
+    assert np.isfinite(mid).all() and abs(np.median(mid) / 200.0 - 1) < 0.02
+
+def test_yin_batch_matches_one_at_a_time():
+    signals = [tone(120.0, 0.3), render_tones([4, 3], base_f0 = 200.0), tone(300.0, 0.01)] # last is shorter than a frame
+    together = yin_batch(signals)
+    for y, (t, f0) in zip(signals, together):
+        t1, f1 = yin_batch([y])[0]
+        assert np.array_equal(t, t1)
+        np.testing.assert_allclose(f0, f1, rtol = 1e-4, equal_nan = True)
+
+def test_yin_agrees_with_praat():
+    pytest.importorskip("parselmouth")
+    y = render_tones([2, 4], base_f0 = 180.0)
+    t_y, f_y, _ = extract_f0(y, backend = "yin")
+    t_p, f_p, _ = extract_f0(y, backend = "praat")
+    f_p = np.interp(t_y, t_p, np.nan_to_num(f_p, nan = 0.0))
+    both = np.isfinite(f_y) & (f_p > 0)
+    assert both.sum() > 20
+    assert np.median(np.abs(f_y[both] / f_p[both] - 1)) < 0.03
+
+@pytest.mark.parametrize("base_f0", [85.0, 150.0, 260.0])
+def test_estimate_range_brackets_the_voice(base_f0):
+    y = render_tones([1, 2, 3, 4], base_f0 = base_f0)
+    lo, hi = estimate_range(y)
+    assert AUTO_FLOOR <= lo < 0.70 * base_f0 * 0.95 # below the tone 3 dip
+    assert 1.35 * base_f0 < hi <= AUTO_CEILING # above the tone 4 onset
+
+def test_digital_silence_is_unvoiced_and_range_defaults():
+    silence = np.zeros(SAMPLE_RATE, dtype = np.float32)
+    assert np.isnan(yin_batch([silence])[0][1]).all()
+    assert estimate_range(silence) == (PITCH_FLOOR, PITCH_CEILING)
+
+def test_extract_f0_auto_range_and_unknown_backend():
+    y = render_tones([1], base_f0 = 100.0) # 125 Hz
+    _, f0, _ = extract_f0(y, backend = "yin", floor = None, ceiling = None)
+    assert abs(np.nanmedian(f0) / 125.0 - 1) < 0.03
+    with pytest.raises(ValueError):
+        extract_f0(y, backend = "nope")
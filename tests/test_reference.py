@@ -0,0 +1,71 @@
+import json
+import numpy as np
+import pytest
+from mainapp.api.reference import banded_dtw, align_syllables, normalize_contour, ReferenceStore, HOP
+from mainapp.api.analysis import reference_edges
+
+def test_banded_dtw_identity_is_diagonal():
+    x = np.sin(np.linspace(0, 3, 40)).astype(np.float32)
+    pi, pj, dist = banded_dtw(x, x)
+    assert list(pi) == list(range(40)) and list(pj) == list(range(40))
+    assert dist == 0
+
+def test_banded_dtw_path_is_monotone_and_covers_both():
+    x = np.concatenate([np.zeros(20), np.linspace(0, 4, 30)]).astype(np.float32) # long flat start
+    y = np.concatenate([np.zeros(5), np.linspace(0, 4, 30)]).astype(np.float32)
+    pi, pj, dist = banded_dtw(x, y)
+    assert (pi[0], pj[0]) == (0, 0) and (pi[-1], pj[-1]) == (len(x) - 1, len(y) - 1)
+    steps = np.stack([np.diff(pi), np.diff(pj)])
+    assert ((steps >= 0) & (steps <= 1)).all() and (steps.sum(axis = 0) >= 1).all()
+    assert dist < 0.1 # the warp absorbs the extra flat frames
+
+def test_align_syllables_maps_reference_syllables_to_user_frames():
+    ref = np.concatenate([np.full(10, -2.0), np.full(10, 2.0)]).astype(np.float32)
+    user = np.concatenate([np.full(15, -2.0), np.full(25, 2.0)]).astype(np.float32) # same shape, slower
+    segs, overall = align_syllables(user, ref, [0, 10, 20])
+    assert segs[0][:2] == (0, 14) and segs[1][:2] == (15, 39)
+    assert [s for _, _, s in segs] == [100, 100] and overall == 100
+
+def test_align_syllables_empty_reference_syllable():
+    rng = np.random.default_rng(0)
+    segs, overall = align_syllables(rng.random(50).astype(np.float32), rng.random(3).astype(np.float32), [0, 1, 1, 2, 3])
+    assert segs[1] == (None, None, None)
+    assert overall == int(round(np.mean([s for _, _, s in segs if s is not None]))) # empty syllable does not drag it down
+
+def test_reference_edges_falls_back_on_empty_syllable():
+    t = np.arange(50) * HOP
+    f0 = np.linspace(180, 240, 50)
+    assert reference_edges(t, f0, (np.zeros(3, dtype = np.float32), np.array([0, 1, 1, 2, 3])), 4) == (None, None)
+
+def test_reference_edges_inside_voiced_span():
+    t = np.arange(80) * HOP
+    f0 = np.full(80, np.nan)
+    f0[10:70] = np.concatenate([np.full(30, 150.0), np.full(30, 250.0)])
+    ref, _, _ = normalize_contour(np.concatenate([np.full(20, 150.0), np.full(20, 250.0)]))
+    edges, scores = reference_edges(t, f0, (ref, np.array([0, 20, 40])), 2)
+    assert edges[0] == pytest.approx(t[10]) and edges[1] == pytest.approx(t[40])
+    assert edges[-1] == pytest.approx(t[69] + HOP / 2)
+    assert scores == [100, 100]
+
+def test_reference_store_roundtrip_and_rebuild(tmp_path):
+    store = ReferenceStore(tmp_path)
+    assert store.get("p1") is None and list(store.items()) == []
+
+    store.write({"p1": (np.arange(5), [0, 2, 5]), "p2": (np.ones(3), [0, 3])})
+    reader = ReferenceStore(tmp_path) # a second process mapping the same files
+    contour, bounds = reader.get("p1")
+    assert contour.dtype == np.float32 and list(contour) == [0, 1, 2, 3, 4] and list(bounds) == [0, 2, 5]
+    assert "p2" in reader and "p3" not in reader
+    assert sorted(pid for pid, _ in reader.items()) == ["p1", "p2"]
+
+    store.write({"p3": (np.full(4, 7.0), [0, 4])})
+    index = json.loads((tmp_path / "index.json").read_text())
+    reader._mtime = None # mtime granularity can hide a rewrite within the same tick
+    assert reader.get("p1") is None and list(reader.get("p3")[0]) == [7, 7, 7, 7]
+    assert [p.name for p in tmp_path.glob("contours-*.f32")] == [index["data"]] # old data file removed
+
+def test_reference_store_ignores_other_versions(tmp_path):
+    ReferenceStore(tmp_path).write({"p1": (np.arange(5), [0, 5])})
+    index = json.loads((tmp_path / "index.json").read_text())
+    (tmp_path / "index.json").write_text(json.dumps(dict(index, version = 99)))
+    assert ReferenceStore(tmp_path).get("p1") is None
@@ -0,0 +1,66 @@
+import shutil
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from mainapp.models import Base
+from mainapp.api import result_cache
+from mainapp.api.result_cache import ResultCache, result_key, scorer_version, SCORER_MODULES
+
+PHRASE = {"phrase_id": "p001", "hanzi": "你好", "pinyin": "nǐ hǎo", "tones": [3, 3], "surface_tones": [2, 3]}
+PITCH = {"backend": "praat"}
+
+def key(phrase = PHRASE, **kw):
+    return result_key("a" * 64, phrase, PITCH, "energy", **kw)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind = engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+# a copy of the scorer sources that result_cache fingerprints, so a test can "edit" one
+@pytest.fixture
+def scorer_tree(tmp_path, monkeypatch):
+    api = Path(result_cache.__file__).resolve().parent
+    (tmp_path / "mainapp" / "api").mkdir(parents = True)
+    for name in SCORER_MODULES:
+        shutil.copyfile(api / name, tmp_path / "mainapp" / "api" / name)
+    monkeypatch.setattr(result_cache, "__file__", str(tmp_path / "mainapp" / "api" / "result_cache.py"))
+    monkeypatch.setattr(result_cache, "_version", None)
+    return tmp_path / "mainapp"
+
+def test_key_is_stable():
+    assert key() == key(dict(PHRASE))
+
+def test_edited_phrase_misses(db):
+    cache = ResultCache()
+    cache.put(db, key(), "p001", "run1", {"score": 80})
+    assert cache.get(db, key()) == ("run1", {"score": 80})
+
+    for edit in ({"pinyin": "nǐ hāo"}, {"hanzi": "你們"}, {"surface_tones": [3, 3]}):
+        assert key(dict(PHRASE, **edit)) != key()
+        assert ResultCache().get(db, key(dict(PHRASE, **edit))) is None # neither tier answers for the edited phrase
+
+def test_sandhi_rule_change_misses(scorer_tree):
+    before = scorer_version()
+    assert "../phrases.py" in SCORER_MODULES
+
+    phrases = scorer_tree / "phrases.py"
+    phrases.write_text(phrases.read_text() + "\n# sandhi rule edited\n")
+    result_cache._version = None # a restarted worker re-reads the sources
+    assert scorer_version() != before
+
+def test_scorer_change_invalidates_shared_rows(db, scorer_tree):
+    cache = ResultCache()
+    k = key()
+    cache.put(db, k, "p001", "run1", {"score": 80})
+
+    scoring = scorer_tree / "api" / "scoring.py"
+    scoring.write_text(scoring.read_text() + "\n# threshold tweaked\n")
+    result_cache._version = None
+    assert ResultCache().get(db, k) is None # row written by the old scorer is ignored
+    assert key() != k
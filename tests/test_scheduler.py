@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from mainapp.models import Base, LearnerItem, LearnerTone
+from mainapp.phrases import PhraseRegistry, PHRASES
+from mainapp.scheduler import next_state, next_phrase, RELEARN_S, FIRST_S, SECOND_S, MAX_INTERVAL_S, MIN_EASE, MAX_EASE, SNOOZE_S
+
+NOW = datetime(2026, 1, 1, 12)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sched.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind = engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+def registry(ids):
+    return PhraseRegistry().load(lambda: [(ph["phrase_id"], ph["hanzi"], ph["pinyin"]) for ph in PHRASES if ph["phrase_id"] in ids])
+
+def test_passes_grow_the_interval():
+    s1 = next_state({}, 85, None, NOW)
+    s2 = next_state(s1, 85, None, NOW)
+    s3 = next_state(s2, 85, None, NOW)
+    assert [s["interval_s"] for s in (s1, s2)] == [FIRST_S, SECOND_S]
+    assert s3["interval_s"] == pytest.approx(SECOND_S * 2.5) and s3["reps"] == 3
+    assert s1["due_at"] == NOW + timedelta(seconds = FIRST_S) and s1["last_score"] == 85
+
+def test_failure_resets_and_lowers_ease():
+    s = next_state({"reps": 4, "ease": 2.5, "interval_s": 10 * SECOND_S}, 40, None, NOW)
+    assert (s["reps"], s["lapses"], s["interval_s"]) == (0, 1, RELEARN_S)
+    assert s["ease"] == pytest.approx(2.3)
+    for _ in range(10):
+        s = next_state(s, 0, None, NOW)
+    assert s["ease"] == MIN_EASE and s["lapses"] == 11
+
+def test_ease_follows_score_within_bounds():
+    assert next_state({}, 85, None, NOW)["ease"] == pytest.approx(2.5) # 85 keeps it flat
+    assert next_state({}, 100, None, NOW)["ease"] == pytest.approx(2.575)
+    s = {}
+    for _ in range(20):
+        s = next_state(s, 100, None, NOW)
+    assert s["ease"] == MAX_EASE and s["interval_s"] == MAX_INTERVAL_S # a long streak stops growing
+
+def test_weak_tones_shorten_the_interval():
+    assert next_state({}, 90, 42.5, NOW)["interval_s"] == pytest.approx(FIRST_S * 0.5)
+    assert next_state({}, 90, 5, NOW)["interval_s"] == pytest.approx(FIRST_S * 0.3) # floor
+    assert next_state({}, 90, 95, NOW)["interval_s"] == FIRST_S
+
+def test_due_reviews_come_earliest_first_then_new_then_ahead(db):
+    reg = registry({"p001", "p002", "p003", "p004"})
+    for pid, hours in (("p002", -1), ("p001", -3), ("p003", 5)):
+        db.add(LearnerItem(learner_id = "ana", phrase_id = pid, due_at = NOW + timedelta(hours = hours)))
+    db.commit()
+
+    assert [next_phrase(db, "ana", reg, NOW)[0]["phrase_id"] for _ in range(2)] == ["p001", "p002"] # served ones are snoozed
+    assert next_phrase(db, "ana", reg, NOW) == (reg.get("p004"), "new") # the only unseen phrase
+    assert db.get(LearnerItem, ("ana", "p004")).due_at == NOW + timedelta(seconds = SNOOZE_S)
+    ph, reason = next_phrase(db, "ana", reg, NOW)
+    assert reason == "ahead" and ph["phrase_id"] in ("p001", "p002", "p004") # snoozed ones now lead the upcoming queue
+    assert next_phrase(db, "bob", reg, NOW)[1] == "new" # queues are per learner
+
+def test_new_learner_starts_easy_and_weak_tones_are_practised(db):
+    reg = PhraseRegistry().load(lambda: [(ph["phrase_id"], ph["hanzi"], ph["pinyin"]) for ph in PHRASES])
+    assert next_phrase(db, "new", reg, NOW)[0]["difficulty"] == 1
+    db.add_all([LearnerTone(learner_id = "weak3", tone = 3, ema = 40.0, n = 5), LearnerTone(learner_id = "weak3", tone = 1, ema = 95.0, n = 5)])
+    db.commit()
+    assert 3 in next_phrase(db, "weak3", reg, NOW)[0]["tones"]
+
+def test_orphaned_items_are_dropped(db):
+    reg = registry({"p001"})
+    db.add_all([
+        LearnerItem(learner_id = "ana", phrase_id = "gone1", due_at = NOW - timedelta(days = 2)), # phrases deleted since
+        LearnerItem(learner_id = "ana", phrase_id = "gone2", due_at = NOW - timedelta(days = 1)),
+        LearnerItem(learner_id = "ana", phrase_id = "p001", due_at = NOW - timedelta(hours = 1)),
+    ])
+    db.commit()
+    assert next_phrase(db, "ana", reg, NOW) == (reg.get("p001"), "review")
+    assert db.get(LearnerItem, ("ana", "gone1")) is None and db.get(LearnerItem, ("ana", "gone2")) is None
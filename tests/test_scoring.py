@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from mainapp.api.scoring import OUTCOMES, score_window, score_windows, score_batch
+
+HOP = 0.01
+FRAMES = 20 # frames per syllable window in the golden tracks
+
+# one window's f0 frames for each outcome (Hz; NaN = unvoiced)
+SHAPES = {
+    "level": np.full(FRAMES, 200.0),
+    "rise": np.linspace(180, 240, FRAMES),
+    "fall": np.linspace(240, 180, FRAMES),
+    "dip": np.concatenate([np.linspace(220, 170, FRAMES // 2), np.linspace(170, 225, FRAMES // 2)]),
+    "wobble": 200 + 30 * np.sin(np.linspace(0, 2 * np.pi, FRAMES)),
+    "flat": np.full(FRAMES, 210.0) * np.linspace(1, 1.01, FRAMES),
+    "sparse": np.where(np.arange(FRAMES) % 5 == 0, 200.0, np.nan), # 4 voiced frames < MIN_VOICED
+    "nan": np.full(FRAMES, np.nan),
+    "gappy_rise": np.where(np.arange(FRAMES) % 3 == 1, np.nan, np.linspace(180, 240, FRAMES)),
+}
+
+# (shape, tone) -> expected outcome index: every entry of OUTCOMES is reached at least once
+GOLDEN = [
+    ("nan", 1, 0), ("sparse", 4, 0),
+    ("level", 1, 1), ("flat", 1, 1), ("wobble", 1, 2), ("rise", 1, 2),
+    ("rise", 2, 3), ("gappy_rise", 2, 3), ("level", 2, 4), ("fall", 2, 4),
+    ("fall", 4, 5), ("rise", 4, 6), ("level", 4, 6),
+    ("dip", 3, 7), ("level", 3, 8), ("rise", 3, 8),
+    ("level", 5, 9), ("dip", 0, 9), ("nan", 5, 0),
+]
+
+# t, f0, edges, tones for a track made of the given (shape, tone) windows
+def track(spec, lead = 5, tail = 5):
+    f0 = np.concatenate([np.full(lead, 190.0)] + [SHAPES[s] for s, _ in spec] + [np.full(tail, 190.0)]) # frames outside every window
+    t = np.arange(len(f0)) * HOP
+    edges = (lead + FRAMES * np.arange(len(spec) + 1)) * HOP - HOP / 2 # boundaries between frames: no rounding ties
+    return t, f0, edges, [tone for _, tone in spec]
+
+# reference: one score_window call per window, frames picked with the (t >= a) & (t < b) mask
+def reference(t, f0, edges, tones):
+    return [score_window(f0[(t >= a) & (t < b)], tone) for a, b, tone in zip(edges[:-1], edges[1:], tones)]
+
+def test_golden_outcomes_cover_every_outcome():
+    assert {k for _, _, k in GOLDEN} == set(range(len(OUTCOMES)))
+    spec = [(s, tone) for s, tone, _ in GOLDEN]
+    t, f0, edges, tones = track(spec)
+    expected = [OUTCOMES[k] for _, _, k in GOLDEN]
+    assert reference(t, f0, edges, tones) == expected
+    assert score_windows(t, f0, edges, tones) == expected
+
+@pytest.mark.parametrize("shape,tone,k", GOLDEN)
+def test_single_window(shape, tone, k):
+    t, f0, edges, tones = track([(shape, tone)])
+    assert score_windows(t, f0, edges, tones) == reference(t, f0, edges, tones) == [OUTCOMES[k]]
+
+def test_empty_windows():
+    t, f0, _, _ = track([("rise", 2), ("fall", 4)])
+    edges = np.array([0.0, 0.0, 0.2, 0.2, 0.45, 10.0, 11.0]) # zero-width, frameless and past-the-end windows
+    tones = [1, 2, 3, 4, 2, 1]
+    assert score_windows(t, f0, edges, tones) == reference(t, f0, edges, tones)
+    assert score_windows(t, f0, edges, tones)[-1] == OUTCOMES[0]
+
+def test_batch_matches_per_utterance():
+    specs = [ # ragged: 1..7 windows, including all-NaN utterances and windows
+        [("rise", 2)],
+        [("nan", 1), ("nan", 2), ("nan", 3)],
+        [(s, tone) for s, tone, _ in GOLDEN[:7]],
+        [("dip", 3), ("sparse", 3)],
+        [(s, tone) for s, tone, _ in GOLDEN[7:]],
+        [("level", 1), ("fall", 4), ("rise", 2), ("dip", 3), ("level", 5)],
+    ]
+    tracks = [track(spec, lead = 3 + i, tail = i) for i, spec in enumerate(specs)]
+    batch = score_batch(tracks)
+    assert len(batch) == len(specs)
+    for tr, got in zip(tracks, batch):
+        assert got == score_windows(*tr) == reference(*tr)
+    assert score_batch([]) == []
+
+def test_batch_with_extra_tones_and_all_nan_track():
+    t, f0, edges, _ = track([("rise", 2), ("fall", 4)])
+    nan = (t, np.full_like(f0, np.nan), edges, [2, 4])
+    batch = score_batch([(t, f0, edges, [2, 4, 1]), nan]) # tones beyond the windows are ignored
+    assert batch[0] == reference(t, f0, edges, [2, 4])
+    assert batch[1] == [OUTCOMES[0], OUTCOMES[0]]
+
+def test_random_tracks_match_reference():
+    rng = np.random.default_rng(7) # fixed seed: the same tracks on every run
+    for _ in range(300):
+        n = int(rng.integers(1, 6))
+        f0 = 200 * 2 ** np.cumsum(rng.normal(0, 0.02, n * FRAMES + 10))
+        f0[rng.random(len(f0)) < rng.uniform(0, 0.6)] = np.nan
+        t = np.arange(len(f0)) * HOP
+        edges = np.sort(rng.uniform(0, t[-1], n + 1))
+        tones = rng.integers(0, 6, n).tolist()
+        assert score_windows(t, f0, edges, tones) == reference(t, f0, edges, tones)
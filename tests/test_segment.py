@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from mainapp.api.segment import envelope, trim, syllable_edges, PAD, FRAME, MIN_SYLLABLE
+from mainapp.api.synth import render_tones
+from mainapp.api.audio import SAMPLE_RATE
+
+SYL, GAP, LEAD = 0.30, 0.12, 0.3
+
+# rendered utterance + where each syllable starts/ends (seconds)
+def utterance(tones, noise = 0.0, gap = GAP, lead = LEAD):
+    y = render_tones(tones, syl_dur = SYL, gap = gap, lead = lead, noise = noise)
+    y = np.concatenate([y, np.zeros(int(0.3 * SAMPLE_RATE), dtype = np.float32)]) # trailing silence
+    onsets = lead + np.arange(len(tones)) * (SYL + gap)
+    return y, onsets, onsets + SYL
+
+def test_envelope_grid_and_levels():
+    y = np.concatenate([np.zeros(1600, dtype = np.float32), np.full(1600, 0.5, dtype = np.float32)])
+    t, db = envelope(y)
+    assert np.allclose(np.diff(t), 0.01)
+    assert db[0] < -100 and db[-1] == pytest.approx(10 * np.log10(0.25), abs = 0.01)
+    assert envelope(np.zeros(10))[0].size == 0
+
+@pytest.mark.parametrize("noise", [0.0, 0.003])
+def test_trim_lands_on_the_speech_bounds(noise):
+    y, on, off = utterance([1, 4, 2], noise = noise)
+    start, end = trim(y)
+    tol = FRAME + 0.01
+    assert on[0] - PAD - tol <= start <= on[0]
+    assert off[-1] <= end <= off[-1] + PAD + tol
+
+def test_trim_keeps_everything_without_silence():
+    y = render_tones([1], syl_dur = 1.0, gap = 0.0)
+    y = y[int(0.05 * SAMPLE_RATE):int(0.95 * SAMPLE_RATE)] # cut away the fades: no quiet frames left
+    assert trim(y) == (0.0, len(y) / SAMPLE_RATE)
+    assert trim(np.zeros(100, dtype = np.float32)) == (0.0, 100 / SAMPLE_RATE)
+
+@pytest.mark.parametrize("tones", [[1, 4], [1, 4, 2], [3, 1, 4, 2]])
+def test_syllable_edges_fall_in_the_gaps(tones):
+    y, on, off = utterance(tones)
+    start, end = trim(y)
+    edges = syllable_edges(y, len(tones), start, end)
+    assert len(edges) == len(tones) + 1
+    assert edges[0] == start and edges[-1] == end
+    for edge, gap_start, gap_end in zip(edges[1:-1], off[:-1], on[1:]):
+        assert gap_start - 0.01 <= edge <= gap_end + 0.01
+
+def test_syllable_edges_with_noise_and_short_gaps():
+    y, on, off = utterance([2, 3, 4], noise = 0.003, gap = 0.04)
+    start, end = trim(y)
+    edges = syllable_edges(y, 3, start, end)
+    for edge, gap_start, gap_end in zip(edges[1:-1], off[:-1], on[1:]):
+        assert gap_start - 0.02 <= edge <= gap_end + 0.02
+
+def test_syllable_edges_split_evenly_without_valleys():
+    y = render_tones([1], syl_dur = 1.0, gap = 0.0) # one long level syllable: no dips
+    edges = syllable_edges(y, 4, 0.0, 1.0)
+    assert np.allclose(edges, [0.0, 0.25, 0.5, 0.75, 1.0])
+
+def test_syllable_edges_more_syllables_than_gaps():
+    y, on, off = utterance([1, 4]) # one real gap, asked for three syllables
+    start, end = trim(y)
+    edges = syllable_edges(y, 3, start, end)
+    assert len(edges) == 4 and np.all(np.diff(edges) >= MIN_SYLLABLE)
+    assert any(off[0] - 0.01 <= e <= on[1] + 0.01 for e in edges[1:-1]) # the real gap is still used
+
+def test_syllable_edges_single_syllable_and_tiny_span():
+    y, _, _ = utterance([1])
+    assert list(syllable_edges(y, 1, 0.2, 0.8)) == [0.2, 0.8]
+    edges = syllable_edges(y, 2, 0.40, 0.41) # span shorter than one envelope frame
+    assert np.allclose(edges, [0.40, 0.405, 0.41])
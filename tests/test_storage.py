@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+import json
+import os
+import time
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from mainapp.models import Base, Attempt
+from mainapp.api.audio import av, write_wav, decode_audio
+from mainapp.api.storage import Storage, shard_of
+
+HOUR = 3600
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind = engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+def storage(tmp_path, **policy):
+    return Storage(tmp_path / "uploads", tmp_path / "artifacts", **policy)
+
+def age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+def upload(store, name, seconds, phrase_id = "p001", size = 100, legacy = False):
+    path = store.upload_dir / name if legacy else store.upload_path(name)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    path.write_bytes(b"\0" * size)
+    path.with_name(name + ".json").write_text(json.dumps({"phrase_id": phrase_id}))
+    age(path, seconds)
+    return path
+
+def run(store, seconds, wav = None):
+    run_id = f"{int(time.time() - seconds)}_{os.urandom(4).hex()}"
+    path = store.run_dir(run_id)
+    (path / "result.json").write_text("{}")
+    if wav is not None:
+        write_wav(path / "user.wav", wav)
+    for f in [*path.iterdir(), path]:
+        age(f, seconds)
+    return path
+
+def attempt(db, upload_path, run_path = None, seconds = 0):
+    row = Attempt(
+        phrase_id = "p001", file_url = f"/api/uploads/{upload_path.name}", score = 80,
+        plot_url = f"/api/artifacts/{run_path.name}/plot.png" if run_path else "",
+        created_at = datetime.utcnow() - timedelta(seconds = seconds),
+    )
+    db.add(row)
+    db.commit()
+    return row
+
+def test_grace_window_and_recent_attempts_survive(tmp_path, db):
+    store = storage(tmp_path, max_age = timedelta(seconds = 1)) # everything settled is past max age
+    fresh = upload(store, "fresh.webm", 10 * 60) # inside the 1 h grace window
+    old = upload(store, "old.webm", 48 * HOUR)
+    reused = upload(store, "reused.webm", 48 * HOUR) # old file, but a compare saved just now points at it
+    reused_run, old_run = run(store, 48 * HOUR), run(store, 48 * HOUR)
+    keep = attempt(db, reused, reused_run)
+    stale = attempt(db, old, old_run, seconds = 47 * HOUR)
+
+    stats = store.gc(db)
+    assert (stats["deleted_uploads"], stats["deleted_runs"]) == (1, 1)
+    assert fresh.exists() and reused.exists() and reused_run.exists()
+    assert not old.exists() and not old.with_name("old.webm.json").exists() and not old_run.exists()
+
+    db.expire_all()
+    assert keep.file_url == "/api/uploads/reused.webm" and keep.plot_url.endswith("/plot.png")
+    assert (stale.file_url, stale.plot_url, stale.upload_name, stale.run_id) == ("", "", "", "") # cleared before the delete
+
+def test_dry_run_touches_nothing(tmp_path, db):
+    store = storage(tmp_path, max_age = timedelta(hours = 1))
+    old = upload(store, "old.webm", 48 * HOUR)
+    assert store.gc(db, dry_run = True)["deleted_uploads"] == 1
+    assert old.exists()
+
+def test_phrase_quota_keeps_newest_and_grace(tmp_path, db):
+    store = storage(tmp_path, phrase_quota = 2)
+    hours = [0.1, 0.2, 0.3, 2, 3] # the three newest are inside the grace window
+    paths = [upload(store, f"q{i}.webm", h * HOUR) for i, h in enumerate(hours)]
+    other = upload(store, "other.webm", 5 * HOUR, phrase_id = "p002")
+    store.gc(db)
+    assert [p.exists() for p in paths] == [True, True, True, False, False]
+    assert other.exists()
+
+def test_byte_budget_drops_oldest_first(tmp_path, db):
+    store = storage(tmp_path, max_bytes = 2500)
+    paths = [upload(store, f"b{i}.webm", (10 - i) * HOUR, size = 1000) for i in range(4)] # ~1 KiB + sidecar each
+    store.gc(db)
+    assert [p.exists() for p in paths] == [False, False, True, True]
+
+def test_legacy_flat_files_are_resharded(tmp_path, db):
+    store = storage(tmp_path)
+    flat = upload(store, "flat.webm", 10, legacy = True)
+    legacy_run = store.artifact_dir / f"{int(time.time())}_deadbeef"
+    legacy_run.mkdir(parents = True)
+    (legacy_run / "plot.png").write_bytes(b"png")
+
+    assert store.gc(db)["resharded"] == 2
+    assert store.find_upload("flat.webm") == store.upload_dir / shard_of("flat.webm") / "flat.webm"
+    assert store.find_upload("flat.webm").with_name("flat.webm.json").exists() and not flat.exists()
+    assert (store.find_run(legacy_run.name) / "plot.png").read_bytes() == b"png"
+
+@pytest.mark.skipif(av is None, reason = "the cold tier encodes with PyAV")
+def test_cold_tier_compresses_wavs_and_repoints_rows(tmp_path, db):
+    store = storage(tmp_path, cold_after = timedelta(days = 1))
+    y = (0.3 * np.sin(2 * np.pi * 220 * np.arange(8000) / 16000)).astype(np.float32)
+    wav = store.upload_path("take.wav")
+    write_wav(wav, y)
+    wav.with_name("take.wav.json").write_text(json.dumps({"phrase_id": "p001"}))
+    age(wav, 3 * 24 * HOUR)
+    recent = store.upload_path("recent.wav")
+    write_wav(recent, y)
+    age(recent, 2 * HOUR) # past grace, not yet cold
+    cold_run = run(store, 3 * 24 * HOUR, wav = y)
+    row = attempt(db, wav, cold_run, seconds = 3 * 24 * HOUR)
+
+    stats = store.gc(db)
+    assert stats["cold"] == 2 and stats["rows_updated"] == 1
+    flac = wav.with_suffix(".flac")
+    assert not wav.exists() and flac.exists() and flac.with_name("take.flac.json").exists()
+    assert np.abs(decode_audio(flac) - y).max() < 1e-3 # lossless (16-bit)
+    assert flac.stat().st_mtime == pytest.approx(time.time() - 3 * 24 * HOUR, abs = 5) # keeps its age for retention
+    assert (cold_run / "user.flac").exists() and not (cold_run / "user.wav").exists()
+    assert recent.exists()
+
+    db.expire_all()
+    assert row.file_url == "/api/uploads/take.flac" and row.upload_name == "take.flac"
@@ -0,0 +1,71 @@
+import time
+import pytest
+from mainapp.models import CompareJob
+from mainapp.db import get_session
+from mainapp.api.audio import encode_audio, av
+from mainapp.api.synth import render_tones
+
+pytestmark = pytest.mark.skipif(av is None, reason = "needs PyAV to encode the test recording")
+
+PHRASE_ID = "p004" # 对不起 duì bù qǐ: three syllables
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "take.opus"
+    encode_audio(path, render_tones([4, 4, 3], syl_dur = 0.4, gap = 0.15, lead = 0.3))
+    return path.read_bytes()
+
+def open_stream(client):
+    resp = client.post("/api/stream", json = {"phrase_id": PHRASE_ID, "ext": "opus"})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+# replay the recording in fixed-size chunks, like `flask replay-stream`
+def test_replay_scores_while_streaming(client, recording):
+    stream = open_stream(client)
+    assert stream["owner"]
+
+    live, frames = [], 0
+    for i in range(0, len(recording), 2048):
+        resp = client.post(stream["chunk_url"], data = recording[i:i + 2048])
+        assert resp.status_code == 200
+        j = resp.get_json()
+        frames += len(j["frames"]["t"])
+        live += j["syllables"]
+    assert frames > 50 # f0 frames were pushed while chunks arrived
+    assert [v["idx"] for v in live] == list(range(len(live))) and len(live) >= 2 # syllables graded before finish
+
+    result = client.post(stream["finish_url"]).get_json()
+    assert len(result["syllables"]) == 3 and 0 <= result["score"] <= 100
+    assert [v["idx"] for v in result["streamed_syllables"]] == [0, 1, 2]
+    assert result["streamed_syllables"][:len(live)] == live
+    assert client.get(result["file_url"]).status_code == 200
+
+    assert client.post(stream["chunk_url"], data = b"x").status_code == 404 # finished: gone
+    assert client.post("/api/stream", json = {"phrase_id": "nope"}).status_code == 400
+
+def test_stream_owned_by_another_worker_answers_421(app, client, recording):
+    stream = open_stream(client)
+    app.extensions["streams"].close(stream["stream_id"]) # as if the request reached a different process
+    db = get_session(app)()
+    db.get(CompareJob, stream["stream_id"]).owner = "other-node:1"
+    db.commit()
+
+    resp = client.post(stream["chunk_url"], data = recording[:2048])
+    assert resp.status_code == 421
+    assert resp.get_json()["owner"] == "other-node:1" and resp.headers["X-Stream-Owner"] == "other-node:1"
+    assert client.post("/api/stream/feedface/finish").status_code == 404
+
+def test_abandoned_stream_is_pruned_by_other_requests(app, client, recording):
+    abandoned, active = open_stream(client), open_stream(client)
+    client.post(abandoned["chunk_url"], data = recording[:4096])
+    streams = app.extensions["streams"]
+    session = streams.get(abandoned["stream_id"])
+    thread = session.decoder._thread
+    session.touched -= streams.ttl + 1
+
+    assert client.post(active["chunk_url"], data = recording[:2048]).status_code == 200
+    assert streams.get(abandoned["stream_id"]) is None
+    assert not session.path.exists() and not session.path.with_name(session.path.name + ".json").exists()
+    thread.join(timeout = 5)
+    assert not thread.is_alive() # decoder thread ended without another stream being opened
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from mainapp.phrases import sandhi_tones, compile_phrase
+from mainapp.api.synth import render_tones
+from mainapp.api.pitch import extract_f0
+from mainapp.api.segment import trim, syllable_edges
+from mainapp.api.scoring import score_windows
+from mainapp.api.analysis import analyze_pitch
+from mainapp.api.audio import SAMPLE_RATE
+from mainapp.api.tone_models import ToneTemplates, utterance_examples, learn_templates, POINTS
+
+@pytest.mark.parametrize("hanzi, tones, spoken", [
+    ("你好", [3, 3], [2, 3]), # 3-3: the first rises
+    ("我很好", [3, 3, 3], [2, 2, 3]), # a run keeps only the last third tone
+    ("你好吗", [3, 3, 5], [2, 3, 5]),
+    ("好", [3], [3]),
+    ("不是", [4, 4], [2, 4]), # 不 before tone 4 rises
+    ("不好", [4, 3], [4, 3]),
+    ("不客气", [2, 4, 4], [2, 4, 4]), # pinyin already spells bú
+    ("一个", [1, 4], [2, 4]), # 一 before tone 4 rises
+    ("一天", [1, 1], [4, 1]), # ... before other tones falls
+    ("一起", [1, 3], [4, 3]),
+    ("一年", [1, 2], [4, 2]),
+    ("第一天", [4, 1, 1], [4, 1, 1]), # ordinals keep yī
+    ("统一", [3, 1], [3, 1]), # phrase-final 一 keeps yī
+    ("一的", [1, 5], [1, 5]), # before a neutral tone: unchanged
+    ("OK不是", [5, 4, 4], [5, 4, 4]), # characters and syllables don't pair up: only the 3-3 rule applies
+    ("OK你好", [5, 3, 3], [5, 2, 3]),
+])
+def test_sandhi_tones(hanzi, tones, spoken):
+    assert sandhi_tones(hanzi, tones) == spoken
+
+def test_compiled_phrase_carries_both():
+    ph = compile_phrase("p001", "你好", "nǐ hǎo")
+    assert ph["tones"] == [3, 3] and ph["surface_tones"] == [2, 3]
+
+# what analyze_pitch does without a reference: trim, track, split at intensity valleys
+def track(y, n):
+    start, end = trim(y)
+    t, f0, _ = extract_f0(y[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+    return t + start, f0, syllable_edges(y, n, start, end)
+
+@pytest.fixture(scope = "module")
+def templates():
+    examples = []
+    for base in (120, 180, 240):
+        for tones in ([1, 2, 3, 4], [4, 3, 2, 1], [2, 4, 1, 3], [3, 1, 4, 2]):
+            examples += utterance_examples(render_tones(tones, base_f0 = base, lead = 0.2, gap = 0.08), tones, "synth")
+    return learn_templates(examples)
+
+def test_learned_templates_are_bounded(templates):
+    assert templates.matrix.shape == (len(templates), POINTS)
+    assert set(templates.tones.tolist()) == {1, 2, 3, 4} and len(templates) <= 4 * 4 * 8 # tones x positions x PER_KEY
+
+def test_templates_accept_the_right_tones_and_name_confusions(templates):
+    t, f0, edges = track(render_tones([2, 4, 1], base_f0 = 200, lead = 0.2, gap = 0.08), 3) # a voice not in the training set
+    right = templates.score(t, f0, edges, [2, 4, 1])
+    assert all(score >= 70 and label.startswith("ok") for score, label in right)
+    swapped = templates.score(t, f0, edges, [4, 2, 1])
+    assert swapped[0][1] == "sounds like tone 2 (expected tone 4)" and swapped[0][0] <= 55
+    assert swapped[1][1] == "sounds like tone 4 (expected tone 2)"
+
+def test_templates_fall_back_to_the_rule_scorer(templates):
+    t, f0, edges = track(render_tones([1, 5], lead = 0.2, gap = 0.08), 2)
+    rules = score_windows(t, f0, edges, np.array([1, 5]))
+    assert templates.score(t, f0, edges, [1, 5])[1] == rules[1] # no neutral-tone templates learned
+    empty = ToneTemplates(np.zeros((0, POINTS)), [], [])
+    assert empty.score(t, f0, edges, [1, 5]) == rules
+    silent = np.full_like(f0, np.nan)
+    assert templates.score(t, silent, edges, [1, 5]) == score_windows(t, silent, edges, np.array([1, 5]))
+
+def test_rule_scorer_grades_surface_tones():
+    phrase = compile_phrase("p001", "你好", "nǐ hǎo")
+    _, syllables, _ = analyze_pitch(render_tones([2, 3], lead = 0.2, gap = 0.1), phrase) # spoken as ní hǎo
+    assert [s["surface_tone"] for s in syllables] == [2, 3] and [s["tone"] for s in syllables] == [3, 3]
+    assert syllables[0]["score"] >= 70 # a rising first syllable is right, not a failed third tone
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker, scoped_session
+from mainapp.models import Base, TtsClip
+from mainapp.api.tts_cache import TTSCache
+
+# stands in for the OpenAI client: same `audio.speech.with_streaming_response.create` shape, counts upstream calls
+class FakeTTSClient:
+    def __init__(self, delay = 0.0, size = 1000):
+        self.audio = self.speech = self.with_streaming_response = self
+        self.delay, self.size = delay, size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def create(self, input, **settings):
+        with self._lock:
+            self.calls.append(input)
+        time.sleep(self.delay) # widen the window in which concurrent requests for the same text overlap
+        yield self
+
+    def stream_to_file(self, out_path):
+        with open(out_path, "wb") as f:
+            f.write(b"\0" * self.size)
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tts.db'}")
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind = engine))
+    yield Session
+    Session.remove()
+    engine.dispose()
+
+def test_concurrent_renders_call_upstream_once(tmp_path, Session):
+    client = FakeTTSClient(delay = 0.2)
+    cache = TTSCache(tmp_path / "tts", client)
+
+    def render(_):
+        try:
+            return cache.get_or_render(Session(), "你好")
+        finally:
+            Session.remove()
+
+    with ThreadPoolExecutor(8) as pool:
+        names = list(pool.map(render, range(8)))
+
+    assert client.calls == ["你好"]
+    assert len(set(names)) == 1 and (cache.root / names[0]).exists()
+    assert Session().scalar(select(TtsClip.filename)) == names[0]
+    assert not cache._locks # per-key locks are released
+    assert not list(cache.root.glob(".*.part"))
+
+    cache.get_or_render(Session(), "你好") # hit: no new upstream call
+    cache.get_or_render(Session(), "谢谢")
+    assert client.calls == ["你好", "谢谢"]
+
+def test_evicts_least_recently_used_over_max_bytes(tmp_path, Session):
+    client = FakeTTSClient(size = 1000)
+    cache = TTSCache(tmp_path / "tts", client, max_bytes = 2500)
+    db = Session()
+    first = cache.get_or_render(db, "一")
+    second = cache.get_or_render(db, "二")
+    db.get(TtsClip, first.split(".")[0]).last_used_at = datetime.utcnow() + timedelta(minutes = 1) # "一" used most recently
+    db.commit()
+    third = cache.get_or_render(db, "三") # 3000 bytes > 2500: the LRU clip ("二") goes
+
+    assert {r.filename for r in db.scalars(select(TtsClip))} == {first, third}
+    assert not (cache.root / second).exists()
+    assert (cache.root / first).exists() and (cache.root / third).exists()
+
+    cache.get_or_render(db, "二") # evicted clips are rendered again on demand
+    assert client.calls == ["一", "二", "三", "二"]
+
+def test_evicts_old_clips_but_keeps_other_files(tmp_path, Session):
+    client = FakeTTSClient()
+    cache = TTSCache(tmp_path / "tts", client, max_age = timedelta(days = 30))
+    db = Session()
+    old = cache.get_or_render(db, "旧")
+    db.get(TtsClip, old.split(".")[0]).created_at = datetime.utcnow() - timedelta(days = 31)
+    db.commit()
+
+    long_ago = time.time() - 40 * 86400
+    legacy = cache.root / ("ab" * 16 + "__tts.mp3") # unindexed clip from before the cache
+    for name in (legacy.name, "manifest.json", "notes.txt"):
+        (cache.root / name).write_bytes(b"x")
+        os.utime(cache.root / name, (long_ago, long_ago))
+
+    fresh = cache.get_or_render(db, "新") # every render runs an eviction pass
+
+    assert not (cache.root / old).exists() and db.get(TtsClip, old.split(".")[0]) is None
+    assert not legacy.exists()
+    assert (cache.root / "manifest.json").exists() and (cache.root / "notes.txt").exists() # not clips: never swept
+    assert (cache.root / fresh).exists()
@@ -0,0 +1,77 @@
+import io
+import os
+import numpy as np
+import pytest
+from mainapp.api.audio import write_wav, encode_audio, av
+from mainapp.api.synth import render_tones
+from mainapp.api.upload import receive_upload, wav_seconds, UploadRejected, PROBE_BYTES, CHUNK
+
+class CountingStream(io.BytesIO): # request body that records how much of it was read
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, n = -1):
+        block = super().read(n)
+        self.consumed += len(block)
+        return block
+
+def wav_bytes(tmp_path, seconds):
+    write_wav(tmp_path / "a.wav", np.zeros(int(seconds * 16000), dtype = np.float32) + 0.01)
+    return (tmp_path / "a.wav").read_bytes()
+
+def stored(tmp_path):
+    return [p.name for p in (tmp_path / "uploads").rglob("*") if p.is_file()]
+
+def test_accepts_audio_within_limit(tmp_path):
+    data = wav_bytes(tmp_path, 2)
+    info = receive_upload(CountingStream(data), tmp_path / "ok.wav", max_seconds = 30)
+    assert info["duration"] == pytest.approx(2, abs = 0.05) and info["bytes"] == len(data)
+    assert (tmp_path / "ok.wav").read_bytes() == data
+
+def test_long_wav_rejected_from_its_header(tmp_path):
+    data = wav_bytes(tmp_path, 60) # ~1.9 MB
+    body = CountingStream(data)
+    with pytest.raises(UploadRejected) as e:
+        receive_upload(body, tmp_path / "long.wav", max_seconds = 30)
+    assert e.value.status == 413
+    assert body.consumed <= PROBE_BYTES + CHUNK # stopped at the first probe, not after the whole body
+    assert not list(tmp_path.glob("*long.wav*")) # neither the file nor its .part
+
+def test_garbage_rejected_after_probe(tmp_path):
+    body = CountingStream(os.urandom(1024 * 1024))
+    with pytest.raises(UploadRejected) as e:
+        receive_upload(body, tmp_path / "junk.webm", max_seconds = 30)
+    assert e.value.status == 415 and body.consumed <= PROBE_BYTES + CHUNK
+    assert not list(tmp_path.glob("*junk*"))
+
+def test_empty_upload_rejected(tmp_path):
+    with pytest.raises(UploadRejected) as e:
+        receive_upload(CountingStream(b""), tmp_path / "empty.webm", max_seconds = 30)
+    assert e.value.status == 400
+
+@pytest.mark.skipif(av is None, reason = "early decoding needs PyAV")
+def test_long_stream_without_duration_header_rejected_by_decoding(tmp_path):
+    encode_audio(tmp_path / "long.opus", render_tones([1, 2, 3, 4] * 12, syl_dur = 0.6)) # ~30 s of ogg/opus: no total duration up front
+    with pytest.raises(UploadRejected) as e:
+        receive_upload(CountingStream((tmp_path / "long.opus").read_bytes()), tmp_path / "out.opus", max_seconds = 10)
+    assert e.value.status == 413 and not (tmp_path / "out.opus").exists()
+
+def test_upload_endpoint_answers_413_and_415(app, client, tmp_path):
+    app.config["MAX_UPLOAD_SECONDS"] = 5
+    resp = client.post("/api/upload?phrase_id=p001", data = wav_bytes(tmp_path, 20), content_type = "audio/wav")
+    assert resp.status_code == 413 and "longer than 5s" in resp.get_json()["error"]
+    resp = client.post("/api/upload?phrase_id=p001", data = os.urandom(200 * 1024), content_type = "audio/webm")
+    assert resp.status_code == 415
+    assert stored(tmp_path) == [] # nothing rejected is kept
+
+    resp = client.post("/api/upload?phrase_id=p001", data = wav_bytes(tmp_path, 2), content_type = "audio/wav")
+    assert resp.status_code == 200 and resp.get_json()["duration"] == pytest.approx(2, abs = 0.05)
+    assert len(stored(tmp_path)) == 2 # audio + sidecar
+
+def test_wav_seconds_reads_the_declared_length(tmp_path):
+    data = wav_bytes(tmp_path, 3)
+    assert wav_seconds(data[:100]) == pytest.approx(3)
+    streaming = data[:40] + (0xFFFFFFFF).to_bytes(4, "little") + data[44:100] # size unknown while recording
+    assert wav_seconds(streaming) is None
+    assert wav_seconds(b"OggS" + bytes(100)) is None and wav_seconds(data[:30]) is None